@@ -0,0 +1,134 @@
+"""Module scales the number of replay hosts to the remaining work"""
+import math
+import subprocess
+from job_status import JobStatusEnum
+
+class ShellProvisioner:
+    """Launches and terminates replay hosts with scripts under scripts/replayhost"""
+
+    def __init__(self, script_dir):
+        """script_dir is the top level scripts directory"""
+        self.script_dir = script_dir
+        self.last_error = None
+
+    def launch(self, count):
+        """start count replay hosts, return bool success"""
+        return self._run("run-replay-instance.sh", str(count))
+
+    def terminate(self, instance_id):
+        """terminate a single replay host by aws instance id, return bool success"""
+        return self._run("terminate-replay-instance.sh", instance_id)
+
+    def _run(self, script, argument):
+        """run script from replayhost directory"""
+        try:
+            result = subprocess.run([f"{self.script_dir}/replayhost/{script}", argument],
+                shell=False,
+                check=False,
+                capture_output=True,
+                text=True)
+        except OSError as error:
+            # script missing or not executable
+            self.last_error = str(error)
+            return False
+        self.last_error = result.stderr if result.returncode != 0 else None
+        return result.returncode == 0
+
+# pylint: disable=too-many-arguments
+class Autoscaler:
+    """
+    Estimates remaining work from waiting and working jobs
+    Scales up toward finishing within `target_minutes`
+    Scales down by terminating idle instances as the queue drains
+    Hosts advertising several job slots count for that many jobs
+    `provisioner` any object with launch(count) and terminate(instance_id)
+    """
+    ACTIVE_STATUSES = (JobStatusEnum.STARTED, JobStatusEnum.LOADING_SNAPSHOT, JobStatusEnum.WORKING)
+
+    def __init__(self, provisioner, target_minutes=180, min_hosts=0, max_hosts=120):
+        self.provisioner = provisioner
+        self.target_minutes = target_minutes
+        self.min_hosts = min_hosts
+        self.max_hosts = max_hosts
+
+    @staticmethod
+    def remaining_minutes(job_manager):
+        """predicted minutes of work left, working jobs scaled by blocks left"""
+        remaining = 0.0
+        for job in job_manager.get_all().values():
+            predicted = job.predicted_minutes or 0
+            if job.status == JobStatusEnum.WAITING_4_WORKER:
+                remaining += predicted
+            elif job.status in Autoscaler.ACTIVE_STATUSES:
+                config = job.slice_config
+                span = config.end_block_id - config.start_block_id
+                done = job.last_block_processed - config.start_block_id
+                if span > 0 and job.last_block_processed > 0:
+                    remaining += predicted * max(span - done, 0) / span
+                else:
+                    remaining += predicted
+        return remaining
+
+    def desired_hosts(self, job_manager, slots_per_host=1):
+        """host count to finish remaining work in target time
+        `slots_per_host` jobs each host runs at once"""
+        unfinished = 0
+        for job in job_manager.get_all().values():
+            if job.status == JobStatusEnum.WAITING_4_WORKER \
+                or job.status in Autoscaler.ACTIVE_STATUSES:
+                unfinished += 1
+        desired_slots = math.ceil(Autoscaler.remaining_minutes(job_manager) / self.target_minutes)
+        # never more slots than jobs left to run
+        desired_slots = min(desired_slots, unfinished)
+        desired = math.ceil(desired_slots / max(slots_per_host, 1))
+        return max(self.min_hosts, min(self.max_hosts, desired))
+
+    @staticmethod
+    def idle_instances(job_manager, hosts):
+        """instances that reported in but are not running a job"""
+        busy = set()
+        for job in job_manager.get_all().values():
+            if job.status in Autoscaler.ACTIVE_STATUSES and job.instance_id:
+                busy.add(job.instance_id)
+        for job in job_manager.backups.values():
+            if job.status in Autoscaler.ACTIVE_STATUSES and job.instance_id and not job.superseded:
+                busy.add(job.instance_id)
+        return [instance_id for instance_id in hosts.instances if instance_id not in busy]
+
+    def report(self, job_manager, hosts):
+        """current plan without acting on it"""
+        return {
+            'current_hosts': hosts.host_count if hosts.host_count else 0,
+            'desired_hosts': self.desired_hosts(job_manager, hosts.slots_per_host()),
+            'slots_per_host': hosts.slots_per_host(),
+            'remaining_minutes': round(Autoscaler.remaining_minutes(job_manager), 2),
+            'idle_instances': Autoscaler.idle_instances(job_manager, hosts)
+        }
+
+    def evaluate(self, job_manager, hosts):
+        """one control step, returns dictionary describing actions taken"""
+        current = hosts.host_count if hosts.host_count else 0
+        desired = self.desired_hosts(job_manager, hosts.slots_per_host())
+        actions = {
+            'current_hosts': current,
+            'desired_hosts': desired,
+            'remaining_minutes': round(Autoscaler.remaining_minutes(job_manager), 2),
+            'launched': 0,
+            'terminated': [],
+            'success': True
+        }
+        if desired > current:
+            if self.provisioner.launch(desired - current):
+                hosts.set_count(desired)
+                actions['launched'] = desired - current
+            else:
+                actions['success'] = False
+        elif desired < current:
+            surplus = current - desired
+            for instance_id in Autoscaler.idle_instances(job_manager, hosts)[:surplus]:
+                if self.provisioner.terminate(instance_id):
+                    hosts.remove_instance(instance_id)
+                    actions['terminated'].append(instance_id)
+                else:
+                    actions['success'] = False
+        return actions
@@ -0,0 +1,81 @@
+"""Module predicts how long a replay slice will take to process"""
+import bisect
+import csv
+import os
+import sys
+
+class DurationEstimator:
+    """
+    Predicts minutes needed to replay a block range
+    History is the csv produced by `process_orchestration_log.py --block-times`
+    each row is `start_block_id, end_block_id, minutes_per_block, blocks_for_3_hours`
+    Rates for a range are the overlap weighted average of historical rates
+    Ranges with no history fall back to the block span at the default rate
+    """
+    # used when there is no history at all, keeps ordering by block span
+    DEFAULT_MINUTES_PER_BLOCK = 0.001
+
+    def __init__(self, history_path=None):
+        # sorted by start block, parallel list of starts used for bisect
+        self.history = []
+        self.starts = []
+        self.default_minutes_per_block = DurationEstimator.DEFAULT_MINUTES_PER_BLOCK
+        if history_path:
+            self.load(history_path)
+
+    def load(self, history_path):
+        """load historical block timings from csv, ignores malformed rows"""
+        if not os.path.exists(history_path):
+            print(f"Error DE001 history file {history_path} does not exist", file=sys.stderr)
+            return
+        records = []
+        with open(history_path, 'r', encoding='utf-8') as history_file:
+            for row in csv.reader(history_file):
+                if len(row) < 3:
+                    continue
+                try:
+                    start_block = int(row[0].strip())
+                    end_block = int(row[1].strip())
+                    minutes_per_block = float(row[2].strip())
+                except ValueError:
+                    continue
+                if end_block <= start_block or minutes_per_block <= 0:
+                    continue
+                records.append((start_block, end_block, minutes_per_block))
+        self.add_records(records)
+
+    def add_records(self, records):
+        """add list of (start_block, end_block, minutes_per_block) tuples"""
+        self.history.extend(records)
+        self.history.sort()
+        self.starts = [record[0] for record in self.history]
+        if self.history:
+            rates = sorted(record[2] for record in self.history)
+            self.default_minutes_per_block = rates[len(rates) // 2]
+
+    def has_history(self):
+        """true when historical timings are loaded"""
+        return len(self.history) > 0
+
+    def minutes_per_block(self, start_block, end_block):
+        """overlap weighted rate for range, None when no history overlaps"""
+        # history ranges starting at or after end_block can not overlap
+        upper = bisect.bisect_left(self.starts, end_block)
+        weighted_minutes = 0.0
+        overlap_blocks = 0
+        for hist_start, hist_end, rate in self.history[:upper]:
+            overlap = min(end_block, hist_end) - max(start_block, hist_start)
+            if overlap > 0:
+                weighted_minutes += overlap * rate
+                overlap_blocks += overlap
+        if overlap_blocks == 0:
+            return None
+        return weighted_minutes / overlap_blocks
+
+    def predict_minutes(self, start_block, end_block):
+        """predicted minutes to process block range"""
+        span = max(end_block - start_block, 0)
+        rate = self.minutes_per_block(start_block, end_block)
+        if rate is None:
+            rate = self.default_minutes_per_block
+        return span * rate
@@ -0,0 +1,144 @@
+"""Module serves the files replay hosts upload and download, job logs and nodeos packages"""
+import json
+from werkzeug.wrappers import Response
+from werkzeug.utils import send_file
+from log_store import LogStore
+
+class FileService:
+    """
+    /joblog uploads and pages of job logs kept by LogStore
+    /logsearch over the words LogIndex holds for a run
+    /package nodeos packages from PackageMirror
+    Each part is disabled when its store, index or mirror is None
+    """
+    def __init__(self, log_store=None, log_index=None, package_mirror=None):
+        self.log_store = log_store
+        self.log_index = log_index
+        self.package_mirror = package_mirror
+
+    def forget(self, job_ids):
+        """drop stored and indexed logs of jobs, job ids are memory addresses
+        a new job may reuse the id of a replaced job whose logs are still kept"""
+        for job_id in job_ids:
+            if self.log_store:
+                self.log_store.remove(job_id)
+            if self.log_index:
+                self.log_index.remove_job(job_id)
+
+    def set_error_message(self, job):
+        """index the error message of a job with its logs"""
+        if self.log_index:
+            self.log_index.set_error_message(job.job_id, job.error_message)
+
+    def joblog(self, request, runs):
+        """replay hosts POST gzip chunks, GET and HEAD return the log or a byte range of it"""
+        if self.log_store is None:
+            return Response("log store not enabled", status=404)
+        job_id = request.args.get('jobid', '')
+        log_type = request.args.get('log')
+        if log_type not in LogStore.LOG_TYPES or not job_id.isdigit():
+            return Response("jobid and log of wrapper or nodeos required", status=400)
+        if request.method == 'POST':
+            return self.upload(request, runs, job_id, log_type)
+        if request.method not in ('GET', 'HEAD'):
+            return Response("method not supported", status=405)
+        return self.download(request, job_id, log_type)
+
+    def upload(self, request, runs, job_id, log_type):
+        """store a gzip chunk, offset is where the chunk starts in the log"""
+        run, job = runs.find_job(job_id)
+        if job is None:
+            return Response("Could not find job", status=404)
+        upload = request.args.get('upload')
+        try:
+            offset = int(request.args.get('offset', '0'))
+            size = self.log_store.append(job_id, log_type, upload,
+                offset, request.get_data(), 'complete' in request.args)
+        except ValueError as error:
+            return Response(str(error), status=400)
+        if size is None:
+            # host resumes from the stored size
+            return Response("offset does not match stored log", status=409,
+                headers={'X-Log-Offset': str(self.log_store.offset(job_id, log_type, upload))})
+        if self.log_index:
+            self.log_index.add_chunk(job_id, log_type, request.get_data(), offset,
+                'complete' in request.args)
+        # logs arrive after the failure, they may show the error is retryable
+        if 'complete' in request.args and job.retry_at is None:
+            run.jobs.schedule_retry(job)
+        return Response("", status=200, headers={'X-Log-Offset': str(size)})
+
+    def download(self, request, job_id, log_type):
+        """stored log, HEAD returns only its size"""
+        stored = self.log_store.size(job_id, log_type)
+        if stored is None:
+            return Response("Log file not found", status=404)
+        size, complete = stored
+        headers = {'Accept-Ranges': 'bytes', 'X-Log-Complete': str(complete).lower()}
+        if request.args.get('upload'):
+            headers['X-Log-Offset'] = str(self.log_store.offset(job_id, log_type,
+                request.args.get('upload')))
+        start, stop = 0, size
+        status = 200
+        # pages of large logs, only the chunks holding the range are decompressed
+        if request.range is not None:
+            byte_range = request.range.range_for_length(size)
+            if byte_range is None:
+                headers['Content-Range'] = f"bytes */{size}"
+                return Response("", status=416, headers=headers)
+            start, stop = byte_range
+            headers['Content-Range'] = f"bytes {start}-{stop - 1}/{size}"
+            status = 206
+        headers['Content-Length'] = str(stop - start)
+        body = [] if request.method == 'HEAD' else self.log_store.read(job_id, log_type, start, stop)
+        return Response(body, status=status, headers=headers,
+            content_type='text/plain; charset=utf-8', direct_passthrough=True)
+
+    # pylint: disable=too-many-return-statements
+    def search(self, request, run, limit):
+        """jobs of a run whose logs hold a phrase, or error signatures grouped across the run"""
+        if self.log_index is None:
+            return Response("log search not enabled", status=404)
+        if request.method != 'GET':
+            return Response("method not supported", status=405)
+        if run is None:
+            return Response("Run not found", status=404)
+        jobs = run.jobs.get_all()
+        phrase = request.args.get('q')
+        if phrase:
+            results = self.log_index.search(phrase, jobs.keys())
+            matches = [{'job_id': int(job_id),
+                'status': jobs[int(job_id)].status.name,
+                'matches': results[job_id]} for job_id in sorted(results, key=int)]
+            return Response(json.dumps({'run': run.name, 'query': phrase,
+                'jobs': matches[:limit], 'job_count': len(matches)}),
+                content_type='application/json')
+        signatures = self.log_index.error_signatures(jobs.keys())
+        return Response(json.dumps({'run': run.name, 'signatures': signatures[:limit],
+            'signature_count': len(signatures)}), content_type='application/json')
+
+    def package(self, request):
+        """nodeos package by version or branch, hosts retry while it is fetched"""
+        if request.method not in ('GET', 'HEAD'):
+            return Response("method not supported", status=405)
+        if self.package_mirror is None:
+            return Response("package mirror not enabled", status=404)
+        version = request.args.get('version')
+        if not version:
+            return Response("no version argument provided", status=400)
+        state, detail = self.package_mirror.status(version)
+        if state == 'fetching':
+            # one download per package, hosts come back when it is stored
+            return Response(f"fetching {detail}", status=503, headers={'Retry-After': '5'})
+        if state != 'ready':
+            return Response(detail, status=404 if state == 'missing' else 502)
+        headers = {'X-Checksum-Sha256': self.package_mirror.checksum(detail) or ''}
+        # behind nginx, nginx serves the file and its ranges
+        if request.headers.get('X-Forwarded-For'):
+            headers['X-Accel-Redirect'] = f"/packages/{detail}"
+            return Response("", headers=headers)
+        response = send_file(self.package_mirror.package_path(detail), request.environ,
+            mimetype='application/vnd.debian.binary-package',
+            as_attachment=True, download_name=detail, conditional=True)
+        response.headers.update(headers)
+        return response
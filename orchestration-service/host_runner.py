@@ -1,13 +1,27 @@
 """Manages Hosts Running Jobs"""
+from datetime import datetime
 from env_store import EnvStore
 
 class Hosts():
-    """Class hosts running jobs"""
+    """Class hosts running jobs
+    `host_count` number of hosts allocated
+    `instances` aws instance ids reported by replay hosts, with last time seen
+    `slots` job slots advertised by each instance, each slot runs its own job
+    """
 
     def __init__(self, file):
         """setup datacenter configuration like regions"""
         self.datacenter_config = EnvStore(file)
         self.host_count = None
+        self.instances = {}
+        self.slots = {}
+
+    @staticmethod
+    def slot_name(instance_id, slot=None):
+        """lease holder name for a slot, the first slot is the bare instance id"""
+        if not instance_id or not slot or str(slot) == '0':
+            return instance_id
+        return f"{instance_id}/{slot}"
 
     def set_count(self, count):
         """update host count"""
@@ -18,3 +32,39 @@ class Hosts():
         if self.host_count and self.host_count > 0:
             return True
         return False
+
+    def record_instance(self, instance_id):
+        """track instance reporting in when it claims a job"""
+        if instance_id:
+            self.instances[instance_id] = datetime.now().strftime('%Y-%m-%dT%H:%M:%S')
+
+    def record_slots(self, instance_id, slots):
+        """job slots instance advertises when asking for a job, ignores bad values"""
+        try:
+            slots = int(slots)
+        except (TypeError, ValueError):
+            return
+        if instance_id and slots > 0:
+            self.slots[instance_id] = slots
+
+    def slots_per_host(self):
+        """most slots advertised by an instance, 1 before any host reports"""
+        return max(self.slots.values(), default=1)
+
+    def slot_count(self):
+        """job slots across reporting instances"""
+        return sum(self.slots.get(instance_id, 1) for instance_id in self.instances)
+
+    def remove_instance(self, instance_id):
+        """instance was terminated"""
+        if instance_id in self.instances:
+            del self.instances[instance_id]
+        self.slots.pop(instance_id, None)
+        if self.host_count:
+            self.host_count -= 1
+
+    def clear(self):
+        """all instances terminated"""
+        self.instances = {}
+        self.slots = {}
+        self.host_count = 0
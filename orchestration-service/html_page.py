@@ -27,6 +27,21 @@ class HtmlPage:
             file_contents = file.read()
         return file_contents
 
+    def profile_page(self, file_name, login, avatar_url):
+        """page for a logged in user"""
+        return self.contents('header.html') \
+            + HtmlPage.profile_top_bar_html(login, avatar_url) \
+            + self.contents('navbar.html') \
+            + self.contents(file_name) \
+            + self.contents('footer.html')
+
+    def login_page(self, oauth_url, message="Not Authorized: Please Log In"):
+        """page asking the user to log in"""
+        return self.contents('header.html') \
+            + HtmlPage.default_top_bar_html(oauth_url) \
+            + HtmlPage.not_authorized(message) \
+            + self.contents('footer.html')
+
     @staticmethod
     def profile_top_bar_html(login, avatar_url):
         """return top bar with profile"""
@@ -0,0 +1,94 @@
+"""Module streams job results row by row"""
+import csv
+import io
+import json
+from job_status import JobManager
+
+class JobExport:
+    """
+    Generators yielding one job per row, memory does not grow with the number of jobs
+    filters are the same as JobManager.matches
+    """
+    FORMATS = ('ndjson', 'csv')
+    COLUMNS = ['job_id', 'replay_slice_id', 'instance_id', 'snapshot_path', 'storage_type',
+        'spring_version', 'start_block_num', 'end_block_num', 'status', 'last_block_processed',
+        'start_time', 'end_time', 'expected_integrity_hash', 'actual_integrity_hash',
+        'error_message', 'priority', 'cache_hits', 'cache_misses', 'cache_hit_bytes', 'attempts']
+    CONTENT_TYPES = {
+        'ndjson': 'application/x-ndjson',
+        'csv': 'text/csv; charset=utf-8'
+    }
+
+    @staticmethod
+    def filters_from_args(args):
+        """build filters from request arguments, lists are comma seperated"""
+        filters = {}
+        for name in ('sliceids', 'statuses'):
+            if args.get(name):
+                filters[name] = [item.strip() for item in args.get(name).split(',') if item.strip()]
+        for name in ('start_block', 'end_block', 'spring_version'):
+            if args.get(name):
+                filters[name] = args.get(name)
+        return filters
+
+    @staticmethod
+    def numbers_valid(filters):
+        """slice ids and block numbers are integers"""
+        numbers = filters.get('sliceids', []) \
+            + [filters[name] for name in ('start_block', 'end_block') if name in filters]
+        return all(str(number).isnumeric() for number in numbers)
+
+    @staticmethod
+    def format_from_request(args, accept):
+        """format parameter first, then accept header, defaults to ndjson"""
+        if args.get('format') in JobExport.FORMATS:
+            return args.get('format')
+        if accept and 'text/csv' in accept:
+            return 'csv'
+        return 'ndjson'
+
+    @staticmethod
+    def row(job):
+        """dictionary for one job"""
+        this_dict = job.as_dict()
+        this_dict['attempts'] = job.attempts
+        return this_dict
+
+    @staticmethod
+    def matching(jobs, filters):
+        """jobs matching filters, lazily"""
+        for job in jobs.values():
+            if JobManager.matches(job, filters):
+                yield job
+
+    @staticmethod
+    def ndjson(jobs, filters):
+        """yield one json document per line"""
+        for job in JobExport.matching(jobs, filters):
+            yield json.dumps(JobExport.row(job)) + "\n"
+
+    @staticmethod
+    def csv(jobs, filters):
+        """yield header then one csv line per job"""
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=JobExport.COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        yield JobExport._drain(buffer)
+        for job in JobExport.matching(jobs, filters):
+            writer.writerow(JobExport.row(job))
+            yield JobExport._drain(buffer)
+
+    @staticmethod
+    def _drain(buffer):
+        """return buffered text and reset buffer"""
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return text
+
+    @staticmethod
+    def stream(jobs, filters, export_format):
+        """generator for export format"""
+        if export_format == 'csv':
+            return JobExport.csv(jobs, filters)
+        return JobExport.ndjson(jobs, filters)
@@ -1,8 +1,11 @@
 """Module provides job status"""
 import json
-from datetime import datetime
+from collections import deque
+from datetime import datetime, timedelta
 from enum import Enum
 import re
+from duration_estimator import DurationEstimator
+from retry_policy import RetryPolicy
 
 # pylint: disable=too-few-public-methods
 class JobStatusEnum(Enum):
@@ -11,6 +14,7 @@ class JobStatusEnum(Enum):
     STARTED = "started"
     LOADING_SNAPSHOT = "loading_snapshot"
     WORKING = "working"
+    VERIFYING = "verifying"
     ERROR = "error"
     TIMEOUT = "timeout"
     HASH_MISMATCH = "hash_mismatch"
@@ -30,6 +34,8 @@ class JobStatusEnum(Enum):
             job_status_enum = JobStatusEnum.LOADING_SNAPSHOT
         if name == "WORKING":
             job_status_enum = JobStatusEnum.WORKING
+        if name == "VERIFYING":
+            job_status_enum = JobStatusEnum.VERIFYING
         if name == "ERROR":
             job_status_enum = JobStatusEnum.ERROR
         if name == "TIMEOUT":
@@ -47,8 +53,9 @@ class JobStatus:
     primary key is an integer `job_id`
     has the following properties
     `replay_slice_id` integer FK linked to `BlockManger.replay_slice_id`
-    `status` enum of waiting_4_worker, started, working, complete, error, timeout
+    `status` enum of waiting_4_worker, started, working, verifying, complete, error, timeout
         initialized to waiting_4_worker
+        verifying when complete before the expected integrity hash is known
     `instance_id` is AWS instance ID of replay host
     `last_block_processed` block id of last block processed
         initialized to 0
@@ -59,8 +66,28 @@ class JobStatus:
     `actual_integrity_hash` hash once last block has been reached
         initialized to None
     `error_message` error message reported back on failure
+    `predicted_minutes` estimated duration set by JobManager
+    `progress_start` `progress_last` (datetime, block) samples of last_block_processed
+    `progress_samples` most recent (datetime, block) samples, bounded
+    `blocks_per_second` smoothed processing rate, None until two samples
+    `primary_job_id` set on a speculative backup, the straggler job it copies
+    `backup_job_id` set on a straggler job, the speculative backup running it
+    `superseded` partner finished first, host running this job should stop
+    `attempts` number of times a worker has started the job
+    `retry_at` datetime a failed job may be requeued, None when not retrying
+    `priority` higher priority jobs are handed out first, initialized from config
+    `phase_times` status name to datetime the job first entered that status
+    `cache_hits` `cache_misses` `cache_hit_bytes` artifacts the host reused from its local cache
+    `reserved_by` `reserved_until` instance holding a lease on this waiting job, it prefetches
+        the job's artifacts while finishing its current job, expired leases are ignored
     The class in inialized from an array, whose elements have a property `replay_slice_id`
     """
+    PROGRESS_SAMPLES = 12
+    # longest lease a host may hold on a waiting job
+    MAX_LEASE_MINUTES = 120
+    # weight of the newest rate in the exponentially weighted moving average
+    RATE_SMOOTHING = 0.3
+
     def __init__(self, config):
         self.job_id = id(self)  # Using memory address as a simple unique identifier
         self.slice_config = config
@@ -71,6 +98,97 @@ class JobStatus:
         self.end_time = None
         self.actual_integrity_hash = None
         self.error_message = None
+        self.predicted_minutes = None
+        self.progress_start = None
+        self.progress_last = None
+        self.progress_samples = deque(maxlen=JobStatus.PROGRESS_SAMPLES)
+        self.blocks_per_second = None
+        self.primary_job_id = None
+        self.backup_job_id = None
+        self.superseded = False
+        self.attempts = 0
+        self.retry_at = None
+        self.priority = config.priority
+        self.phase_times = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_hit_bytes = 0
+        self.reserved_by = None
+        self.reserved_until = None
+
+    def requeue(self):
+        """reset to wait for a worker, attempts are kept, links to speculative copies are cleared"""
+        self.status = JobStatusEnum.WAITING_4_WORKER
+        self.instance_id = None
+        self.last_block_processed = 0
+        self.end_time = None
+        self.actual_integrity_hash = None
+        self.error_message = None
+        self.progress_start = None
+        self.progress_last = None
+        self.progress_samples.clear()
+        self.blocks_per_second = None
+        self.retry_at = None
+        self.primary_job_id = None
+        self.backup_job_id = None
+        self.superseded = False
+        self.phase_times = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_hit_bytes = 0
+        self.release()
+
+    def reserve(self, instance_id, minutes, now=None):
+        """lease waiting job to instance for minutes, renewing replaces the lease
+        zero minutes or no instance releases it"""
+        if not instance_id or minutes <= 0:
+            self.release()
+            return
+        self.reserved_by = instance_id
+        self.reserved_until = (now if now else datetime.now()) \
+            + timedelta(minutes=min(minutes, JobStatus.MAX_LEASE_MINUTES))
+
+    def release(self):
+        """drop any lease"""
+        self.reserved_by = None
+        self.reserved_until = None
+
+    def lease_holder(self, now=None):
+        """instance holding an unexpired lease, None when free"""
+        if self.reserved_until is None or self.reserved_until <= (now if now else datetime.now()):
+            return None
+        return self.reserved_by
+
+    def record_progress(self, block_num, now=None):
+        """sample progress, used to calculate blocks per minute and blocks per second"""
+        sample = (now if now else datetime.now(), block_num)
+        if self.progress_start is None or block_num < self.progress_start[1]:
+            self.progress_start = sample
+        self.progress_last = sample
+        # went backwards, restarted from the snapshot
+        if self.progress_samples and block_num < self.progress_samples[-1][1]:
+            self.progress_samples.clear()
+            self.blocks_per_second = None
+        if self.progress_samples:
+            previous_time, previous_block = self.progress_samples[-1]
+            seconds = (sample[0] - previous_time).total_seconds()
+            if seconds > 0:
+                rate = (block_num - previous_block) / seconds
+                if self.blocks_per_second is None:
+                    self.blocks_per_second = rate
+                else:
+                    self.blocks_per_second = JobStatus.RATE_SMOOTHING * rate \
+                        + (1 - JobStatus.RATE_SMOOTHING) * self.blocks_per_second
+        self.progress_samples.append(sample)
+
+    def blocks_per_minute(self, min_minutes=0):
+        """processing rate since first sample, None if not enough data"""
+        if self.progress_start is None or self.progress_last is None:
+            return None
+        minutes = (self.progress_last[0] - self.progress_start[0]).total_seconds() / 60
+        if minutes <= 0 or minutes < min_minutes:
+            return None
+        return (self.progress_last[1] - self.progress_start[1]) / minutes
 
     def __repr__(self):
         return (f"JobStatus(job_id={self.job_id}, "
@@ -123,20 +241,101 @@ class JobStatus:
         this_dict['expected_integrity_hash'] = self.slice_config.expected_integrity_hash
         this_dict['actual_integrity_hash'] = self.actual_integrity_hash
         this_dict['error_message'] = self.error_message
+        this_dict['priority'] = self.priority
+        this_dict['cache_hits'] = self.cache_hits
+        this_dict['cache_misses'] = self.cache_misses
+        this_dict['cache_hit_bytes'] = self.cache_hit_bytes
+        this_dict['reserved_by'] = self.lease_holder()
+        this_dict['reserved_until'] = self.reserved_until.strftime('%Y-%m-%dT%H:%M:%S') \
+            if this_dict['reserved_by'] else None
         return this_dict
 
 
 class JobManager:
-    """Holds Jobs and manages persistance"""
+    """Holds Jobs and manages persistance
+    `scheduler` order jobs are handed to workers
+        fifo - manifest order
+        longest-first - longest predicted duration first, shortens the makespan
+    `estimator` DurationEstimator used to predict job durations
+    `speculative` when no jobs are waiting hand idle hosts a backup copy of the slowest job
+    `retry_policy` RetryPolicy deciding which failed jobs are requeued
+    """
+    SCHEDULERS = ('fifo', 'longest-first')
+    # job finished processing blocks, no longer competing with other copies
+    FINISHED_STATUSES = (JobStatusEnum.VERIFYING, JobStatusEnum.COMPLETE, JobStatusEnum.HASH_MISMATCH)
+    # minutes of progress needed before judging a job's rate
+    STRAGGLER_MIN_MINUTES = 10
+    # fraction of expected rate below which a job is a straggler
+    STRAGGLER_RATIO = 0.5
 
-    def __init__(self, replay_configs):
+    # pylint: disable=too-many-arguments
+    def __init__(self, replay_configs, scheduler='fifo', estimator=None, speculative=True,
+        retry_policy=None):
+        if scheduler not in JobManager.SCHEDULERS:
+            raise ValueError(f"Error JM001: scheduler {scheduler} not supported")
         self.start_time = None
         self.end_time = None
         self.is_running = False
+        # set once the finished run is stored in run history
+        self.archived = False
+        self.scheduler = scheduler
+        self.estimator = estimator if estimator else DurationEstimator()
+        self.speculative = speculative
+        self.retry_policy = retry_policy if retry_policy else RetryPolicy()
         self.jobs = {}
+        # speculative copies of straggler jobs, not counted in reports
+        self.backups = {}
+        # (end_block_id, spring_version) to ids of jobs waiting on that expected hash
+        self.verifying = {}
         for slice_config in replay_configs:
             job = JobStatus(slice_config)
+            job.predicted_minutes = self.estimator.predict_minutes(
+                slice_config.start_block_id, slice_config.end_block_id)
             self.jobs[job.job_id] = job
+        # removed from the manifest by a reload, still found by id for hosts running them
+        self.retired = {}
+        # job ids in the order they are dispatched to workers
+        self.dispatch_order = []
+        self._order_jobs()
+
+    def _order_jobs(self):
+        """build dispatch order for scheduler"""
+        self.dispatch_order = list(self.jobs.keys())
+        if self.scheduler == 'longest-first':
+            # stable sort, equal predictions stay in manifest order
+            self.dispatch_order.sort(key=lambda job_id: -self.jobs[job_id].predicted_minutes)
+
+    def reload(self, replay_configs):
+        """diff a new manifest against current jobs by start, end, snapshot and version
+        unchanged slices keep their job and state, new slices are added,
+        removed slices are retired, returns counts of kept, added and retired jobs"""
+        current = {}
+        for job in self.jobs.values():
+            current.setdefault(job.slice_config.identity(), []).append(job)
+        jobs = {}
+        added = 0
+        for slice_config in replay_configs:
+            matches = current.get(slice_config.identity())
+            if matches:
+                job = matches.pop(0)
+                # keep hashes learned since the old manifest was loaded
+                if not slice_config.expected_integrity_hash:
+                    slice_config.expected_integrity_hash = job.slice_config.expected_integrity_hash
+                job.slice_config = slice_config
+            else:
+                job = JobStatus(slice_config)
+                job.predicted_minutes = self.estimator.predict_minutes(
+                    slice_config.start_block_id, slice_config.end_block_id)
+                added += 1
+            jobs[job.job_id] = job
+        retired = 0
+        for leftover in current.values():
+            for job in leftover:
+                self.retired[job.job_id] = job
+                retired += 1
+        self.jobs = jobs
+        self._order_jobs()
+        return {'kept': len(jobs) - added, 'added': added, 'retired': retired}
 
     def update_running_status(self, status):
         """Update Running or Not Running"""
@@ -151,8 +350,17 @@ class JobManager:
         job_id = int(job_id)
         if job_id in self.jobs:
             return self.jobs[job_id]
+        if job_id in self.backups:
+            return self.backups[job_id]
+        if job_id in self.retired:
+            return self.retired[job_id]
         return None
 
+    def is_superseded(self, job_id):
+        """true when another copy of the job finished first"""
+        job = self.get_job(job_id)
+        return job is not None and job.superseded
+
     def get_all(self):
         """Return all jobs"""
         return self.jobs
@@ -193,40 +401,335 @@ class JobManager:
         if not self.start_time:
             self.start_time = datetime.now().strftime('%Y-%m-%dT%H:%M:%S')
 
-        # job id
-        jobid = data['job_id']
+        # job id, may be a speculative backup
+        job = self.get_job(data['job_id'])
+        if job is None:
+            return False
 
+        previous_status = job.status
         if 'status' in data:
-            self.jobs[jobid].status = JobStatusEnum.lookup_by_name(data['status'])
+            job.status = JobStatusEnum.lookup_by_name(data['status'])
+        if job.status == JobStatusEnum.STARTED and previous_status != JobStatusEnum.STARTED:
+            job.attempts += 1
+            # new attempt, time phases from here
+            job.phase_times = {}
+            # lease ends once a host claims the job
+            job.release()
+        if job.status.name not in job.phase_times:
+            job.phase_times[job.status.name] = datetime.now()
         if 'last_block_processed' in data and self.is_integer(data['last_block_processed']):
-            self.jobs[jobid].last_block_processed = int(data['last_block_processed'])
+            if int(data['last_block_processed']) != job.last_block_processed \
+                and job.status == JobStatusEnum.WORKING:
+                job.record_progress(int(data['last_block_processed']))
+            job.last_block_processed = int(data['last_block_processed'])
         if 'end_time' in data:
-            self.jobs[jobid].end_time = data['end_time']
+            job.end_time = data['end_time']
         if 'start_time' in data and 'status' in data and data['status'] == "STARTED":
-            self.jobs[jobid].start_time = data['start_time']
+            job.start_time = data['start_time']
         if 'actual_integrity_hash' in data:
-            self.jobs[jobid].actual_integrity_hash = data['actual_integrity_hash']
+            job.actual_integrity_hash = data['actual_integrity_hash']
         if 'error_message' in data:
-            self.jobs[jobid].error_message = data['error_message']
+            job.error_message = data['error_message']
         if 'instance_id' in data:
-            self.jobs[jobid].instance_id = data['instance_id']
+            job.instance_id = data['instance_id']
+        if 'priority' in data and self.is_integer(str(data['priority']).lstrip('-')):
+            job.priority = int(data['priority'])
+        for counter in ('cache_hits', 'cache_misses', 'cache_hit_bytes'):
+            if counter in data and self.is_integer(str(data[counter])):
+                setattr(job, counter, int(data[counter]))
+        if 'lease_minutes' in data and self.is_integer(str(data['lease_minutes'])) \
+            and job.status == JobStatusEnum.WAITING_4_WORKER:
+            job.reserve(data.get('reserved_by') or job.lease_holder(), int(data['lease_minutes']))
+
+        if job.status == JobStatusEnum.COMPLETE:
+            winner = self._settle_speculative(job)
+            if winner is not None:
+                self._verify(winner)
+        if job.status in (JobStatusEnum.ERROR, JobStatusEnum.TIMEOUT) and previous_status != job.status:
+            self.schedule_retry(job)
 
         # success
         return True
 
+    def patch_job(self, job_id, fields):
+        """field level update, fields not sent keep their values, return bool success"""
+        job = self.get_job(job_id)
+        if job is None:
+            return False
+        data = dict(fields)
+        data['job_id'] = job.job_id
+        if not data.get('status'):
+            data['status'] = job.status.name
+        return self.set_job(data)
+
+    @staticmethod
+    def check_preconditions(job, preconditions):
+        """true when job matches every precondition
+        each precondition maps a job field to a value or a list of allowed values"""
+        if not preconditions:
+            return True
+        current = job.as_dict()
+        for field, expected in preconditions.items():
+            if field not in current:
+                return False
+            allowed = expected if isinstance(expected, list) else [expected]
+            if current[field] not in allowed:
+                return False
+        return True
+
+    def _settle_speculative(self, winner):
+        """first completion wins, the other copy is told to stop
+        returns the reported job holding the results, None if another copy already won"""
+        if winner.primary_job_id is not None:
+            primary = self.jobs.get(winner.primary_job_id)
+            # primary retired by a reload
+            if primary is None:
+                return None
+            if primary.superseded or primary.status in JobManager.FINISHED_STATUSES:
+                return None
+            # results of the backup are reported on the primary job
+            primary.status = winner.status
+            primary.last_block_processed = winner.last_block_processed
+            primary.start_time = winner.start_time
+            primary.end_time = winner.end_time
+            primary.actual_integrity_hash = winner.actual_integrity_hash
+            primary.instance_id = winner.instance_id
+            primary.phase_times = dict(winner.phase_times)
+            primary.error_message = None
+            primary.superseded = True
+            return primary
+        if winner.backup_job_id is not None:
+            self.backups[winner.backup_job_id].superseded = True
+        return winner
+
+    def _verify(self, job):
+        """compare hashes for a completed job
+        when the expected hash is not known yet the job waits in VERIFYING"""
+        config = job.slice_config
+        if config.expected_integrity_hash:
+            job.status = JobStatusEnum.COMPLETE \
+                if config.validate_integrity_hash(job.actual_integrity_hash) \
+                else JobStatusEnum.HASH_MISMATCH
+        elif job.actual_integrity_hash:
+            job.status = JobStatusEnum.VERIFYING
+            key = (config.end_block_id, config.spring_version)
+            self.verifying.setdefault(key, set()).add(job.job_id)
+        else:
+            # no hashes to compare
+            job.status = JobStatusEnum.ERROR
+
+    def settle_verifying(self, end_block_id, spring_version):
+        """expected hash arrived for block and version, settle jobs waiting on it
+        returns list of settled jobs"""
+        settled = []
+        for job_id in self.verifying.pop((end_block_id, spring_version), set()):
+            job = self.jobs.get(job_id)
+            # skip jobs restarted while waiting
+            if job is None or job.status != JobStatusEnum.VERIFYING:
+                continue
+            self._verify(job)
+            settled.append(job)
+        return settled
+
     def set_job_from_json(self, status_as_json, jobid):
         """sets jobs data from json, calls set_job(), return bool for success"""
         data = json.loads(status_as_json)
         data['job_id'] = jobid
         return self.set_job(data)
 
-    def get_next_job(self):
-        """get a job that needs a worker"""
-        for job in self.jobs.values():
-            if job.status == JobStatusEnum.WAITING_4_WORKER:
+    # pylint: disable=too-many-arguments
+    def get_next_job(self, held_strides=None, held_snapshots=None, allow_speculative=True,
+        instance_id=None):
+        """get a job that needs a worker, highest priority first then scheduler order
+        when a host reports blocks log strides and snapshots it still holds
+        prefer the waiting job at that priority reusing the most local artifacts
+        `allow_speculative` false skips backups, used when other runs have waiting jobs
+        `instance_id` asking host, a job it leased comes first, jobs leased to others are skipped"""
+        self.requeue_failed_jobs()
+        reserved = self.get_reserved_job(instance_id)
+        if reserved is not None:
+            return reserved
+        best_job = None
+        best_score = 0
+        for job_id in self.dispatch_order:
+            job = self.jobs[job_id]
+            if job.status != JobStatusEnum.WAITING_4_WORKER or job.lease_holder() is not None:
+                continue
+            score = JobManager.locality_score(job, held_strides, held_snapshots)
+            # strictly greater keeps scheduler order within a level
+            if best_job is None or (job.priority, score) > (best_job.priority, best_score):
+                best_job = job
+                best_score = score
+        if best_job is None and self.speculative and allow_speculative:
+            return self.get_speculative_job()
+        return best_job
+
+    def get_reserved_job(self, instance_id):
+        """waiting job or backup leased to instance, None when it holds no lease"""
+        if not instance_id:
+            return None
+        for job in list(self.jobs.values()) + list(self.backups.values()):
+            if job.status == JobStatusEnum.WAITING_4_WORKER and not job.superseded \
+                and job.lease_holder() == instance_id:
                 return job
         return None
 
+    def schedule_retry(self, job):
+        """classify a failed job, sets retry_at when its error is retryable and attempts remain
+        backups are never retried, the primary is still running
+        returns retry_at, None when the job is not retried"""
+        job.retry_at = None
+        if job.status in (JobStatusEnum.ERROR, JobStatusEnum.TIMEOUT) and job.job_id in self.jobs \
+            and self.retry_policy.classify(job) == RetryPolicy.RETRYABLE:
+            job.retry_at = self.retry_policy.retry_at(max(job.attempts, 1))
+        return job.retry_at
+
+    def requeue(self, job):
+        """job starts over, its speculative backup is detached and a host running it is told to stop"""
+        backup = self.backups.get(job.backup_job_id)
+        if backup is not None:
+            backup.primary_job_id = None
+            backup.superseded = True
+        job.requeue()
+
+    def requeue_failed_jobs(self, now=None):
+        """requeue failed jobs whose backoff has passed and whose error is still retryable
+        classified again, error logs uploaded during the backoff may show a terminal error
+        returns list of requeued jobs"""
+        if now is None:
+            now = datetime.now()
+        requeued = []
+        for job in self.jobs.values():
+            if job.retry_at is None or job.retry_at > now:
+                continue
+            if job.status not in (JobStatusEnum.ERROR, JobStatusEnum.TIMEOUT):
+                # status changed while waiting, manual restart or late completion
+                job.retry_at = None
+                continue
+            if self.retry_policy.classify(job) == RetryPolicy.RETRYABLE:
+                self.requeue(job)
+                requeued.append(job)
+            else:
+                job.retry_at = None
+        return requeued
+
+    def get_speculative_job(self):
+        """backup copy of the slowest straggler for an idle host, None if no stragglers"""
+        # backup handed out but never claimed
+        for backup in self.backups.values():
+            if backup.status == JobStatusEnum.WAITING_4_WORKER and not backup.superseded \
+                and backup.lease_holder() is None:
+                return backup
+
+        working = [job for job in self.jobs.values()
+            if job.status == JobStatusEnum.WORKING and job.backup_job_id is None]
+        rates = {}
+        for job in working:
+            rate = job.blocks_per_minute(JobManager.STRAGGLER_MIN_MINUTES)
+            if rate is not None:
+                rates[job.job_id] = rate
+        if not rates:
+            return None
+        # expectation for range from history, otherwise the median of peers
+        peer_rates = sorted(rates.values())
+        median_rate = peer_rates[len(peer_rates) // 2]
+
+        straggler = None
+        longest_remaining = 0
+        for job in working:
+            if job.job_id not in rates:
+                continue
+            config = job.slice_config
+            minutes_per_block = self.estimator.minutes_per_block(
+                config.start_block_id, config.end_block_id)
+            expected_rate = 1 / minutes_per_block if minutes_per_block else median_rate
+            if expected_rate <= 0 or rates[job.job_id] >= expected_rate * JobManager.STRAGGLER_RATIO:
+                continue
+            # only worth it when starting over beats waiting
+            remaining_blocks = max(config.end_block_id - job.last_block_processed, 0)
+            remaining = remaining_blocks / rates[job.job_id] if rates[job.job_id] > 0 else float('inf')
+            fresh = (config.end_block_id - config.start_block_id) / expected_rate
+            if remaining > fresh and remaining > longest_remaining:
+                straggler = job
+                longest_remaining = remaining
+
+        if straggler is None:
+            return None
+        backup = JobStatus(straggler.slice_config)
+        backup.predicted_minutes = straggler.predicted_minutes
+        backup.primary_job_id = straggler.job_id
+        straggler.backup_job_id = backup.job_id
+        self.backups[backup.job_id] = backup
+        return backup
+
+    def set_priority(self, priority, filters, rerun=False):
+        """set priority on jobs matching filters, returns list of jobs updated
+        `rerun` requeues matching jobs that already finished"""
+        updated = []
+        for job in self.jobs.values():
+            if not JobManager.matches(job, filters):
+                continue
+            job.priority = priority
+            if rerun and job.status in (JobStatusEnum.COMPLETE, JobStatusEnum.ERROR,
+                JobStatusEnum.TIMEOUT, JobStatusEnum.HASH_MISMATCH):
+                self.requeue(job)
+            updated.append(job)
+        return updated
+
+    @staticmethod
+    def matches(job, filters):
+        """true when job matches all filters
+        `sliceids` list of replay slice ids
+        `start_block` `end_block` block range the slice overlaps
+        `statuses` list of status names
+        `spring_version` exact version"""
+        config = job.slice_config
+        if filters.get('sliceids') is not None \
+            and config.replay_slice_id not in [int(sliceid) for sliceid in filters['sliceids']]:
+            return False
+        if filters.get('start_block') is not None \
+            and config.end_block_id <= int(filters['start_block']):
+            return False
+        if filters.get('end_block') is not None \
+            and config.start_block_id >= int(filters['end_block']):
+            return False
+        if filters.get('statuses') is not None and job.status.name not in filters['statuses']:
+            return False
+        if filters.get('spring_version') is not None \
+            and config.spring_version != filters['spring_version']:
+            return False
+        return True
+
+    @staticmethod
+    def locality_score(job, held_strides, held_snapshots):
+        """weight of local artifacts a job can reuse
+        a snapshot counts double, it is the largest download"""
+        score = 0
+        if held_snapshots and job.slice_config.snapshot_name() in held_snapshots:
+            score += 2
+        if held_strides:
+            for stride in job.slice_config.blocks_log_strides():
+                if stride in held_strides:
+                    score += 1
+        return score
+
+    @staticmethod
+    def parse_held(value, as_int=False):
+        """parse comma seperated list of artifacts reported by a host"""
+        if not value:
+            return set()
+        held = set()
+        for item in value.split(','):
+            item = item.strip()
+            if not item:
+                continue
+            if as_int:
+                if not item.isnumeric():
+                    continue
+                item = int(item)
+            held.add(item)
+        return held
+
     def get_by_position(self, position):
         """returns an entry by position in interator"""
         # type check
@@ -1,5 +1,6 @@
 """Module provides job summary function"""
 from job_status import JobStatusEnum
+from throughput import Throughput
 
 # pylint: disable=too-few-public-methods disable=too-many-branches
 class JobSummary:
@@ -14,6 +15,8 @@ class JobSummary:
             'total_jobs': 0,
             'jobs_succeeded': 0,
             'jobs_failed': 0,
+            'jobs_retrying': 0,
+            'jobs_verifying': 0,
             'failed_jobs': [],
             'is_running': False
         }
@@ -37,25 +40,21 @@ class JobSummary:
             if job.status in (JobStatusEnum.LOADING_SNAPSHOT, JobStatusEnum.STARTED, JobStatusEnum.WORKING):
                 running_jobs += 1
 
-            # try to fix errors, where expected integrity hash was populated after job finish
-            # this race condition leaves job incorrectly marked as HASH_MISMATCH, and we can fix
-            if job.status == JobStatusEnum.HASH_MISMATCH:
-                if job.slice_config.expected_integrity_hash == job.actual_integrity_hash:
-                    job.status = JobStatusEnum.COMPLETE
-            # look for COMPLETE jobs witch hash mistmatch, mark status
-            if job.status == JobStatusEnum.COMPLETE \
-                and job.slice_config.expected_integrity_hash != job.actual_integrity_hash:
-                job.status = JobStatusEnum.HASH_MISMATCH
-            # look for ERROR state both hashes are None/Empty
-            if job.status == JobStatusEnum.COMPLETE \
-                and not job.slice_config.expected_integrity_hash \
-                and not job.actual_integrity_hash:
-                job.status = JobStatusEnum.ERROR
+            # hashes are compared by JobManager when jobs complete
+            # and when expected hashes arrive for VERIFYING jobs
             # process succceed jobs
             report['total_jobs'] += 1
-            if job.status == JobStatusEnum.COMPLETE \
-                and job.slice_config.expected_integrity_hash == job.actual_integrity_hash:
+            if job.status == JobStatusEnum.COMPLETE:
                 report['jobs_succeeded'] += 1
+            # finished, waiting on the expected hash from the next slice
+            if job.status == JobStatusEnum.VERIFYING:
+                report['jobs_verifying'] += 1
+            # failed jobs waiting on a retry are still part of the run
+            if job.retry_at is not None \
+                and job.status in (JobStatusEnum.ERROR, JobStatusEnum.TIMEOUT):
+                report['jobs_retrying'] += 1
+                running_jobs += 1
+                continue
             # process failed jobs
             if job.status in (JobStatusEnum.ERROR, JobStatusEnum.TIMEOUT, JobStatusEnum.HASH_MISMATCH):
                 report['jobs_failed'] += 1
@@ -63,14 +62,18 @@ class JobSummary:
                 {
                     'status': job.status.name,
                     'jobid': job.job_id ,
-                    'configid': job.slice_config.replay_slice_id
+                    'configid': job.slice_config.replay_slice_id,
+                    'attempts': job.attempts
                     })
         # set running status
         if running_jobs > 0:
             report['is_running'] = True
         if waiting_jobs == report['total_jobs']:
             report['is_running'] = False
-        if (report['jobs_succeeded'] + report['jobs_failed']) == report['total_jobs']:
+        if (report['jobs_succeeded'] + report['jobs_failed'] + report['jobs_verifying']) \
+            == report['total_jobs']:
             report['is_running'] = False
+        # blocks_per_second, eta_seconds, estimated_finish
+        report.update(Throughput.run_estimate(job_manager))
 
         return report
@@ -0,0 +1,221 @@
+"""Module indexes words in uploaded job logs and error messages for searching across a run"""
+import os
+import re
+import threading
+import zlib
+from log_store import LogStore
+from retry_policy import RetryPolicy
+
+class LogIndex:
+    """
+    Inverted index from words to the jobs whose logs or error message hold them
+    Lines are reduced to signatures, numbers, hashes and times become `#`
+    nodeos logs repeat a few signatures millions of times, each job keeps its distinct signatures
+    Lines are first grouped by a cheap shape, hex digits become `#`, only new shapes are normalized
+    Words of new signatures go in the index, a phrase is checked against the candidate jobs' signatures
+    Signatures of error lines are grouped across jobs to show what went wrong in a run
+    Sources are `wrapper` and `nodeos` logs and the job's `error_message`
+    """
+    ERROR_MESSAGE = 'error_message'
+    SOURCES = LogStore.LOG_TYPES + (ERROR_MESSAGE,)
+    # bounds memory for logs with unbounded distinct lines
+    MAX_SIGNATURES = 5000
+    MAX_ERRORS = 50
+    MAX_SIGNATURE_LENGTH = 300
+    MAX_SHAPES = 100000
+    # digits and hex letters, shapes of lines differing only in numbers and hashes match
+    SHAPE_TABLE = str.maketrans('0123456789abcdefABCDEF', '#' * 22)
+    # hex tokens holding a digit and digits inside words, like times, vary between jobs
+    NUMBER_PATTERN = re.compile(r'\b[0-9a-fA-F]*[0-9][0-9a-fA-F]*\b|[0-9]+')
+    SPACE_PATTERN = re.compile(r'[^\S\n]+')
+    WORD_PATTERN = re.compile(r'[a-z_][a-z0-9_]*')
+    # nodeos error level, wrapper script failures
+    ERROR_PATTERN = re.compile(r'^error\s|\b(ERROR|Error|FATAL|[Ff]ailed|exception)\b')
+    STORED_LOG_PATTERN = re.compile(r'^(' + '|'.join(LogStore.LOG_TYPES) + r')(\d+)\.(idx|log)$')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # word -> set of job ids
+        self.postings = {}
+        # (job id, source) -> {signature: True}, insertion ordered
+        self.signatures = {}
+        # (job id, source) -> set of line shapes already indexed
+        self.shapes = {}
+        # (job id, source) -> {error signature: first raw line}
+        self.errors = {}
+        # (job id, log type) -> end of last chunk without a newline
+        self.partial = {}
+
+    @staticmethod
+    def normalize(text):
+        """text with numbers and hashes replaced, lower case and single spaced, lines are kept"""
+        return LogIndex.SPACE_PATTERN.sub(' ', LogIndex.NUMBER_PATTERN.sub('#', text)).lower()
+
+    @staticmethod
+    def signature(line):
+        """line with numbers and hashes replaced, lower case and trimmed"""
+        return LogIndex.normalize(line).strip()[:LogIndex.MAX_SIGNATURE_LENGTH]
+
+    @staticmethod
+    def words(signature):
+        """indexed words of a signature"""
+        return set(LogIndex.WORD_PATTERN.findall(signature))
+
+    def _add_text(self, job_id, source, text):
+        """index whole lines for job, caller holds the lock
+        only the first line of each shape is normalized"""
+        signatures = self.signatures.setdefault((job_id, source), {})
+        errors = self.errors.setdefault((job_id, source), {})
+        shapes = self.shapes.setdefault((job_id, source), set())
+        for line, shape in zip(text.split('\n'), text.translate(LogIndex.SHAPE_TABLE).split('\n')):
+            if shape in shapes:
+                continue
+            if len(shapes) < LogIndex.MAX_SHAPES:
+                shapes.add(shape)
+            signature = LogIndex.signature(line)
+            if not signature or signature in signatures:
+                continue
+            is_error = source == LogIndex.ERROR_MESSAGE or LogIndex.ERROR_PATTERN.search(line)
+            if is_error and signature not in errors and len(errors) < LogIndex.MAX_ERRORS:
+                errors[signature] = line.strip()[:LogIndex.MAX_SIGNATURE_LENGTH]
+            if len(signatures) >= LogIndex.MAX_SIGNATURES:
+                continue
+            signatures[signature] = True
+            for word in LogIndex.words(signature):
+                self.postings.setdefault(word, set()).add(job_id)
+
+    def _remove(self, job_id, source):
+        """drop a source of a job from the index, caller holds the lock"""
+        signatures = self.signatures.pop((job_id, source), {})
+        self.shapes.pop((job_id, source), None)
+        self.errors.pop((job_id, source), None)
+        self.partial.pop((job_id, source), None)
+        remaining = set()
+        for other in LogIndex.SOURCES:
+            for signature in self.signatures.get((job_id, other), {}):
+                remaining.update(LogIndex.words(signature))
+        for signature in signatures:
+            for word in LogIndex.words(signature) - remaining:
+                postings = self.postings.get(word)
+                if postings is not None:
+                    postings.discard(job_id)
+                    if not postings:
+                        del self.postings[word]
+
+    def add_log(self, job_id, log_type, data, replace=False):
+        """index the next bytes of an uploaded log, `replace` when a new upload starts the log"""
+        job_id = str(job_id)
+        text = data.decode('utf-8', errors='replace')
+        with self.lock:
+            if replace:
+                self._remove(job_id, log_type)
+            # a line split across chunks is indexed once complete
+            text = self.partial.pop((job_id, log_type), '') + text
+            end = text.rfind('\n') + 1
+            self.partial[(job_id, log_type)] = text[end:]
+            self._add_text(job_id, log_type, text[:end])
+
+    def end_log(self, job_id, log_type):
+        """index the last line of a complete log"""
+        job_id = str(job_id)
+        with self.lock:
+            self._add_text(job_id, log_type, self.partial.pop((job_id, log_type), ''))
+
+    def add_chunk(self, job_id, log_type, chunk, offset, complete=False):
+        """index a gzip chunk stored by LogStore.append, a chunk at offset 0 starts the log"""
+        if chunk:
+            self.add_log(job_id, log_type, zlib.decompress(chunk, LogStore.GZIP_WBITS), offset == 0)
+        if complete:
+            self.end_log(job_id, log_type)
+
+    def set_error_message(self, job_id, error_message):
+        """replace the indexed error message of a job"""
+        job_id = str(job_id)
+        with self.lock:
+            self._remove(job_id, LogIndex.ERROR_MESSAGE)
+            if error_message:
+                self._add_text(job_id, LogIndex.ERROR_MESSAGE, error_message)
+
+    def remove_job(self, job_id):
+        """drop every source of a job from the index"""
+        job_id = str(job_id)
+        with self.lock:
+            for source in LogIndex.SOURCES:
+                self._remove(job_id, source)
+
+    def rebuild(self, log_store):
+        """index logs already stored, run once at start up"""
+        if not os.path.isdir(log_store.log_dir):
+            return
+        for file_name in sorted(os.listdir(log_store.log_dir)):
+            match = LogIndex.STORED_LOG_PATTERN.match(file_name)
+            if not match:
+                continue
+            log_type, job_id, extension = match.groups()
+            # legacy plain log alongside a chunked upload was replaced by it
+            if extension == 'log' and os.path.exists(log_store.base_path(job_id, log_type) + '.idx'):
+                continue
+            try:
+                stored = log_store.size(job_id, log_type)
+                if stored is None:
+                    continue
+                replace = True
+                for data in log_store.read(job_id, log_type, 0, stored[0]):
+                    self.add_log(job_id, log_type, data, replace)
+                    replace = False
+                self.end_log(job_id, log_type)
+            except (OSError, ValueError, zlib.error):
+                continue
+
+    def search(self, phrase, job_ids=None):
+        """jobs whose logs or error message contain the phrase, numbers match any number
+        returns {job id: {source: [matching signatures]}}, `job_ids` limits the jobs searched"""
+        needle = LogIndex.signature(phrase)
+        words = LogIndex.words(needle)
+        results = {}
+        if not needle:
+            return results
+        with self.lock:
+            if words:
+                candidates = None
+                # smallest postings first
+                for word in sorted(words, key=lambda word: len(self.postings.get(word, ()))):
+                    postings = self.postings.get(word, set())
+                    candidates = set(postings) if candidates is None else candidates & postings
+                    if not candidates:
+                        return results
+            else:
+                candidates = {job_id for job_id, _ in self.signatures}
+            if job_ids is not None:
+                candidates &= {str(job_id) for job_id in job_ids}
+            for job_id in candidates:
+                for source in LogIndex.SOURCES:
+                    matched = [signature for signature in self.signatures.get((job_id, source), {})
+                        if needle in signature]
+                    if matched:
+                        results.setdefault(job_id, {})[source] = matched[:3]
+        return results
+
+    def error_signatures(self, job_ids=None):
+        """distinct error signatures with the jobs showing them, most jobs first
+        `job_ids` limits the jobs grouped"""
+        job_filter = None if job_ids is None else {str(job_id) for job_id in job_ids}
+        groups = {}
+        with self.lock:
+            for (job_id, _), errors in self.errors.items():
+                if job_filter is not None and job_id not in job_filter:
+                    continue
+                for signature, example in errors.items():
+                    group = groups.setdefault(signature, {'signature': signature,
+                        'example': example, 'job_ids': set()})
+                    group['job_ids'].add(job_id)
+        report = []
+        for group in groups.values():
+            job_ids = sorted(group['job_ids'], key=int)
+            report.append({'signature': group['signature'],
+                'jobs': len(job_ids),
+                'job_ids': job_ids,
+                'example': group['example'],
+                'classification': RetryPolicy.classify_text(group['example'])})
+        report.sort(key=lambda group: (-group['jobs'], group['signature']))
+        return report
@@ -0,0 +1,168 @@
+"""Module stores whole job logs uploaded by replay hosts, compressed with an offset index for paging"""
+import os
+import zlib
+
+class LogStore:
+    """
+    Replay hosts upload wrapper and nodeos logs as gzip compressed chunks
+    `<log_type><job_id>.log.gz` holds the chunks as uploaded, one gzip member each, zcat reads the whole log
+    `<log_type><job_id>.idx` names the upload, then one line per chunk:
+    log offset, file offset, compressed length and log length, `complete` once the host is done
+    Chunks are only appended at the end of the log, hosts resume an interrupted upload from its size
+    A new upload for the job, like a retried attempt, replaces the log
+    Reads decompress only the chunks overlapping the requested bytes
+    `<log_type><job_id>.log` plain logs uploaded by older hosts are still read
+    """
+    LOG_TYPES = ('wrapper', 'nodeos')
+    # largest chunk a host may send, after decompression
+    MAX_CHUNK_BYTES = 16 * 1024 * 1024
+    # gzip header and trailer
+    GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+    def __init__(self, log_dir):
+        self.log_dir = log_dir
+
+    def base_path(self, job_id, log_type):
+        """path without extension, ValueError for unknown log types or job ids"""
+        if log_type not in LogStore.LOG_TYPES or not str(job_id).isdigit():
+            raise ValueError(f"unknown log {log_type} for job {job_id}")
+        return os.path.join(self.log_dir, f"{log_type}{job_id}")
+
+    def read_index(self, job_id, log_type):
+        """(upload, list of chunks, complete), upload is None when nothing was uploaded"""
+        index_path = self.base_path(job_id, log_type) + '.idx'
+        upload = None
+        chunks = []
+        complete = False
+        if not os.path.exists(index_path):
+            return upload, chunks, complete
+        with open(index_path, 'r', encoding='utf-8') as file:
+            for line in file:
+                fields = line.split()
+                if not fields:
+                    continue
+                if fields[0] == 'upload':
+                    upload = fields[1] if len(fields) > 1 else ''
+                elif fields[0] == 'complete':
+                    complete = True
+                else:
+                    chunks.append(tuple(int(field) for field in fields))
+        return upload, chunks, complete
+
+    @staticmethod
+    def log_size(chunks):
+        """log bytes held in chunks"""
+        if not chunks:
+            return 0
+        return chunks[-1][0] + chunks[-1][3]
+
+    def size(self, job_id, log_type):
+        """(log bytes, complete), None when no log was uploaded"""
+        upload, chunks, complete = self.read_index(job_id, log_type)
+        if upload is not None:
+            return LogStore.log_size(chunks), complete
+        legacy_path = self.base_path(job_id, log_type) + '.log'
+        if os.path.exists(legacy_path):
+            return os.path.getsize(legacy_path), True
+        return None
+
+    def offset(self, job_id, log_type, upload):
+        """where `upload` resumes, 0 when the stored log belongs to another upload"""
+        stored_upload, chunks, _ = self.read_index(job_id, log_type)
+        if stored_upload != upload:
+            return 0
+        return LogStore.log_size(chunks)
+
+    @staticmethod
+    def chunk_length(data):
+        """log bytes in one gzip member, ValueError when corrupt or too large"""
+        decompressor = zlib.decompressobj(LogStore.GZIP_WBITS)
+        try:
+            length = len(decompressor.decompress(data, LogStore.MAX_CHUNK_BYTES + 1))
+        except zlib.error as error:
+            raise ValueError(f"chunk is not gzip: {error}") from error
+        if length > LogStore.MAX_CHUNK_BYTES or decompressor.unconsumed_tail:
+            raise ValueError(f"chunk larger then {LogStore.MAX_CHUNK_BYTES} bytes")
+        if not decompressor.eof or decompressor.unused_data:
+            raise ValueError("chunk must be one complete gzip member")
+        return length
+
+    # pylint: disable=too-many-arguments
+    def append(self, job_id, log_type, upload, offset, data, complete=False):
+        """add gzip chunk starting at log byte `offset`, returns new log size
+        None when offset is not where `upload` resumes, a new upload starts at 0"""
+        base = self.base_path(job_id, log_type)
+        if not upload or len(upload.split()) != 1:
+            raise ValueError("upload must name the upload")
+        length = LogStore.chunk_length(data) if data else 0
+        stored_upload, chunks, _ = self.read_index(job_id, log_type)
+        if stored_upload != upload:
+            if offset != 0:
+                return None
+            # new upload replaces the log
+            chunks = []
+            os.makedirs(self.log_dir, exist_ok=True)
+            with open(base + '.idx', 'w', encoding='utf-8') as file:
+                file.write(f"upload {upload}\n")
+            if os.path.exists(base + '.log.gz'):
+                os.remove(base + '.log.gz')
+        size = LogStore.log_size(chunks)
+        if offset != size:
+            return None
+        if length:
+            file_offset = chunks[-1][1] + chunks[-1][2] if chunks else 0
+            with open(base + '.log.gz', 'ab') as file:
+                # bytes past the last indexed chunk were left by an interrupted append
+                file.truncate(file_offset)
+                file.write(data)
+            with open(base + '.idx', 'a', encoding='utf-8') as file:
+                file.write(f"{offset} {file_offset} {len(data)} {length}\n")
+        if complete:
+            with open(base + '.idx', 'a', encoding='utf-8') as file:
+                file.write("complete\n")
+        return size + length
+
+    def read(self, job_id, log_type, start, stop):
+        """generator of log bytes from start up to stop, one chunk in memory at a time"""
+        base = self.base_path(job_id, log_type)
+        upload, chunks, _ = self.read_index(job_id, log_type)
+        if upload is None:
+            with open(base + '.log', 'rb') as file:
+                file.seek(start)
+                remaining = stop - start
+                while remaining > 0:
+                    data = file.read(min(remaining, LogStore.MAX_CHUNK_BYTES))
+                    if not data:
+                        return
+                    remaining -= len(data)
+                    yield data
+            return
+        with open(base + '.log.gz', 'rb') as file:
+            for log_offset, file_offset, compressed_length, log_length in chunks:
+                if log_offset + log_length <= start:
+                    continue
+                if log_offset >= stop:
+                    return
+                file.seek(file_offset)
+                data = zlib.decompress(file.read(compressed_length), LogStore.GZIP_WBITS)
+                yield data[max(start - log_offset, 0):stop - log_offset]
+
+    def remove(self, job_id):
+        """delete every stored log of a job"""
+        for log_type in LogStore.LOG_TYPES:
+            base = self.base_path(job_id, log_type)
+            for extension in ('.idx', '.log.gz', '.log'):
+                if os.path.exists(base + extension):
+                    os.remove(base + extension)
+
+    def tail(self, job_id, log_type, max_bytes):
+        """last `max_bytes` of log as text, empty string when not found"""
+        try:
+            stored = self.size(job_id, log_type)
+        except ValueError:
+            return ''
+        if stored is None:
+            return ''
+        size, _ = stored
+        data = b''.join(self.read(job_id, log_type, max(size - max_bytes, 0), size))
+        return data.decode('utf-8', errors='replace')
@@ -0,0 +1,198 @@
+"""Module mirrors nodeos packages so replay hosts do not all download from GitHub"""
+import hashlib
+import os
+import re
+import threading
+import time
+import zipfile
+import requests
+from get_artifact_url import ArtifactURL
+
+class PackageMirror:
+    """
+    Read through store of nodeos .deb packages, one download per version or branch build
+    releases come from GitHub releases, branches from the latest CI build found by ArtifactURL
+    Downloads run in a background thread, callers see `fetching` until the package is stored
+    Packages are verified before they are served
+    - size matches Content-Length
+    - CI zip passes its CRC check and holds one .deb
+    - .deb is an ar archive
+    `<name>.sha256` is written beside each package, least recently served beyond `max_packages` are removed
+    """
+    OS = "ubuntu22.04"
+    RELEASE = re.compile(r'^v?[1-9]\.[0-9]\.[0-9][\-rc0-9]*$')
+    DEB_MAGIC = b'!<arch>\n'
+    CHUNK_SIZE = 1024 * 1024
+    # seconds a branch keeps resolving to the same CI build
+    BRANCH_SECONDS = 300
+    # seconds before a failed download is tried again
+    FAILED_SECONDS = 60
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, store_dir, repo=None, artifact=None, token=None, max_packages=20):
+        self.store_dir = store_dir
+        self.repo = repo
+        self.artifact = artifact
+        self.token = token
+        self.max_packages = max_packages
+        self.lock = threading.Lock()
+        # package name to download thread
+        self.fetching = {}
+        # package name to (time, error message)
+        self.failed = {}
+        # branch to (time, package name, url)
+        self.branches = {}
+        os.makedirs(store_dir, exist_ok=True)
+
+    @staticmethod
+    def is_release(version):
+        """true for release numbers, false for branch names"""
+        return PackageMirror.RELEASE.match(version) is not None
+
+    @staticmethod
+    def release_upstream(version):
+        """(package name, GitHub release url), same names install-nodeos.sh used"""
+        version = version.lstrip('v')
+        if version.startswith('4'):
+            name = f"leap_{version}-{PackageMirror.OS}_amd64.deb"
+            return name, f"https://github.com/AntelopeIO/leap/releases/download/v{version}/{name}"
+        if version.startswith('5'):
+            name = f"leap_{version}_amd64.deb"
+            return name, f"https://github.com/AntelopeIO/leap/releases/download/v{version}/{name}"
+        name = f"antelope-spring_{version}_amd64.deb"
+        return name, f"https://github.com/AntelopeIO/spring/releases/download/v{version}/{name}"
+
+    def branch_upstream(self, branch):
+        """(package name, CI artifact zip url) for latest build of branch, None when not found
+        name includes the artifact id, a new build is a new package"""
+        now = time.time()
+        with self.lock:
+            resolved = self.branches.get(branch)
+        if resolved and now - resolved[0] < PackageMirror.BRANCH_SECONDS:
+            return resolved[1], resolved[2]
+        if not self.repo or '/' not in self.repo:
+            return None
+        owner, repo = self.repo.split('/', 1)
+        response = ArtifactURL.deb_url_by_branch(owner, repo, branch, self.artifact, self.token)
+        if not response['success']:
+            return None
+        artifact_id = re.search(r'/artifacts/(\d+)', response['url'])
+        build = artifact_id.group(1) if artifact_id \
+            else hashlib.sha256(response['url'].encode('utf-8')).hexdigest()[:16]
+        name = f"{re.sub(r'[^a-zA-Z0-9.-]', '-', branch)}_{build}_amd64.deb"
+        with self.lock:
+            self.branches[branch] = (now, name, response['url'])
+        return name, response['url']
+
+    def upstream(self, version):
+        """(package name, url, request headers, is zip), None when branch has no build"""
+        if PackageMirror.is_release(version):
+            name, url = PackageMirror.release_upstream(version)
+            return name, url, {}, False
+        resolved = self.branch_upstream(version)
+        if resolved is None:
+            return None
+        return resolved[0], resolved[1], ArtifactURL.api_headers(self.token), True
+
+    def package_path(self, name):
+        """where a package is stored"""
+        return os.path.join(self.store_dir, os.path.basename(name))
+
+    def checksum(self, name):
+        """sha256 recorded when package was stored, None when missing"""
+        path = self.package_path(name) + '.sha256'
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as file:
+            return file.read().strip()
+
+    def status(self, version):
+        """('ready', name), ('fetching', name), ('failed', message) or ('missing', message)
+        starts one download when the package is not stored"""
+        upstream = self.upstream(version)
+        if upstream is None:
+            return 'missing', f"no build found for {version}"
+        name = upstream[0]
+        if os.path.exists(self.package_path(name)):
+            # recently served packages are kept by prune
+            os.utime(self.package_path(name))
+            return 'ready', name
+        with self.lock:
+            if name in self.fetching:
+                return 'fetching', name
+            failed = self.failed.get(name)
+            if failed and time.time() - failed[0] < PackageMirror.FAILED_SECONDS:
+                return 'failed', failed[1]
+            self.failed.pop(name, None)
+            thread = threading.Thread(target=self.fetch, args=(upstream,), daemon=True)
+            self.fetching[name] = thread
+        thread.start()
+        return 'fetching', name
+
+    def fetch(self, upstream):
+        """download, verify and store one package, failures are remembered"""
+        name, url, headers, is_zip = upstream
+        part = self.package_path(name) + '.part'
+        try:
+            self.download(url, headers, part)
+            if is_zip:
+                PackageMirror.extract_deb(part)
+            with open(part, 'rb') as file:
+                if file.read(len(PackageMirror.DEB_MAGIC)) != PackageMirror.DEB_MAGIC:
+                    raise IOError(f"{url} is not a deb package")
+            digest = hashlib.sha256()
+            with open(part, 'rb') as file:
+                for data in iter(lambda: file.read(PackageMirror.CHUNK_SIZE), b''):
+                    digest.update(data)
+            with open(self.package_path(name) + '.sha256', 'w', encoding='utf-8') as file:
+                file.write(digest.hexdigest())
+            os.replace(part, self.package_path(name))
+            self.prune()
+        except (IOError, OSError, zipfile.BadZipFile, requests.exceptions.RequestException) as error:
+            if os.path.exists(part):
+                os.remove(part)
+            with self.lock:
+                self.failed[name] = (time.time(), f"failed to mirror {name}: {error}")
+        finally:
+            with self.lock:
+                self.fetching.pop(name, None)
+
+    @staticmethod
+    def download(url, headers, path):
+        """stream url to path, size must match Content-Length"""
+        with requests.get(url, headers=headers, stream=True, timeout=30) as response:
+            if response.status_code != 200:
+                raise IOError(f"{url} returned {response.status_code}")
+            written = 0
+            with open(path, 'wb') as file:
+                for data in response.iter_content(PackageMirror.CHUNK_SIZE):
+                    file.write(data)
+                    written += len(data)
+            expected = response.headers.get('Content-Length')
+            # compressed transfers count decoded bytes
+            if expected is not None and not response.headers.get('Content-Encoding') \
+                and int(expected) != written:
+                raise IOError(f"{url} truncated at {written} of {expected} bytes")
+
+    @staticmethod
+    def extract_deb(path):
+        """replace CI zip at path with the one .deb inside it"""
+        with zipfile.ZipFile(path) as archive:
+            if archive.testzip() is not None:
+                raise IOError("CI artifact failed CRC check")
+            debs = [member for member in archive.namelist() if member.endswith('.deb')]
+            if len(debs) != 1:
+                raise IOError(f"CI artifact holds {len(debs)} deb packages, expected 1")
+            with archive.open(debs[0]) as source, open(path + '.deb', 'wb') as target:
+                for data in iter(lambda: source.read(PackageMirror.CHUNK_SIZE), b''):
+                    target.write(data)
+        os.replace(path + '.deb', path)
+
+    def prune(self):
+        """remove least recently served packages beyond max_packages"""
+        packages = [entry for entry in os.scandir(self.store_dir) if entry.name.endswith('.deb')]
+        packages.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+        for entry in packages[self.max_packages:]:
+            os.remove(entry.path)
+            if os.path.exists(entry.path + '.sha256'):
+                os.remove(entry.path + '.sha256')
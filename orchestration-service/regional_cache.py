@@ -0,0 +1,248 @@
+"""Module serves snapshots and blocks logs to replay hosts, fetching each from storage once"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import subprocess
+import threading
+import time
+from werkzeug.wrappers import Request, Response
+from werkzeug.serving import run_simple
+from werkzeug.utils import send_file
+
+#
+# Examples
+# python3 regional_cache.py --cache-dir /data/regional-cache --max-gb 2000
+# python3 regional_cache.py --cache-dir /tmp/regional-cache --store-dir /tmp/store --port 4200
+# curl -r 0-1023 http://127.0.0.1:4200/chicken-dance/mainnet/snapshots/snapshot.bin.zst
+#
+
+class S3Store:
+    """objects in s3 through the aws cli, same commands as S3Interface"""
+    @staticmethod
+    def size(bucket, path):
+        """bytes in object, None when missing"""
+        head = subprocess.run(["aws", "s3api", "head-object", "--bucket", bucket, "--key", path],
+            check=False, capture_output=True, text=True)
+        if head.returncode != 0:
+            return None
+        return int(json.loads(head.stdout)['ContentLength'])
+
+    @staticmethod
+    def download(bucket, path, local_file):
+        """copy object to local file, raises IOError on failure"""
+        download = subprocess.run(["aws", "s3", "cp", f"s3://{bucket}/{path}", local_file],
+            check=False, capture_output=True, text=True)
+        if download.returncode != 0:
+            raise IOError(f"download of s3://{bucket}/{path} failed with {download.stderr.strip()}")
+
+class LocalStore:
+    """objects under `store_dir/<bucket>/<path>`, stands in for s3 in tests"""
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+
+    def size(self, bucket, path):
+        """bytes in object, None when missing"""
+        local_file = os.path.join(self.store_dir, bucket, path)
+        if not os.path.isfile(local_file):
+            return None
+        return os.path.getsize(local_file)
+
+    def download(self, bucket, path, local_file):
+        """copy object to local file"""
+        shutil.copyfile(os.path.join(self.store_dir, bucket, path), local_file)
+
+class RegionalCache:
+    """
+    Read through cache of storage objects, shared by the replay hosts of a region
+    Objects are addressed as `<bucket>/<path>`, the same bucket and path S3Interface uses
+    The first request for an object starts one download, others wait for it
+    Stored objects are `cache_dir/<bucket>/<path>`, least recently served are removed
+    to keep the total under `max_bytes`
+    """
+    # seconds before a failed or missing object is looked up again
+    FAILED_SECONDS = 60
+
+    def __init__(self, cache_dir, store, max_bytes, buckets=None):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.store = store
+        self.max_bytes = max_bytes
+        # None allows every bucket
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        # one eviction at a time, downloads of different objects make room at once
+        self.evict_lock = threading.Lock()
+        # object name to download thread
+        self.fetching = {}
+        # object name to (time, state, message)
+        self.failed = {}
+        # served counts requests, hosts read an object in many ranges
+        self.counters = {'served': 0, 'misses': 0, 'fetched_bytes': 0, 'evicted': 0}
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def object_path(self, name):
+        """where an object is stored, None for names outside the cache"""
+        parts = name.split('/')
+        if len(parts) < 2 or any(part in ('', '.', '..') for part in parts):
+            return None
+        if self.buckets is not None and parts[0] not in self.buckets:
+            return None
+        return os.path.join(self.cache_dir, *parts)
+
+    def status(self, name):
+        """('ready', path), ('fetching', name), ('failed', message) or ('missing', message)
+        starts one download when the object is not stored"""
+        path = self.object_path(name)
+        if path is None:
+            return 'missing', f"{name} is not a cached object"
+        if os.path.isfile(path):
+            # recently served objects are kept by evict
+            os.utime(path)
+            with self.lock:
+                self.counters['served'] += 1
+            return 'ready', path
+        with self.lock:
+            if name in self.fetching:
+                return 'fetching', name
+            failed = self.failed.get(name)
+            if failed and time.time() - failed[0] < RegionalCache.FAILED_SECONDS:
+                return failed[1], failed[2]
+            self.failed.pop(name, None)
+            self.counters['misses'] += 1
+            thread = threading.Thread(target=self.fetch, args=(name,), daemon=True)
+            self.fetching[name] = thread
+        thread.start()
+        return 'fetching', name
+
+    def fetch(self, name):
+        """download one object from the store, makes room first, failures are remembered"""
+        path = self.object_path(name)
+        part = path + '.part'
+        bucket, store_path = name.split('/', 1)
+        try:
+            size = self.store.size(bucket, store_path)
+            if size is None:
+                with self.lock:
+                    self.failed[name] = (time.time(), 'missing', f"{name} does not exist")
+                return
+            if size > self.max_bytes:
+                raise IOError(f"{name} is {size} bytes, larger than the cache")
+            self.evict(size)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.store.download(bucket, store_path, part)
+            if os.path.getsize(part) != size:
+                raise IOError(f"{name} truncated at {os.path.getsize(part)} of {size} bytes")
+            os.replace(part, path)
+            with self.lock:
+                self.counters['fetched_bytes'] += size
+        except (IOError, OSError) as error:
+            logging.error("failed to cache %s: %s", name, error)
+            if os.path.exists(part):
+                os.remove(part)
+            with self.lock:
+                self.failed[name] = (time.time(), 'failed', f"failed to cache {name}: {error}")
+        finally:
+            with self.lock:
+                self.fetching.pop(name, None)
+
+    def stored(self):
+        """stored objects and downloads in progress as (modified time, bytes, path)"""
+        objects = []
+        for directory, _, files in os.walk(self.cache_dir):
+            for file in files:
+                try:
+                    stat = os.stat(os.path.join(directory, file))
+                # finished or evicted while walking
+                except FileNotFoundError:
+                    continue
+                objects.append((stat.st_mtime, stat.st_size, os.path.join(directory, file)))
+        return objects
+
+    def evict(self, incoming=0):
+        """remove least recently served objects until `incoming` more bytes fit under max_bytes
+        hosts reading a removed object finish from their open file, returns bytes removed"""
+        with self.evict_lock:
+            objects = self.stored()
+            used = sum(size for _, size, _ in objects)
+            removed = 0
+            for _, size, path in sorted(objects):
+                if used - removed + incoming <= self.max_bytes:
+                    break
+                # in progress downloads are not ours to remove
+                if path.endswith('.part'):
+                    continue
+                os.remove(path)
+                removed += size
+                with self.lock:
+                    self.counters['evicted'] += 1
+            return removed
+
+    def stats(self):
+        """counters since start, with bytes and objects stored"""
+        objects = self.stored()
+        with self.lock:
+            stats = dict(self.counters)
+            stats['fetching'] = len(self.fetching)
+        stats['objects'] = len(objects)
+        stats['stored_bytes'] = sum(size for _, size, _ in objects)
+        stats['max_bytes'] = self.max_bytes
+        return stats
+
+class RegionalCacheService:
+    """http front end, GET and HEAD `/<bucket>/<path>` with Range support, `/stats` as json"""
+    # seconds hosts wait before asking again for an object being downloaded
+    RETRY_SECONDS = 5
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    @Request.application
+    def application(self, request):
+        """route requests"""
+        if request.method not in ('GET', 'HEAD'):
+            return Response("method not supported", status=405)
+        if request.path == '/stats':
+            return Response(json.dumps(self.cache.stats()), content_type='application/json')
+        state, detail = self.cache.status(request.path.lstrip('/'))
+        if state == 'fetching':
+            return Response(f"fetching {detail}", status=503,
+                headers={'Retry-After': str(RegionalCacheService.RETRY_SECONDS)})
+        if state != 'ready':
+            return Response(detail, status=404 if state == 'missing' else 502)
+        return send_file(detail, request.environ,
+            mimetype='application/octet-stream', conditional=True)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='read through cache of snapshots and blocks logs for replay hosts'
+    )
+    parser.add_argument('--cache-dir', type=str, default='/data/regional-cache',
+        help='where objects are stored, default /data/regional-cache')
+    parser.add_argument('--max-gb', type=int, default=1000,
+        help='gigabytes of objects to keep, least recently served are removed, default 1000')
+    parser.add_argument('--store-dir', type=str, default=None,
+        help='read objects from this directory instead of s3, used for testing')
+    parser.add_argument('--bucket', type=str, action='append', default=None,
+        help='bucket to serve, may be repeated, default every bucket')
+    parser.add_argument('--port', type=int, default=4200, help='Port for cache service')
+    parser.add_argument('--host', type=str, default='0.0.0.0', help='Listening service name or ip')
+    parser.add_argument('--log', type=str, default="regional-cache.log",
+        help="log file for service")
+    args = parser.parse_args()
+
+    logging.basicConfig(filename=args.log,
+        encoding='utf-8',
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s')
+
+    object_store = LocalStore(args.store_dir) if args.store_dir else S3Store()
+    regional_cache = RegionalCache(args.cache_dir, object_store,
+        args.max_gb * 1024 * 1024 * 1024, args.bucket)
+    # clear downloads interrupted by a restart
+    for _, _, leftover in regional_cache.stored():
+        if leftover.endswith('.part'):
+            os.remove(leftover)
+    # many hosts read large objects at once
+    run_simple(args.host, args.port, RegionalCacheService(regional_cache).application,
+        threaded=True)
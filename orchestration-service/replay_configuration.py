@@ -17,7 +17,11 @@ class BlockConfigManager:
     `expected_integrity_hash` at end of block
     `nodeos_version` Maj.Min.Patch-rcN or Maj.Min.Patch-commithash
     `replay_slice_id` unique id for this replay config
+    `priority` optional, jobs with higher priority are handed out first, defaults to 0
     """
+    # blocks logs are archived in increments of 2,000,000 blocks
+    BLOCKS_LOG_STRIDE = 2000000
+
     def __init__(self, block_record, primary_key):
         self.start_block_id = int(block_record['start_block_id'])
         self.end_block_id = int(block_record['end_block_id'])
@@ -26,6 +30,7 @@ class BlockConfigManager:
         self.expected_integrity_hash = block_record['expected_integrity_hash']
         self.spring_version = block_record['spring_version']
         self.replay_slice_id = primary_key
+        self.priority = int(block_record.get('priority', 0))
 
     def get_snapshot_path(self):
         """return snapshot path on replay node"""
@@ -37,6 +42,28 @@ class BlockConfigManager:
         """private function to validate storage types"""
         return self.storage_type in ["s3","filesystem","fs"]
 
+    def blocks_log_strides(self):
+        """first block of each blocks log stride covering this slice
+        matches the `blocks-<first>-<last>.log.zst` names in cloud storage
+        and the bounds calculated in replay-client/manage_blocks_log.sh"""
+        stride = BlockConfigManager.BLOCKS_LOG_STRIDE
+        lower_bound = max(self.start_block_id, 1) // stride * stride
+        strides = []
+        while lower_bound < self.end_block_id:
+            strides.append(lower_bound + 1)
+            lower_bound += stride
+        return strides
+
+    def identity(self):
+        """slices with the same identity do the same work, used to diff manifests"""
+        return (self.start_block_id, self.end_block_id, self.snapshot_path, self.spring_version)
+
+    def snapshot_name(self):
+        """file name of snapshot, how replay hosts report snapshots they hold"""
+        if not self.snapshot_path:
+            return None
+        return os.path.basename(self.snapshot_path)
+
     def validate_integrity_hash(self, computed_integrity_hash):
         """returns bool compared hash in config (expected) to computed_integrity_hash (actual)"""
         return computed_integrity_hash == self.expected_integrity_hash
@@ -54,6 +81,9 @@ class BlockConfigManager:
         this_dict['storage_type'] = self.storage_type
         this_dict['expected_integrity_hash'] = self.expected_integrity_hash
         this_dict['spring_version'] = self.spring_version
+        # optional, only written when set to keep manifests unchanged
+        if self.priority:
+            this_dict['priority'] = self.priority
         return this_dict
 
 class ReplayConfigManager:
@@ -64,9 +94,11 @@ class ReplayConfigManager:
     provides accessor methods
     single member `records` array of BlockConfig
     """
+    # path to (modification time, parsed json records), files are parsed once per change
+    parse_cache = {}
+
     def __init__(self, json_file_path):
-        with open(json_file_path, 'r', encoding='utf-8') as jobs_config_file:
-            records = json.load(jobs_config_file)
+        records = ReplayConfigManager.load_records(json_file_path)
         self.records = []
         self.current = 0
         # preserve path to dump after changes
@@ -79,6 +111,18 @@ class ReplayConfigManager:
             self.records.append(BlockConfigManager(block, generated_id))
             generated_id += 1
 
+    @staticmethod
+    def load_records(json_file_path):
+        """parsed json records, cached until the file modification time changes"""
+        mtime = os.stat(json_file_path).st_mtime_ns
+        cached = ReplayConfigManager.parse_cache.get(json_file_path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        with open(json_file_path, 'r', encoding='utf-8') as jobs_config_file:
+            records = json.load(jobs_config_file)
+        ReplayConfigManager.parse_cache[json_file_path] = (mtime, records)
+        return records
+
     def __iter__(self):
         return self
 
@@ -1,15 +1,16 @@
 """Templates for reports HTML headers, CSS, any JS"""
+from throughput import Throughput
 
 class ReportTemplate:
     """Static method for reports. Headers, footers, and item listings"""
 
     @staticmethod
-    def status_html_report(results):
-        """HTML Report"""
+    def status_html_report(results, estimates=None):
+        """HTML Report, estimates maps job id to (blocks_per_second, eta_seconds)"""
         # Converting to simple HTML representation (adjust as needed)
         content = ReportTemplate.status_html_header()
         for config in results:
-            content += ReportTemplate.status_html(config)
+            content += ReportTemplate.status_html(config, ReportTemplate.estimate(estimates, config))
         content += ReportTemplate.status_html_footer()
         return content
 
@@ -46,12 +47,14 @@ li { padding: .5em }
         return "</body></html>"
 
     @staticmethod
-    def status_html(this_slice):
+    def status_html(this_slice, estimate=(None, None)):
         """HTML Template For Status Report"""
         return f"""        <ul>
         <li> <a href=\"/config?sliceid={this_slice.slice_config.replay_slice_id}\">Replay Slice Id: {this_slice.slice_config.replay_slice_id}</a></li>
         <li> Job Status: {this_slice.status.name}</li>
         <li> Last Block Processed: {this_slice.last_block_processed}</li>
+        <li> Blocks Per Second: {ReportTemplate.rate(estimate[0])}</li>
+        <li> Time Remaining: {Throughput.format_eta(estimate[1])}</li>
         <li> Start Time: {this_slice.start_time}</li>
         <li> End Time: {this_slice.end_time}</li>
         <li> Start Block: {this_slice.slice_config.start_block_id}</li>
@@ -62,12 +65,12 @@ li { padding: .5em }
 """
 
     @staticmethod
-    def status_text_report(results):
-        """TEXT Report"""
+    def status_text_report(results, estimates=None):
+        """TEXT Report, estimates maps job id to (blocks_per_second, eta_seconds)"""
         # Converting to simple HTML representation (adjust as needed)
         content = ReportTemplate.status_text_header()
         for config in results:
-            content += ReportTemplate.status_text(config)
+            content += ReportTemplate.status_text(config, ReportTemplate.estimate(estimates, config))
         content += ReportTemplate.status_text_footer()
         return content
 
@@ -77,11 +80,13 @@ li { padding: .5em }
         return "      JOB REPORT              \n-------------------------------------\n"
 
     @staticmethod
-    def status_text(this_slice):
+    def status_text(this_slice, estimate=(None, None)):
         """Text Template For Status Report"""
         return f""" Replay Slice Id: {this_slice.slice_config.replay_slice_id}
     Job Status: {this_slice.status.name}
     Last Block Processed: {this_slice.last_block_processed}
+    Blocks Per Second: {ReportTemplate.rate(estimate[0])}
+    Time Remaining: {Throughput.format_eta(estimate[1])}
     Start Time: {this_slice.start_time}
     End Time: {this_slice.end_time}
     Start Block: {this_slice.slice_config.start_block_id}
@@ -89,6 +94,20 @@ li { padding: .5em }
     Actual End Block Integrity Hash: {this_slice.actual_integrity_hash}
     Expected End Block Integ Hash: {this_slice.slice_config.expected_integrity_hash}\n"""
 
+    @staticmethod
+    def estimate(estimates, this_slice):
+        """(blocks_per_second, eta_seconds) for job, unknown when not estimated"""
+        if not estimates or this_slice.job_id not in estimates:
+            return (None, None)
+        return estimates[this_slice.job_id]
+
+    @staticmethod
+    def rate(blocks_per_second):
+        """rounded rate for reports"""
+        if blocks_per_second is None:
+            return "unknown"
+        return round(blocks_per_second, 2)
+
     @staticmethod
     def status_text_footer():
         """Text Footer for Status Report"""
@@ -161,6 +180,11 @@ li { padding: .5em }
         content += f" {round(report['blocks_processed']*100/report['total_blocks'],0)}% block processed\n"
         content += f"Completed Jobs Succeeded {report['jobs_succeeded']} Completed Jobs Failed {report['jobs_failed']}\n"
         content += f"Jobs Remaining {report['total_jobs'] - report['jobs_succeeded'] - report['jobs_failed']}\n"
+        if report['jobs_retrying'] > 0:
+            content += f"Jobs Awaiting Retry {report['jobs_retrying']}\n"
+        content += f"Blocks Per Second {report['blocks_per_second']}\n"
+        content += f"Time Remaining {Throughput.format_eta(report['eta_seconds'])}"
+        content += f" Estimated Finish {report['estimated_finish'] or 'unknown'}\n"
         if len(report['failed_jobs']) > 0:
             content += "-------------FAILED JOBS-------------\n"
             for job in report['failed_jobs']:
@@ -233,6 +257,11 @@ padding: 0;
         content += f"<li>Completed Jobs Succeeded {report['jobs_succeeded']}</li>\n"
         content += f"<li>Completed Jobs Failed {report['jobs_failed']}</li>\n"
         content += f"<li>Jobs Remaining {report['total_jobs'] - report['jobs_succeeded'] - report['jobs_failed']}</li>\n"
+        if report['jobs_retrying'] > 0:
+            content += f"<li>Jobs Awaiting Retry {report['jobs_retrying']}</li>\n"
+        content += f"<li>Blocks Per Second {report['blocks_per_second']}</li>\n"
+        content += f"<li>Time Remaining {Throughput.format_eta(report['eta_seconds'])}</li>\n"
+        content += f"<li>Estimated Finish {report['estimated_finish'] or 'unknown'}</li>\n"
         content += "</ul>\n"
         if len(report['failed_jobs']) > 0:
             content += "<h3>Failed Jobs</h3>\n"
@@ -0,0 +1,96 @@
+"""Module decides when failed jobs are retried"""
+import re
+from datetime import datetime, timedelta
+from log_store import LogStore
+
+class RetryPolicy:
+    """
+    Classifies failed jobs as retryable or terminal
+    Retryable jobs are requeued after an exponential backoff
+    `max_attempts` total tries for a job including the first, 1 disables retries
+    `base_minutes` backoff before the first retry, doubles each attempt
+    `max_minutes` longest backoff
+    `log_reader` optional callable taking a job id returning uploaded log text
+    """
+    RETRYABLE = 'retryable'
+    TERMINAL = 'terminal'
+    # checked first, failures no retry will fix
+    TERMINAL_PATTERNS = [
+        r'Cannot run as root user',
+        r'Unknown snapshot type',
+        r'database dirty flag',
+        r'unlinkable block',
+        r'integrity hash mismatch',
+    ]
+    # infrastructure failures that usually pass
+    RETRYABLE_PATTERNS = [
+        r'Failed to unzip snapshot',
+        r'Failed to restore blocks\.log',
+        r'Failed to aquire job',
+        r'SIGTERM',
+        r'SIGINT',
+        r'does not have 40Gb free space',
+        r'[Cc]onnection (reset|refused|timed out|aborted)',
+        r'[Tt]imed? ?out',
+        r'SlowDown',
+        r'[Tt]hrottl',
+        r'Service Unavailable',
+        r'InternalError',
+        r'download failed',
+        r'Could not connect to the endpoint URL',
+    ]
+
+    def __init__(self, max_attempts=3, base_minutes=5, max_minutes=60, log_reader=None):
+        self.max_attempts = max_attempts
+        self.base_minutes = base_minutes
+        self.max_minutes = max_minutes
+        self.log_reader = log_reader
+
+    def backoff(self, attempts):
+        """time to wait before requeue after given number of attempts"""
+        minutes = self.base_minutes * 2 ** max(attempts - 1, 0)
+        return timedelta(minutes=min(minutes, self.max_minutes))
+
+    def retry_at(self, attempts):
+        """when a job failing after attempts may be requeued, None if out of attempts"""
+        if attempts >= self.max_attempts:
+            return None
+        return datetime.now() + self.backoff(attempts)
+
+    @staticmethod
+    def classify_text(text):
+        """retryable or terminal from error text, unknown errors are terminal"""
+        if not text:
+            return RetryPolicy.TERMINAL
+        for pattern in RetryPolicy.TERMINAL_PATTERNS:
+            if re.search(pattern, text):
+                return RetryPolicy.TERMINAL
+        for pattern in RetryPolicy.RETRYABLE_PATTERNS:
+            if re.search(pattern, text):
+                return RetryPolicy.RETRYABLE
+        return RetryPolicy.TERMINAL
+
+    def classify(self, job):
+        """classify using error message and uploaded error logs
+        timeouts are retryable unless the logs show a terminal error"""
+        text = job.error_message if job.error_message else ''
+        if self.log_reader:
+            text += '\n' + self.log_reader(job.job_id)
+        if job.status.name == 'TIMEOUT':
+            text += '\ntimed out'
+        return RetryPolicy.classify_text(text)
+
+class ErrorLogReader:
+    """Reads the end of wrapper and nodeos logs replay hosts upload to /joblog, see log_store.py"""
+    # errors are logged last, whole logs can be large
+    TAIL_BYTES = 64 * 1024
+
+    def __init__(self, log_dir='/var/log/jobfiles'):
+        self.log_store = LogStore(log_dir)
+
+    def __call__(self, job_id):
+        """end of wrapper and nodeos logs for job, empty string when not found"""
+        contents = ''
+        for log_type in LogStore.LOG_TYPES:
+            contents += self.log_store.tail(job_id, log_type, ErrorLogReader.TAIL_BYTES)
+        return contents
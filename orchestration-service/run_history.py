@@ -0,0 +1,144 @@
+"""Module archives finished runs for queries across runs"""
+import sqlite3
+from datetime import datetime
+
+class RunHistory:
+    """
+    Embedded sqlite store of finished runs
+    one row per run in `runs`, one row per slice in `slices`
+    slices hold version, hashes, status, host, error and minutes spent in each phase
+    phases are startup (STARTED to LOADING_SNAPSHOT), loading (LOADING_SNAPSHOT to WORKING),
+    and working (WORKING to finished)
+    """
+    SCHEMA = [
+        """CREATE TABLE IF NOT EXISTS runs (
+            run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            config TEXT,
+            start_time TEXT,
+            archived_at TEXT NOT NULL)""",
+        """CREATE TABLE IF NOT EXISTS slices (
+            run_id INTEGER NOT NULL REFERENCES runs(run_id),
+            replay_slice_id INTEGER,
+            start_block INTEGER NOT NULL,
+            end_block INTEGER NOT NULL,
+            snapshot_path TEXT,
+            spring_version TEXT,
+            status TEXT,
+            expected_hash TEXT,
+            actual_hash TEXT,
+            start_time TEXT,
+            end_time TEXT,
+            startup_minutes REAL,
+            loading_minutes REAL,
+            working_minutes REAL,
+            total_minutes REAL,
+            instance_id TEXT,
+            attempts INTEGER,
+            error_message TEXT)""",
+        "CREATE INDEX IF NOT EXISTS slices_by_range ON slices (start_block, end_block, run_id)",
+        "CREATE INDEX IF NOT EXISTS slices_by_status ON slices (status, run_id)",
+    ]
+    FINISHED_PHASES = ('VERIFYING', 'COMPLETE', 'HASH_MISMATCH', 'ERROR', 'TIMEOUT')
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        # web service is single threaded, autoscale thread never touches history
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        with self.connection:
+            for statement in RunHistory.SCHEMA:
+                self.connection.execute(statement)
+
+    @staticmethod
+    def phase_minutes(phase_times, first, last_phases):
+        """minutes between entering first phase and the earliest of last phases, None if unknown"""
+        if first not in phase_times:
+            return None
+        ends = [phase_times[phase] for phase in last_phases if phase in phase_times]
+        if not ends:
+            return None
+        minutes = (min(ends) - phase_times[first]).total_seconds() / 60
+        return round(minutes, 2) if minutes >= 0 else None
+
+    @staticmethod
+    def slice_row(run_id, job):
+        """tuple of values for slices table from a job"""
+        config = job.slice_config
+        phases = job.phase_times
+        finished = RunHistory.FINISHED_PHASES
+        return (run_id,
+            config.replay_slice_id,
+            config.start_block_id,
+            config.end_block_id,
+            config.snapshot_path,
+            config.spring_version,
+            job.status.name,
+            config.expected_integrity_hash,
+            job.actual_integrity_hash,
+            job.start_time,
+            job.end_time,
+            RunHistory.phase_minutes(phases, 'STARTED', ('LOADING_SNAPSHOT',)),
+            RunHistory.phase_minutes(phases, 'LOADING_SNAPSHOT', ('WORKING',)),
+            RunHistory.phase_minutes(phases, 'WORKING', finished),
+            RunHistory.phase_minutes(phases, 'STARTED', finished),
+            job.instance_id,
+            job.attempts,
+            job.error_message)
+
+    def archive(self, name, config, job_manager):
+        """store all jobs of a run, returns new run id"""
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO runs (name, config, start_time, archived_at) VALUES (?, ?, ?, ?)",
+                (name, config, job_manager.start_time,
+                    datetime.now().strftime('%Y-%m-%dT%H:%M:%S')))
+            run_id = cursor.lastrowid
+            self.connection.executemany(
+                "INSERT INTO slices VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [RunHistory.slice_row(run_id, job) for job in job_manager.get_all().values()])
+        return run_id
+
+    def runs(self, limit=20):
+        """most recent archived runs"""
+        rows = self.connection.execute(
+            "SELECT * FROM runs ORDER BY run_id DESC LIMIT ?", (limit,))
+        return [dict(row) for row in rows]
+
+    def slice_durations(self, start_block, end_block, limit=10):
+        """slice with exact block range across the most recent runs, newest first"""
+        rows = self.connection.execute(
+            """SELECT runs.run_id, runs.name, runs.archived_at, slices.*
+            FROM slices JOIN runs ON runs.run_id = slices.run_id
+            WHERE slices.start_block = ? AND slices.end_block = ?
+            ORDER BY slices.run_id DESC LIMIT ?""",
+            (start_block, end_block, limit))
+        return [dict(row) for row in rows]
+
+    def first_mismatch(self, start_block, end_block):
+        """earliest run where a slice overlapping block range mismatched, None if never"""
+        row = self.connection.execute(
+            """SELECT runs.run_id, runs.name, runs.archived_at, slices.*
+            FROM slices JOIN runs ON runs.run_id = slices.run_id
+            WHERE slices.status = 'HASH_MISMATCH'
+            AND slices.start_block < ? AND slices.end_block > ?
+            ORDER BY slices.run_id ASC LIMIT 1""",
+            (end_block, start_block)).fetchone()
+        return dict(row) if row else None
+
+    def query(self, query, limit, start_block=None, end_block=None):
+        """results of a `runs`, `durations` or `first_mismatch` query, None when no mismatch found
+        raises ValueError for unknown queries and block queries missing a block"""
+        if query == 'runs':
+            return self.runs(limit)
+        if query not in ('durations', 'first_mismatch'):
+            raise ValueError(f"Unknown query {query}")
+        if start_block is None or end_block is None:
+            raise ValueError("Requires start_block and end_block")
+        if query == 'durations':
+            return self.slice_durations(start_block, end_block, limit)
+        return self.first_mismatch(start_block, end_block)
+
+    def close(self):
+        """close database connection"""
+        self.connection.close()
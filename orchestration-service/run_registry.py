@@ -0,0 +1,139 @@
+"""Module holds named runs sharing one fleet of replay hosts"""
+from replay_configuration import ReplayConfigManager
+from job_status import JobManager
+from job_summary import JobSummary
+from throughput import Throughput
+
+# pylint: disable=too-few-public-methods
+class Run:
+    """
+    Named run with its own manifest, job state and summary
+    `weight` share of replay hosts relative to other runs at the same priority,
+        runs are compared by the jobs they have in progress
+    `priority` runs with higher priority are served first
+    """
+    # pylint: disable=too-many-arguments
+    def __init__(self, name, jobs_config, weight=1, priority=0, job_options=None):
+        self.name = name
+        self.jobs_config = jobs_config
+        self.weight = weight if weight and weight > 0 else 1
+        self.priority = priority
+        self.replay_config_manager = ReplayConfigManager(jobs_config)
+        options = job_options if job_options else {}
+        self.jobs = JobManager(self.replay_config_manager, **options)
+
+    def reload(self, jobs_config):
+        """load a new manifest keeping state for unchanged slices, returns counts"""
+        replay_config_manager = ReplayConfigManager(jobs_config)
+        counts = self.jobs.reload(replay_config_manager)
+        self.jobs_config = jobs_config
+        self.replay_config_manager = replay_config_manager
+        return counts
+
+    def in_progress(self):
+        """jobs and speculative backups of this run holding a replay host now"""
+        jobs = list(self.jobs.get_all().values()) + list(self.jobs.backups.values())
+        return sum(1 for job in jobs if job.status in Throughput.IN_PROGRESS and not job.superseded)
+
+    def share(self):
+        """jobs in progress per unit of weight, lowest share is served next"""
+        return self.in_progress() / self.weight
+
+    def as_dict(self):
+        """converts run to a dictionary, includes summary"""
+        report = JobSummary.create(self.jobs)
+        self.jobs.update_running_status(report['is_running'])
+        return {
+            'name': self.name,
+            'config': self.jobs_config,
+            'weight': self.weight,
+            'priority': self.priority,
+            'in_progress': self.in_progress(),
+            'total_jobs': report['total_jobs'],
+            'jobs_succeeded': report['jobs_succeeded'],
+            'jobs_failed': report['jobs_failed'],
+            'blocks_per_second': report['blocks_per_second'],
+            'estimated_finish': report['estimated_finish'],
+            'is_running': report['is_running']
+        }
+
+class RunRegistry:
+    """
+    Runs by name, the `default` run always exists
+    Dispatches next jobs across runs by priority then weighted fair share
+    Provides `get_all()` and `backups` across runs so it can stand in for a JobManager
+    `job_options` keyword arguments passed to each run's JobManager
+    """
+    DEFAULT_RUN = 'default'
+
+    def __init__(self, job_options=None):
+        self.job_options = job_options if job_options else {}
+        self.runs = {}
+
+    # pylint: disable=too-many-arguments
+    def add(self, name, jobs_config, weight=1, priority=0):
+        """add a run, replaces existing run with the same name, returns run"""
+        run = Run(name, jobs_config, weight, priority, self.job_options)
+        self.runs[name] = run
+        return run
+
+    def remove(self, name):
+        """remove a run, the default run can not be removed, return bool success"""
+        if name == RunRegistry.DEFAULT_RUN or name not in self.runs:
+            return False
+        del self.runs[name]
+        return True
+
+    def get(self, name=None):
+        """run by name, default run when name is empty, None when not found"""
+        if not name:
+            name = RunRegistry.DEFAULT_RUN
+        return self.runs.get(name)
+
+    def find_job(self, job_id):
+        """search all runs for job id, returns (run, job) or (None, None)"""
+        for run in self.runs.values():
+            job = run.jobs.get_job(job_id)
+            if job is not None:
+                return run, job
+        return None, None
+
+    def next_job(self, held_strides=None, held_snapshots=None, instance_id=None):
+        """next job across runs, returns (run, job) or (None, None)
+        a job leased to `instance_id` comes first
+        waiting jobs from any run are handed out before speculative backups"""
+        for run in self.runs.values():
+            job = run.jobs.get_reserved_job(instance_id)
+            if job is not None:
+                return run, job
+        ordered = sorted(self.runs.values(), key=lambda run: (-run.priority, run.share()))
+        for allow_speculative in (False, True):
+            for run in ordered:
+                job = run.jobs.get_next_job(held_strides, held_snapshots, allow_speculative,
+                    instance_id)
+                if job is not None:
+                    return run, job
+        return None, None
+
+    def is_running(self):
+        """true when any run has jobs in progress"""
+        return any(run.jobs.is_running for run in self.runs.values())
+
+    def get_all(self):
+        """jobs from all runs"""
+        all_jobs = {}
+        for run in self.runs.values():
+            all_jobs.update(run.jobs.get_all())
+        return all_jobs
+
+    @property
+    def backups(self):
+        """speculative backups from all runs"""
+        all_backups = {}
+        for run in self.runs.values():
+            all_backups.update(run.jobs.backups)
+        return all_backups
+
+    def __len__(self):
+        """total jobs across runs"""
+        return sum(len(run.jobs) for run in self.runs.values())
@@ -8,6 +8,18 @@ cp ../../meta-data/test-simple-jobs.json ../../meta-data/test-modify-jobs.json
 pytest test_summary_report.py
 pytest test_replay_configuration.py
 pytest test_jobs_class.py
+pytest test_duration_estimator.py
+pytest test_speculative_jobs.py
+pytest test_autoscaler.py
+pytest test_retry_policy.py
+pytest test_run_registry.py
+pytest test_run_history.py
+pytest test_job_export.py
+pytest test_throughput.py
+pytest test_package_mirror.py
+pytest test_regional_cache.py
+pytest test_log_store.py
+pytest test_log_index.py
 # dump and remove file used for persistance testing
 DIFF_CNT=$(diff ../../meta-data/test-simple-jobs.json ../../meta-data/test-modify-jobs.json | grep "^>" | wc -l)
 if [ "$DIFF_CNT" -lt 1 ]; then
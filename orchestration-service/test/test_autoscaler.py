@@ -0,0 +1,101 @@
+"""Module provides testing for autoscaling replay hosts"""
+import pytest
+from replay_configuration import ReplayConfigManager
+from job_status import JobManager, JobStatusEnum
+from host_runner import Hosts
+from autoscaler import Autoscaler, ShellProvisioner
+
+class FakeProvisioner:
+    """records launch and terminate calls instead of calling aws"""
+    def __init__(self):
+        self.launched = 0
+        self.terminated = []
+
+    def launch(self, count):
+        self.launched += count
+        return True
+
+    def terminate(self, instance_id):
+        self.terminated.append(instance_id)
+        return True
+
+@pytest.fixture
+def manager():
+    return JobManager(ReplayConfigManager('../../meta-data/test-simple-jobs.json'))
+
+def test_scale_up(manager):
+    provisioner = FakeProvisioner()
+    hosts = Hosts('env')
+    remaining = Autoscaler.remaining_minutes(manager)
+    assert remaining > 0
+    # target so small every job needs a host, capped by job count
+    autoscaler = Autoscaler(provisioner, target_minutes=remaining / 100)
+    actions = autoscaler.evaluate(manager, hosts)
+    assert actions['launched'] == 3
+    assert provisioner.launched == 3
+    assert hosts.host_count == 3
+    # nothing more to do
+    actions = autoscaler.evaluate(manager, hosts)
+    assert actions['launched'] == 0
+    assert actions['terminated'] == []
+
+def test_scale_down_idle(manager):
+    provisioner = FakeProvisioner()
+    hosts = Hosts('env')
+    hosts.set_count(3)
+    for position, instance_id in ((1, 'i-1'), (2, 'i-2'), (3, 'i-3')):
+        job = manager.get_by_position(position)
+        manager.set_job({'job_id': job.job_id, 'status': 'STARTED', 'instance_id': instance_id})
+        hosts.record_instance(instance_id)
+    # two jobs finish, their hosts are idle
+    for position in (1, 2):
+        job = manager.get_by_position(position)
+        manager.set_job({'job_id': job.job_id, 'status': 'COMPLETE'})
+    assert sorted(Autoscaler.idle_instances(manager, hosts)) == ['i-1', 'i-2']
+    autoscaler = Autoscaler(provisioner, target_minutes=100000)
+    # plan reported by GET /autoscale, nothing is terminated
+    report = autoscaler.report(manager, hosts)
+    assert report['current_hosts'] == 3
+    assert report['desired_hosts'] == 1
+    assert sorted(report['idle_instances']) == ['i-1', 'i-2']
+    assert not provisioner.terminated
+    actions = autoscaler.evaluate(manager, hosts)
+    assert actions['desired_hosts'] == 1
+    assert sorted(provisioner.terminated) == ['i-1', 'i-2']
+    assert hosts.host_count == 1
+    assert 'i-3' in hosts.instances
+
+def test_remaining_shrinks_with_progress(manager):
+    before = Autoscaler.remaining_minutes(manager)
+    job = manager.get_by_position(1)
+    job.status = JobStatusEnum.WORKING
+    span = job.slice_config.end_block_id - job.slice_config.start_block_id
+    job.last_block_processed = job.slice_config.start_block_id + span // 2
+    assert Autoscaler.remaining_minutes(manager) < before
+
+def test_scale_by_slots(manager):
+    provisioner = FakeProvisioner()
+    hosts = Hosts('env')
+    hosts.record_instance('i-1')
+    hosts.record_slots('i-1', '2')
+    # bad advertisements are ignored
+    hosts.record_slots('i-2', 'many')
+    hosts.record_slots('i-3', 0)
+    assert hosts.slots_per_host() == 2
+    assert hosts.slot_count() == 2
+    remaining = Autoscaler.remaining_minutes(manager)
+    # every job needs a slot, two slots per host
+    autoscaler = Autoscaler(provisioner, target_minutes=remaining / 100)
+    actions = autoscaler.evaluate(manager, hosts)
+    assert actions['desired_hosts'] == 2
+    assert provisioner.launched == 2
+    assert Hosts.slot_name('i-1', '0') == 'i-1'
+    assert Hosts.slot_name('i-1', None) == 'i-1'
+    assert Hosts.slot_name('i-1', '2') == 'i-1/2'
+    hosts.remove_instance('i-1')
+    assert hosts.slots_per_host() == 1
+
+def test_missing_script(tmp_path):
+    provisioner = ShellProvisioner(str(tmp_path))
+    assert not provisioner.launch(1)
+    assert 'run-replay-instance.sh' in provisioner.last_error
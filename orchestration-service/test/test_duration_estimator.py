@@ -0,0 +1,57 @@
+"""Module provides testing for predicting job durations and longest first scheduling"""
+import pytest
+from duration_estimator import DurationEstimator
+from replay_configuration import ReplayConfigManager
+from job_status import JobManager
+
+@pytest.fixture
+def history_file(tmp_path):
+    """block timings as written by process_orchestration_log.py --block-times"""
+    path = tmp_path / "block-times.csv"
+    path.write_text("323611371, 323784127, 0.01, 18000.0\n"
+        "323784127, 323956925, 0.05, 3600.0\n"
+        "323956925, 324302525, 0.001, 180000.0\n"
+        "bad, row\n", encoding='utf-8')
+    return str(path)
+
+def test_predict_without_history():
+    estimator = DurationEstimator()
+    assert not estimator.has_history()
+    # falls back to block span
+    assert estimator.predict_minutes(0, 2000) > estimator.predict_minutes(0, 1000)
+
+def test_predict_with_history(history_file):
+    estimator = DurationEstimator(history_file)
+    assert estimator.has_history()
+    assert estimator.minutes_per_block(323611371, 323784127) == pytest.approx(0.01)
+    # overlaps half of each historical range
+    mid_rate = estimator.minutes_per_block(323697749, 323870526)
+    assert mid_rate == pytest.approx(0.03, rel=0.01)
+    # no overlap
+    assert estimator.minutes_per_block(1, 1000) is None
+
+def test_longest_first_order(history_file):
+    replay_config_manager = ReplayConfigManager('../../meta-data/test-simple-jobs.json')
+    fifo = JobManager(replay_config_manager)
+    assert fifo.get_next_job().slice_config.replay_slice_id == 1
+    # without history the biggest block span goes first
+    longest = JobManager(replay_config_manager, 'longest-first')
+    assert longest.get_next_job().slice_config.replay_slice_id == 3
+    # slow history for second slice puts it first
+    longest = JobManager(replay_config_manager, 'longest-first', DurationEstimator(history_file))
+    assert longest.get_next_job().slice_config.replay_slice_id == 2
+
+def test_bad_scheduler():
+    replay_config_manager = ReplayConfigManager('../../meta-data/test-simple-jobs.json')
+    with pytest.raises(ValueError):
+        JobManager(replay_config_manager, 'random')
+
+def test_realistic_rates(tmp_path):
+    """one hour over a ~172k block slice is about 0.00035 minutes per block"""
+    path = tmp_path / "block-times.csv"
+    path.write_text("323611371, 323784127, 0.00034731, 518258.0\n"
+        "323784127, 323956925, 0.00138891, 129600.0\n", encoding='utf-8')
+    estimator = DurationEstimator(str(path))
+    assert estimator.has_history()
+    assert estimator.predict_minutes(323611371, 323784127) == pytest.approx(60, rel=0.01)
+    assert estimator.predict_minutes(323784127, 323956925) == pytest.approx(240, rel=0.01)
@@ -0,0 +1,38 @@
+"""Module provides testing for streaming job exports"""
+import csv
+import json
+import types
+from replay_configuration import ReplayConfigManager
+from job_status import JobManager, JobStatusEnum
+from job_export import JobExport
+
+def build_manager():
+    """manager with second job complete"""
+    manager = JobManager(ReplayConfigManager('../../meta-data/test-simple-jobs.json'))
+    manager.get_by_position(2).status = JobStatusEnum.COMPLETE
+    return manager
+
+def test_ndjson_export():
+    manager = build_manager()
+    stream = JobExport.stream(manager.get_all(), {}, 'ndjson')
+    # generator, rows are produced as they are read
+    assert isinstance(stream, types.GeneratorType)
+    rows = [json.loads(line) for line in stream]
+    assert len(rows) == 3
+    assert rows[1]['status'] == 'COMPLETE'
+    assert rows[0]['attempts'] == 0
+
+def test_csv_export_with_filter():
+    manager = build_manager()
+    filters = JobExport.filters_from_args({'statuses': 'COMPLETE, ERROR'})
+    assert filters == {'statuses': ['COMPLETE', 'ERROR']}
+    text = "".join(JobExport.stream(manager.get_all(), filters, 'csv'))
+    rows = list(csv.DictReader(text.splitlines()))
+    assert len(rows) == 1
+    assert rows[0]['replay_slice_id'] == '2'
+    assert list(rows[0].keys()) == JobExport.COLUMNS
+
+def test_export_format():
+    assert JobExport.format_from_request({'format': 'csv'}, None) == 'csv'
+    assert JobExport.format_from_request({}, 'text/csv') == 'csv'
+    assert JobExport.format_from_request({}, '*/*') == 'ndjson'
@@ -2,6 +2,7 @@
 import pytest
 """Module provides loading and dumping of config and status."""
 import json
+from datetime import datetime, timedelta
 """Module provides marshling replay records."""
 from replay_configuration import ReplayConfigManager
 """Module provides building config for replay node from json meta-data."""
@@ -62,3 +63,120 @@ def test_update_job(setup_module):
     assert job.status != JobStatusEnum.WORKING
     manager.set_job_from_json(job_as_json, job.job_id)
     assert job.status == JobStatusEnum.WORKING
+
+# host holding artifacts from a previous job gets the job reusing them
+def test_locality_next_job(setup_module):
+    manager = JobManager(setup_module)
+    third = manager.get_by_position(3)
+    held_snapshots = {third.slice_config.snapshot_name()}
+    job = manager.get_next_job(None, held_snapshots)
+    assert job.job_id == third.job_id
+    # all test slices share the first stride, falls back to dispatch order
+    job = manager.get_next_job({322000001}, None)
+    assert job.slice_config.replay_slice_id == 1
+    # only the third slice crosses into the next stride
+    job = manager.get_next_job({324000001}, None)
+    assert job.job_id == third.job_id
+    assert JobManager.parse_held("322000001, ,abc", as_int=True) == {322000001}
+
+# higher priority jobs are handed out first, fifo within a level
+def test_priority_next_job(setup_module):
+    manager = JobManager(setup_module)
+    second = manager.get_by_position(2)
+    third = manager.get_by_position(3)
+    manager.set_job({'job_id': third.job_id, 'status': 'WAITING_4_WORKER', 'priority': 5})
+    assert manager.get_next_job().job_id == third.job_id
+    second.priority = 5
+    assert manager.get_next_job().job_id == second.job_id
+    # filter by status and rerun finished jobs
+    third.status = JobStatusEnum.HASH_MISMATCH
+    updated = manager.set_priority(9, {'statuses': ['HASH_MISMATCH']}, rerun=True)
+    assert updated == [third]
+    assert third.status == JobStatusEnum.WAITING_4_WORKER
+    assert manager.get_next_job().job_id == third.job_id
+    # block range overlap filter
+    first = manager.get_by_position(1)
+    updated = manager.set_priority(1, {'start_block': first.slice_config.start_block_id,
+        'end_block': first.slice_config.start_block_id + 1})
+    assert first in updated
+
+# reload keeps state for unchanged slices, adds new and retires removed
+def test_reload_keeps_state(tmp_path):
+    with open('../../meta-data/test-simple-jobs.json', 'r', encoding='utf-8') as f:
+        records = json.load(f)
+    manifest = tmp_path / "jobs.json"
+    manifest.write_text(json.dumps(records[:2]), encoding='utf-8')
+    manager = JobManager(ReplayConfigManager(str(manifest)))
+    first = manager.get_by_position(1)
+    second = manager.get_by_position(2)
+    manager.set_job({'job_id': first.job_id, 'status': 'COMPLETE',
+        'actual_integrity_hash': first.slice_config.expected_integrity_hash})
+    # drop the second slice, add the third
+    manifest.write_text(json.dumps([records[0], records[2]]), encoding='utf-8')
+    counts = manager.reload(ReplayConfigManager(str(manifest)))
+    assert counts == {'kept': 1, 'added': 1, 'retired': 1}
+    assert manager.get_by_position(1) is first
+    assert first.status == JobStatusEnum.COMPLETE
+    assert len(manager) == 2
+    # retired job still found by id for the host running it
+    assert manager.get_job(second.job_id) is second
+    assert manager.get_next_job().slice_config.start_block_id == records[2]['start_block_id']
+
+def test_parse_cache(tmp_path):
+    manifest = tmp_path / "jobs.json"
+    with open('../../meta-data/test-simple-jobs.json', 'r', encoding='utf-8') as f:
+        manifest.write_text(f.read(), encoding='utf-8')
+    records = ReplayConfigManager.load_records(str(manifest))
+    assert ReplayConfigManager.load_records(str(manifest)) is records
+    ReplayConfigManager(str(manifest)).persist()
+    assert ReplayConfigManager.load_records(str(manifest)) is not records
+
+# field level updates keep fields not sent, preconditions guard updates
+def test_patch_job(setup_module):
+    manager = JobManager(setup_module)
+    job = manager.get_next_job()
+    assert JobManager.check_preconditions(job, {'status': 'WAITING_4_WORKER'})
+    assert manager.patch_job(job.job_id, {'status': 'WORKING', 'last_block_processed': 5})
+    assert manager.patch_job(job.job_id, {'instance_id': 'i-1'})
+    assert job.status == JobStatusEnum.WORKING
+    assert job.last_block_processed == 5
+    assert not JobManager.check_preconditions(job, {'status': ['STARTED', 'LOADING_SNAPSHOT']})
+    assert not JobManager.check_preconditions(job, {'no_such_field': 1})
+    assert not manager.patch_job(12345, {'status': 'WORKING'})
+
+def test_cache_counters(setup_module):
+    manager = JobManager(setup_module)
+    job = manager.get_next_job()
+    assert manager.patch_job(job.job_id, {'cache_hits': 2, 'cache_misses': 1, 'cache_hit_bytes': 4096})
+    assert job.as_dict()['cache_hits'] == 2
+    assert job.cache_misses == 1
+    assert job.cache_hit_bytes == 4096
+    # not a count, ignored
+    assert manager.patch_job(job.job_id, {'cache_hits': 'many'})
+    assert job.cache_hits == 2
+    job.requeue()
+    assert job.cache_hits == 0
+
+# leased job goes back to the host holding the lease, other hosts skip it until it expires
+def test_lease_next_job(setup_module):
+    manager = JobManager(setup_module)
+    job = manager.get_next_job(instance_id='i-1')
+    reserved = {'status': 'WAITING_4_WORKER', 'reserved_by': [None, 'i-1']}
+    assert JobManager.check_preconditions(job, reserved)
+    assert manager.patch_job(job.job_id, {'reserved_by': 'i-1', 'lease_minutes': 30})
+    assert job.as_dict()['reserved_by'] == 'i-1'
+    assert not JobManager.check_preconditions(job, {'reserved_by': [None, 'i-2']})
+    assert manager.get_next_job(instance_id='i-2').job_id != job.job_id
+    assert manager.get_next_job().job_id != job.job_id
+    assert manager.get_next_job(instance_id='i-1').job_id == job.job_id
+    # renewal keeps the holder
+    assert manager.patch_job(job.job_id, {'lease_minutes': 500})
+    assert job.lease_holder() == 'i-1'
+    # expired lease is free for anyone
+    job.reserve('i-1', 30, datetime.now() - timedelta(hours=1))
+    assert job.as_dict()['reserved_by'] is None
+    assert manager.get_next_job(instance_id='i-2').job_id == job.job_id
+    # claiming ends the lease
+    job.reserve('i-1', 30)
+    assert manager.patch_job(job.job_id, {'status': 'STARTED', 'instance_id': 'i-1'})
+    assert job.lease_holder() is None
@@ -0,0 +1,114 @@
+"""Module provides testing for searching uploaded job logs and error messages"""
+import gzip
+import json
+from werkzeug.test import Client
+from log_index import LogIndex
+from log_store import LogStore
+from retry_policy import RetryPolicy
+from web_service import WebService
+
+NODEOS_LOG = ''.join(
+    f"info  2024-01-30T10:00:{line % 60:02d}.000 nodeos    controller.cpp:3288   log_irreversible ] "
+    f"Received block 7f1a3c2b{line:04x}... #{line} @ 2024-01-30T10:00:00.000 signed by eosnationftw\n"
+    for line in range(2000))
+DIRTY = "error 2024-01-30T10:01:00.000 nodeos    main.cpp:160    main ] database dirty flag set (likely due to unclean shutdown): replay required\n"
+
+def test_signature():
+    assert LogIndex.signature("Received block 7f1a3c2b... #20 @ 2024-01-30T10:00:01.000") \
+        == "received block #... ## @ #-#-#t#:#:#.#"
+    assert LogIndex.signature("  Failed   to aquire job ") == "failed to aquire job"
+
+def test_search_and_signatures():
+    index = LogIndex()
+    # repeated lines are kept once
+    index.add_log('1', 'nodeos', (NODEOS_LOG + DIRTY).encode('utf-8'))
+    assert len(index.signatures[('1', 'nodeos')]) == 2
+    # line split across chunks
+    index.add_log('2', 'nodeos', DIRTY[:40].encode('utf-8'))
+    index.add_log('2', 'nodeos', DIRTY[40:].encode('utf-8'))
+    index.add_log('3', 'wrapper', b"Step 1 of 7\nFailed to unzip snapshot /data/snapshot-0322000000.bin.zst")
+    index.end_log('3', 'wrapper')
+    index.set_error_message('3', "Failed to unzip snapshot")
+
+    assert set(index.search("database dirty flag")) == {'1', '2'}
+    assert index.search("database dirty flag", [2, 3]).keys() == {'2'}
+    assert index.search("DIRTY FLAG SET")['1']['nodeos'][0].startswith('error')
+    # whole phrase, not just its words
+    assert not index.search("flag dirty")
+    assert index.search("unzip snapshot")['3'].keys() == {'wrapper', 'error_message'}
+    # numbers match any number
+    assert index.search("snapshot-0999999999.bin")['3'].keys() == {'wrapper'}
+    assert not index.search("no such words")
+
+    signatures = index.error_signatures()
+    assert signatures[0]['jobs'] == 2
+    assert signatures[0]['job_ids'] == ['1', '2']
+    assert signatures[0]['classification'] == RetryPolicy.TERMINAL
+    unzip = [group for group in signatures if group['signature'].startswith('failed to unzip')]
+    assert unzip[0]['classification'] == RetryPolicy.RETRYABLE
+    assert [group['jobs'] for group in index.error_signatures(['3'])] == [1, 1]
+
+def test_replace_and_rebuild(tmp_path):
+    index = LogIndex()
+    index.add_log('1', 'nodeos', DIRTY.encode('utf-8'))
+    index.set_error_message('1', "database dirty flag")
+    # retried attempt replaces the log, error message still matches
+    index.add_log('1', 'nodeos', b"clean replay\n", replace=True)
+    assert index.search("dirty flag")['1'].keys() == {'error_message'}
+    index.set_error_message('1', None)
+    assert not index.search("dirty flag")
+    assert 'dirty' not in index.postings
+
+    store = LogStore(str(tmp_path))
+    store.append('5', 'nodeos', 'host-a', 0, gzip.compress(NODEOS_LOG.encode('utf-8')))
+    store.append('5', 'nodeos', 'host-a', len(NODEOS_LOG), gzip.compress(DIRTY.encode('utf-8')), True)
+    (tmp_path / 'wrapper6.log').write_bytes(b'Failed to aquire job')
+    index = LogIndex()
+    index.rebuild(store)
+    assert set(index.search("dirty flag")) == {'5'}
+    assert set(index.search("aquire job")) == {'6'}
+
+def test_logsearch_service(tmp_path):
+    (tmp_path / 'datacenter.env').write_text('')
+    service = WebService('../../meta-data/test-simple-jobs.json', str(tmp_path / 'datacenter.env'),
+        log_store=LogStore(str(tmp_path / 'logs')), log_index=LogIndex())
+    client = Client(service.application)
+    base_url = 'http://127.0.0.1:4000/'
+    first, second = sorted(service.jobs.get_all())[:2]
+    for job_id in (first, second):
+        response = client.post(f"/joblog?jobid={job_id}&log=nodeos&upload=host-a&offset=0&complete",
+            data=gzip.compress((NODEOS_LOG + DIRTY).encode('utf-8')), base_url=base_url)
+        assert response.status_code == 200
+    response = client.patch(f"/job?jobid={second}", json={'status': 'ERROR',
+        'error_message': 'integrity hash mismatch'}, base_url=base_url)
+    assert response.status_code == 200
+
+    results = json.loads(client.get("/logsearch?q=database+dirty+flag", base_url=base_url).data)
+    assert [job['job_id'] for job in results['jobs']] == [first, second]
+    assert results['jobs'][0]['matches']['nodeos']
+    results = json.loads(client.get("/logsearch?q=hash+mismatch", base_url=base_url).data)
+    assert results['jobs'] == [{'job_id': second, 'status': 'ERROR',
+        'matches': {'error_message': ['integrity hash mismatch']}}]
+    report = json.loads(client.get("/logsearch", base_url=base_url).data)
+    assert report['signatures'][0]['jobs'] == 2
+    assert report['signature_count'] == 2
+    assert client.get("/logsearch?run=missing", base_url=base_url).status_code == 404
+
+def test_replaced_jobs_forgotten(tmp_path):
+    (tmp_path / 'datacenter.env').write_text('')
+    log_store = LogStore(str(tmp_path / 'logs'))
+    log_index = LogIndex()
+    service = WebService('../../meta-data/test-simple-jobs.json', str(tmp_path / 'datacenter.env'),
+        log_store=log_store, log_index=log_index)
+    client = Client(service.application)
+    base_url = 'http://127.0.0.1:4000/'
+    job_id = sorted(service.jobs.get_all())[0]
+    response = client.post(f"/joblog?jobid={job_id}&log=nodeos&upload=host-a&offset=0&complete",
+        data=gzip.compress(DIRTY.encode('utf-8')), base_url=base_url)
+    assert response.status_code == 200
+    assert set(log_index.search("dirty flag")) == {str(job_id)}
+    # ids of replaced jobs are memory addresses later jobs may reuse
+    service.reset('../../meta-data/test-simple-jobs.json', str(tmp_path / 'datacenter.env'))
+    assert log_store.size(job_id, 'nodeos') is None
+    assert not log_index.search("dirty flag")
+    assert not log_index.error_signatures()
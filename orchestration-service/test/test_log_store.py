@@ -0,0 +1,85 @@
+"""Module provides testing for the store of job logs uploaded by replay hosts"""
+import gzip
+import pytest
+from werkzeug.test import Client
+from log_store import LogStore
+from web_service import WebService
+
+LOG = ''.join(f"info  2024-01-30T10:00:{line % 60:02d}.000 nodeos  block #{line}\n"
+    for line in range(3000)).encode('utf-8')
+
+def upload(store, upload_id, data, chunk_bytes, job_id='1234'):
+    """append log in gzip chunks, returns final size"""
+    size = 0
+    for offset in range(0, len(data), chunk_bytes):
+        chunk = data[offset:offset + chunk_bytes]
+        size = store.append(job_id, 'nodeos', upload_id, offset, gzip.compress(chunk),
+            offset + chunk_bytes >= len(data))
+    return size
+
+def test_chunks_and_ranges(tmp_path):
+    store = LogStore(str(tmp_path))
+    assert store.size('1234', 'nodeos') is None
+    assert upload(store, 'host-a', LOG, 10000) == len(LOG)
+    assert store.size('1234', 'nodeos') == (len(LOG), True)
+    # ranges crossing chunk boundaries
+    for start, stop in ((0, 10), (9990, 10010), (25000, 61000), (len(LOG) - 5, len(LOG))):
+        assert b''.join(store.read('1234', 'nodeos', start, stop)) == LOG[start:stop]
+    assert store.tail('1234', 'nodeos', 100) == LOG[-100:].decode('utf-8')
+    # stored file is a multi member gzip of the whole log
+    with gzip.open(tmp_path / 'nodeos1234.log.gz', 'rb') as file:
+        assert file.read() == LOG
+    # plain logs from older hosts are still read
+    (tmp_path / 'wrapper1234.log').write_bytes(b'Failed to aquire job')
+    assert store.tail('1234', 'wrapper', 6) == 're job'
+
+def test_resume_and_replace(tmp_path):
+    store = LogStore(str(tmp_path))
+    first = gzip.compress(LOG[:5000])
+    assert store.append('1234', 'nodeos', 'host-a', 0, first) == 5000
+    # response lost, chunk sent again at the old offset
+    assert store.append('1234', 'nodeos', 'host-a', 0, first) is None
+    assert store.offset('1234', 'nodeos', 'host-a') == 5000
+    assert store.offset('1234', 'nodeos', 'host-b') == 0
+    # another upload can not continue this one
+    assert store.append('1234', 'nodeos', 'host-b', 5000, gzip.compress(LOG[5000:])) is None
+    assert store.append('1234', 'nodeos', 'host-a', 5000, gzip.compress(LOG[5000:]), True) == len(LOG)
+    # retried attempt replaces the log
+    assert store.append('1234', 'nodeos', 'host-b', 0, gzip.compress(b'second attempt\n'), True) == 15
+    assert b''.join(store.read('1234', 'nodeos', 0, 15)) == b'second attempt\n'
+    with pytest.raises(ValueError):
+        store.append('1234', 'nodeos', 'host-b', 15, b'not gzip')
+    with pytest.raises(ValueError):
+        store.append('1234', 'nodeos', 'host-b', 15, gzip.compress(b'a') + gzip.compress(b'b'))
+    with pytest.raises(ValueError):
+        store.append('../1234', 'nodeos', 'host-b', 15, gzip.compress(b'a'))
+
+def test_joblog_service(tmp_path):
+    (tmp_path / 'datacenter.env').write_text('')
+    service = WebService('../../meta-data/test-simple-jobs.json', str(tmp_path / 'datacenter.env'),
+        log_store=LogStore(str(tmp_path / 'logs')))
+    client = Client(service.application)
+    base_url = 'http://127.0.0.1:4000/'
+    job_id = service.jobs.get_next_job().job_id
+    url = f"/joblog?jobid={job_id}&log=wrapper&upload=host-a"
+    assert client.head(url, base_url=base_url).status_code == 404
+    response = client.post(f"{url}&offset=0", data=gzip.compress(LOG[:8000]), base_url=base_url)
+    assert response.status_code == 200
+    assert response.headers['X-Log-Offset'] == '8000'
+    response = client.post(f"{url}&offset=0", data=gzip.compress(LOG[:8000]), base_url=base_url)
+    assert response.status_code == 409
+    assert response.headers['X-Log-Offset'] == '8000'
+    response = client.post(f"{url}&offset=8000&complete", data=gzip.compress(LOG[8000:]), base_url=base_url)
+    assert response.headers['X-Log-Offset'] == str(len(LOG))
+    response = client.head(url, base_url=base_url)
+    assert response.headers['Content-Length'] == str(len(LOG))
+    assert response.headers['X-Log-Complete'] == 'true'
+    response = client.get(url, headers={'Range': 'bytes=-1000'}, base_url=base_url)
+    assert response.status_code == 206
+    assert response.data == LOG[-1000:]
+    assert response.headers['Content-Range'] == f"bytes {len(LOG) - 1000}-{len(LOG) - 1}/{len(LOG)}"
+    assert client.get(url, base_url=base_url).data == LOG
+    assert client.get(url, headers={'Range': f"bytes={len(LOG)}-"}, base_url=base_url).status_code == 416
+    assert client.post('/joblog?jobid=1&log=wrapper&upload=host-a&offset=0',
+        data=gzip.compress(b'x'), base_url=base_url).status_code == 404
+    assert client.get(f"/joblog?jobid={job_id}&log=other", base_url=base_url).status_code == 400
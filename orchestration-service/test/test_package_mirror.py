@@ -0,0 +1,101 @@
+"""Module provides testing for the nodeos package mirror"""
+import hashlib
+import io
+import os
+import zipfile
+from werkzeug.test import Client
+from package_mirror import PackageMirror
+from get_artifact_url import ArtifactURL
+from web_service import WebService
+
+DEB = b'!<arch>\n' + b'debian-binary package contents ' * 64
+
+class LocalMirror(PackageMirror):
+    """downloads from a dictionary of url to bytes, counts downloads"""
+    def __init__(self, store_dir, upstream_files, **kwargs):
+        super().__init__(store_dir, **kwargs)
+        self.upstream_files = upstream_files
+        self.downloads = 0
+
+    def download(self, url, headers, path):
+        self.downloads += 1
+        if url not in self.upstream_files:
+            raise IOError(f"{url} returned 404")
+        with open(path, 'wb') as file:
+            file.write(self.upstream_files[url])
+
+def wait_ready(mirror, version):
+    """finish background download, returns final status"""
+    state, detail = mirror.status(version)
+    for thread in list(mirror.fetching.values()):
+        thread.join()
+    return mirror.status(version) if state == 'fetching' else (state, detail)
+
+def test_release_fetched_once(tmp_path):
+    name, url = PackageMirror.release_upstream('v1.0.1')
+    assert name == 'antelope-spring_1.0.1_amd64.deb'
+    mirror = LocalMirror(str(tmp_path), {url: DEB})
+    assert wait_ready(mirror, '1.0.1') == ('ready', name)
+    assert mirror.status('v1.0.1') == ('ready', name)
+    assert mirror.downloads == 1
+    assert mirror.checksum(name) == hashlib.sha256(DEB).hexdigest()
+    assert PackageMirror.release_upstream('5.0.2')[0] == 'leap_5.0.2_amd64.deb'
+
+def test_bad_package_not_served(tmp_path):
+    _, url = PackageMirror.release_upstream('1.0.2')
+    mirror = LocalMirror(str(tmp_path), {url: b'<html>rate limited</html>'})
+    state, detail = wait_ready(mirror, '1.0.2')
+    assert state == 'failed'
+    assert 'not a deb' in detail
+    # failure is remembered, no second download right away
+    assert mirror.status('1.0.2')[0] == 'failed'
+    assert mirror.downloads == 1
+    assert not os.listdir(tmp_path)
+
+def test_branch_build_extracted(tmp_path, monkeypatch):
+    url = 'https://api.github.com/repos/AntelopeIO/spring/actions/artifacts/1234/zip'
+    monkeypatch.setattr(ArtifactURL, 'deb_url_by_branch',
+        lambda owner, repo, branch, artifact, token: {'success': True, 'url': url})
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w') as zip_file:
+        zip_file.writestr('antelope-spring_1.1.0-dev_amd64.deb', DEB)
+    mirror = LocalMirror(str(tmp_path), {url: archive.getvalue()},
+        repo='AntelopeIO/spring', artifact='antelope-spring-deb-amd64', token='token')
+    state, name = wait_ready(mirror, 'feature/fast')
+    assert state == 'ready'
+    assert name == 'feature-fast_1234_amd64.deb'
+    with open(mirror.package_path(name), 'rb') as file:
+        assert file.read() == DEB
+
+def test_prune_keeps_recent(tmp_path):
+    files = {PackageMirror.release_upstream(f"1.0.{patch}")[1]: DEB for patch in range(3)}
+    mirror = LocalMirror(str(tmp_path), files, max_packages=2)
+    for patch in range(3):
+        wait_ready(mirror, f"1.0.{patch}")
+        # distinct modification times
+        os.utime(mirror.package_path(PackageMirror.release_upstream(f"1.0.{patch}")[0]),
+            (patch, patch))
+    mirror.prune()
+    assert sorted(name for name in os.listdir(tmp_path) if name.endswith('.deb')) \
+        == ['antelope-spring_1.0.1_amd64.deb', 'antelope-spring_1.0.2_amd64.deb']
+
+def test_package_endpoint_ranges(tmp_path):
+    _, url = PackageMirror.release_upstream('1.0.3')
+    mirror = LocalMirror(str(tmp_path / 'packages'), {url: DEB})
+    (tmp_path / 'datacenter.env').write_text('')
+    service = WebService('../../meta-data/test-simple-jobs.json', str(tmp_path / 'datacenter.env'),
+        package_mirror=mirror)
+    client = Client(service.application)
+    response = client.get('/package?version=1.0.3')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '5'
+    for thread in list(mirror.fetching.values()):
+        thread.join()
+    response = client.get('/package?version=1.0.3', headers={'Range': 'bytes=8-'})
+    assert response.status_code == 206
+    assert response.data == DEB[8:]
+    assert response.headers['X-Checksum-Sha256'] == hashlib.sha256(DEB).hexdigest()
+    # behind nginx the file is handed off
+    response = client.get('/package?version=1.0.3', headers={'X-Forwarded-For': '172.16.0.9'})
+    assert response.headers['X-Accel-Redirect'] == '/packages/antelope-spring_1.0.3_amd64.deb'
+    assert client.get('/package').status_code == 400
@@ -0,0 +1,99 @@
+"""Module provides testing for the regional cache of snapshots and blocks logs"""
+import os
+import threading
+from werkzeug.test import Client
+from regional_cache import LocalStore, RegionalCache, RegionalCacheService
+
+class SlowStore(LocalStore):
+    """local store that holds downloads until released, counts downloads"""
+    def __init__(self, store_dir):
+        super().__init__(store_dir)
+        self.release = threading.Event()
+        self.downloads = 0
+
+    def download(self, bucket, path, local_file):
+        self.downloads += 1
+        self.release.wait(10)
+        super().download(bucket, path, local_file)
+
+def put_object(store_dir, name, data):
+    """write an object into the local store"""
+    path = os.path.join(store_dir, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as file:
+        file.write(data)
+
+def wait_fetched(cache):
+    """finish background downloads"""
+    for thread in list(cache.fetching.values()):
+        thread.join()
+
+def test_single_flight(tmp_path):
+    store = SlowStore(str(tmp_path / 'store'))
+    put_object(store.store_dir, 'chicken-dance/mainnet/snapshots/snapshot.bin.zst', b'snapshot' * 100)
+    cache = RegionalCache(str(tmp_path / 'cache'), store, 10000)
+    name = 'chicken-dance/mainnet/snapshots/snapshot.bin.zst'
+    # many hosts ask while the one download runs
+    states = [cache.status(name)[0] for _ in range(20)]
+    assert states == ['fetching'] * 20
+    store.release.set()
+    wait_fetched(cache)
+    state, path = cache.status(name)
+    assert state == 'ready'
+    with open(path, 'rb') as file:
+        assert file.read() == b'snapshot' * 100
+    assert store.downloads == 1
+    assert cache.stats()['misses'] == 1
+    assert cache.stats()['fetched_bytes'] == 800
+
+def test_missing_and_outside_names(tmp_path):
+    store = LocalStore(str(tmp_path / 'store'))
+    put_object(store.store_dir, 'other-bucket/secret.zst', b'secret')
+    cache = RegionalCache(str(tmp_path / 'cache'), store, 10000, ['chicken-dance'])
+    assert cache.status('chicken-dance/mainnet/blocks/blocks-1-2000000.log.zst')[0] == 'fetching'
+    wait_fetched(cache)
+    # missing is remembered, store is not asked again right away
+    assert cache.status('chicken-dance/mainnet/blocks/blocks-1-2000000.log.zst')[0] == 'missing'
+    assert cache.status('other-bucket/secret.zst')[0] == 'missing'
+    assert cache.status('chicken-dance/../other-bucket/secret.zst')[0] == 'missing'
+    assert not cache.fetching
+
+def test_evicts_least_recently_served(tmp_path):
+    store = LocalStore(str(tmp_path / 'store'))
+    for number in range(3):
+        put_object(store.store_dir, f"chicken-dance/blocks/blocks-{number}.log.zst", b'x' * 400)
+    cache = RegionalCache(str(tmp_path / 'cache'), store, 1000)
+    for number in range(2):
+        cache.status(f"chicken-dance/blocks/blocks-{number}.log.zst")
+        wait_fetched(cache)
+        # distinct times, the first object was served last
+        os.utime(cache.object_path(f"chicken-dance/blocks/blocks-{number}.log.zst"),
+            (2 - number, 2 - number))
+    cache.status('chicken-dance/blocks/blocks-2.log.zst')
+    wait_fetched(cache)
+    assert cache.status('chicken-dance/blocks/blocks-0.log.zst')[0] == 'ready'
+    assert not os.path.exists(cache.object_path('chicken-dance/blocks/blocks-1.log.zst'))
+    assert cache.status('chicken-dance/blocks/blocks-2.log.zst')[0] == 'ready'
+    stats = cache.stats()
+    assert stats['evicted'] == 1
+    assert stats['stored_bytes'] == 800
+
+def test_service_ranges(tmp_path):
+    data = bytes(range(256)) * 40
+    store = LocalStore(str(tmp_path / 'store'))
+    put_object(store.store_dir, 'chicken-dance/mainnet/snapshots/snapshot.bin.zst', data)
+    cache = RegionalCache(str(tmp_path / 'cache'), store, 100000)
+    client = Client(RegionalCacheService(cache).application)
+    response = client.head('/chicken-dance/mainnet/snapshots/snapshot.bin.zst')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '5'
+    wait_fetched(cache)
+    response = client.head('/chicken-dance/mainnet/snapshots/snapshot.bin.zst')
+    assert response.status_code == 200
+    assert response.headers['Content-Length'] == str(len(data))
+    response = client.get('/chicken-dance/mainnet/snapshots/snapshot.bin.zst',
+        headers={'Range': 'bytes=100-1123'})
+    assert response.status_code == 206
+    assert response.data == data[100:1124]
+    assert client.post('/chicken-dance/mainnet/snapshots/snapshot.bin.zst').status_code == 405
+    assert client.get('/stats').json['objects'] == 1
@@ -106,3 +106,27 @@ def test_dump_json_config():
         assert orig_config != modified_config
     else:
         print(f"WARNING: !!! {test_config_file} not present skipping test_dump_json_config !!!")
+
+def test_blocks_log_strides():
+    manager = ReplayConfigManager('../../meta-data/test-simple-jobs.json')
+    block = manager.get(1)
+    assert block.blocks_log_strides() == [322000001]
+    # crossing a stride boundary covers both strides
+    block.end_block_id = 324000100
+    assert block.blocks_log_strides() == [322000001, 324000001]
+    block.start_block_id = 0
+    block.end_block_id = 100
+    assert block.blocks_log_strides() == [1]
+    assert block.snapshot_name() == "snapshot-2023-08-02-16-eos-v6-0323611371.bin.zst"
+
+def test_manifest_priority():
+    with open('../../meta-data/test-001-jobs.json', 'r') as f:
+        records = json.load(f)
+    block = BlockConfigManager(records[0], 1)
+    assert block.priority == 0
+    assert 'priority' not in block.as_dict()
+    record = copy.deepcopy(records[0])
+    record['priority'] = 3
+    block = BlockConfigManager(record, 1)
+    assert block.priority == 3
+    assert block.as_dict()['priority'] == 3
@@ -0,0 +1,108 @@
+"""Module provides testing for retrying failed jobs"""
+import gzip
+from datetime import datetime, timedelta
+from werkzeug.test import Client
+from replay_configuration import ReplayConfigManager
+from job_status import JobManager, JobStatusEnum
+from job_summary import JobSummary
+from retry_policy import RetryPolicy, ErrorLogReader
+from log_store import LogStore
+from web_service import WebService
+
+def fail_job(manager, job, message):
+    """claim then fail job"""
+    manager.set_job({'job_id': job.job_id, 'status': 'STARTED'})
+    manager.set_job({'job_id': job.job_id, 'status': 'ERROR', 'error_message': message})
+
+def test_classify_text():
+    assert RetryPolicy.classify_text("Failed to unzip snapshot") == RetryPolicy.RETRYABLE
+    assert RetryPolicy.classify_text("Connection reset by peer") == RetryPolicy.RETRYABLE
+    assert RetryPolicy.classify_text("Cannot run as root user") == RetryPolicy.TERMINAL
+    # terminal wins when both appear
+    assert RetryPolicy.classify_text("SIGTERM\ndatabase dirty flag set") == RetryPolicy.TERMINAL
+    # unknown errors are not retried
+    assert RetryPolicy.classify_text("something odd") == RetryPolicy.TERMINAL
+    assert RetryPolicy.classify_text(None) == RetryPolicy.TERMINAL
+
+def test_backoff():
+    policy = RetryPolicy(max_attempts=5, base_minutes=5, max_minutes=15)
+    assert policy.backoff(1) == timedelta(minutes=5)
+    assert policy.backoff(2) == timedelta(minutes=10)
+    assert policy.backoff(3) == timedelta(minutes=15)
+    assert policy.retry_at(5) is None
+
+def test_retry_after_backoff():
+    replay_config_manager = ReplayConfigManager('../../meta-data/test-simple-jobs.json')
+    manager = JobManager(replay_config_manager, speculative=False)
+    job = manager.get_next_job()
+    fail_job(manager, job, "Failed to restore blocks.log")
+    assert job.attempts == 1
+    assert job.retry_at is not None
+    # still in backoff, not requeued
+    assert not manager.requeue_failed_jobs()
+    assert job.status == JobStatusEnum.ERROR
+    report = JobSummary.create(manager)
+    assert report['jobs_retrying'] == 1
+    assert report['jobs_failed'] == 0
+    # backoff passed
+    requeued = manager.requeue_failed_jobs(datetime.now() + timedelta(hours=2))
+    assert requeued == [job]
+    assert job.status == JobStatusEnum.WAITING_4_WORKER
+    assert job.error_message is None
+    assert job.attempts == 1
+
+def test_terminal_not_retried():
+    replay_config_manager = ReplayConfigManager('../../meta-data/test-simple-jobs.json')
+    manager = JobManager(replay_config_manager, speculative=False)
+    job = manager.get_next_job()
+    fail_job(manager, job, "Unknown snapshot type")
+    # classified when it fails, never counted as retrying
+    assert job.retry_at is None
+    assert JobSummary.create(manager)['jobs_retrying'] == 0
+    assert not manager.requeue_failed_jobs(datetime.now() + timedelta(hours=2))
+    assert job.status == JobStatusEnum.ERROR
+    assert job.retry_at is None
+    assert JobSummary.create(manager)['jobs_failed'] == 1
+
+def test_attempts_exhausted():
+    replay_config_manager = ReplayConfigManager('../../meta-data/test-simple-jobs.json')
+    manager = JobManager(replay_config_manager, speculative=False,
+        retry_policy=RetryPolicy(max_attempts=2))
+    job = manager.get_next_job()
+    fail_job(manager, job, "SIGTERM")
+    manager.requeue_failed_jobs(datetime.now() + timedelta(hours=2))
+    assert job.status == JobStatusEnum.WAITING_4_WORKER
+    fail_job(manager, job, "SIGTERM")
+    assert job.attempts == 2
+    assert job.retry_at is None
+    assert job.status == JobStatusEnum.ERROR
+
+def test_classify_from_logs(tmp_path):
+    replay_config_manager = ReplayConfigManager('../../meta-data/test-simple-jobs.json')
+    manager = JobManager(replay_config_manager, speculative=False,
+        retry_policy=RetryPolicy(log_reader=ErrorLogReader(str(tmp_path))))
+    job = manager.get_next_job()
+    fail_job(manager, job, "Failed running nodeos")
+    assert job.retry_at is None
+    # logs uploaded after the failure show it is retryable
+    (tmp_path / f"nodeos{job.job_id}.log").write_text("error: Connection timed out", encoding='utf-8')
+    assert manager.schedule_retry(job) is not None
+    manager.requeue_failed_jobs(datetime.now() + timedelta(hours=2))
+    assert job.status == JobStatusEnum.WAITING_4_WORKER
+
+def test_classify_when_logs_uploaded(tmp_path):
+    (tmp_path / 'datacenter.env').write_text('')
+    service = WebService('../../meta-data/test-simple-jobs.json', str(tmp_path / 'datacenter.env'),
+        retry_policy=RetryPolicy(log_reader=ErrorLogReader(str(tmp_path / 'logs'))),
+        log_store=LogStore(str(tmp_path / 'logs')))
+    client = Client(service.application)
+    base_url = 'http://127.0.0.1:4000/'
+    job = service.jobs.get_next_job()
+    response = client.patch(f"/job?jobid={job.job_id}", json={'status': 'ERROR',
+        'error_message': 'Failed running nodeos'}, base_url=base_url)
+    assert response.status_code == 200
+    assert job.retry_at is None
+    response = client.post(f"/joblog?jobid={job.job_id}&log=nodeos&upload=host-a&offset=0&complete",
+        data=gzip.compress(b"error: Connection timed out\n"), base_url=base_url)
+    assert response.status_code == 200
+    assert job.retry_at is not None
@@ -0,0 +1,68 @@
+"""Module provides testing for archiving runs and querying across runs"""
+from datetime import datetime, timedelta
+import pytest
+from replay_configuration import ReplayConfigManager
+from job_status import JobManager
+from run_history import RunHistory
+
+def finished_run(hash_for_second):
+    """run with all jobs complete, second job reports given hash"""
+    manager = JobManager(ReplayConfigManager('../../meta-data/test-simple-jobs.json'))
+    for position in (1, 2, 3):
+        job = manager.get_by_position(position)
+        manager.set_job({'job_id': job.job_id, 'status': 'STARTED', 'instance_id': f"i-{position}"})
+        manager.set_job({'job_id': job.job_id, 'status': 'LOADING_SNAPSHOT'})
+        manager.set_job({'job_id': job.job_id, 'status': 'WORKING'})
+        actual = job.slice_config.expected_integrity_hash
+        if position == 2:
+            actual = hash_for_second
+        manager.set_job({'job_id': job.job_id, 'status': 'COMPLETE', 'actual_integrity_hash': actual})
+        # pretend each phase took ten minutes
+        started = job.phase_times['STARTED']
+        job.phase_times['LOADING_SNAPSHOT'] = started + timedelta(minutes=10)
+        job.phase_times['WORKING'] = started + timedelta(minutes=20)
+        job.phase_times['COMPLETE'] = started + timedelta(minutes=30)
+    return manager
+
+def test_archive_and_query(tmp_path):
+    history = RunHistory(str(tmp_path / "history.db"))
+    good = finished_run(None)
+    second = good.get_by_position(2)
+    good.set_job({'job_id': second.job_id, 'status': 'COMPLETE',
+        'actual_integrity_hash': second.slice_config.expected_integrity_hash})
+    first_id = history.archive('default', 'test-simple-jobs.json', good)
+    mismatch_id = history.archive('default', 'test-simple-jobs.json', finished_run('BAD'))
+    assert mismatch_id > first_id
+    assert len(history.runs()) == 2
+
+    config = second.slice_config
+    durations = history.slice_durations(config.start_block_id, config.end_block_id)
+    assert [row['run_id'] for row in durations] == [mismatch_id, first_id]
+    assert durations[0]['status'] == 'HASH_MISMATCH'
+    assert durations[0]['instance_id'] == 'i-2'
+    assert durations[1]['loading_minutes'] == 10
+    assert durations[1]['working_minutes'] == 10
+    assert durations[1]['total_minutes'] == 30
+    assert len(history.slice_durations(config.start_block_id, config.end_block_id, 1)) == 1
+
+    first = history.first_mismatch(config.start_block_id, config.start_block_id + 1)
+    assert first['run_id'] == mismatch_id
+    assert first['actual_hash'] == 'BAD'
+    # range of the first slice never mismatched
+    first_config = good.get_by_position(1).slice_config
+    assert history.first_mismatch(first_config.start_block_id, first_config.start_block_id + 1) is None
+
+    # queries from /history
+    assert history.query('runs', 1) == history.runs(1)
+    assert history.query('first_mismatch', 10, config.start_block_id, config.start_block_id + 1) == first
+    with pytest.raises(ValueError):
+        history.query('durations', 10, config.start_block_id)
+    with pytest.raises(ValueError):
+        history.query('slowest', 10, config.start_block_id, config.end_block_id)
+    history.close()
+
+def test_phase_minutes():
+    now = datetime.now()
+    phases = {'STARTED': now, 'ERROR': now + timedelta(minutes=5)}
+    assert RunHistory.phase_minutes(phases, 'STARTED', RunHistory.FINISHED_PHASES) == 5
+    assert RunHistory.phase_minutes(phases, 'WORKING', RunHistory.FINISHED_PHASES) is None
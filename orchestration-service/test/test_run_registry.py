@@ -0,0 +1,87 @@
+"""Module provides testing for concurrent named runs"""
+from job_status import JobStatusEnum
+from run_registry import RunRegistry
+from web_service import WebService
+
+def claim(run, job):
+    """host starts job"""
+    run.jobs.set_job({'job_id': job.job_id, 'status': 'STARTED'})
+
+def test_find_job_across_runs():
+    registry = RunRegistry({'speculative': False})
+    default = registry.add(RunRegistry.DEFAULT_RUN, '../../meta-data/test-simple-jobs.json')
+    jungle = registry.add('jungle', '../../meta-data/test-simple-jobs.json')
+    job = jungle.jobs.get_by_position(2)
+    run, found = registry.find_job(job.job_id)
+    assert run is jungle
+    assert found is job
+    assert registry.get() is default
+    assert len(registry) == 6
+    assert registry.find_job(12345) == (None, None)
+
+def test_weighted_fair_share():
+    registry = RunRegistry({'speculative': False})
+    registry.add(RunRegistry.DEFAULT_RUN, '../../meta-data/test-simple-jobs.json', weight=1)
+    registry.add('heavy', '../../meta-data/test-simple-jobs.json', weight=2)
+    dispatched = []
+    for _ in range(4):
+        run, job = registry.next_job()
+        claim(run, job)
+        dispatched.append(run.name)
+    # heavy run gets two claims for each default claim, ties go to the older run
+    assert dispatched == [RunRegistry.DEFAULT_RUN, 'heavy', 'heavy', RunRegistry.DEFAULT_RUN]
+
+def test_share_of_hosts_now():
+    registry = RunRegistry({'speculative': False})
+    default = registry.add(RunRegistry.DEFAULT_RUN, '../../meta-data/test-full-run.json')
+    for _ in range(10):
+        run, job = registry.next_job()
+        claim(run, job)
+        run.jobs.set_job({'job_id': job.job_id, 'status': 'COMPLETE', 'actual_integrity_hash': 'abc'})
+    run, job = registry.next_job()
+    claim(run, job)
+    assert default.in_progress() == 1
+    # added late, gets its share of hosts not every host until its claims catch up
+    registry.add('late', '../../meta-data/test-simple-jobs.json')
+    dispatched = []
+    for _ in range(4):
+        run, job = registry.next_job()
+        claim(run, job)
+        dispatched.append(run.name)
+    assert dispatched == ['late', RunRegistry.DEFAULT_RUN, 'late', RunRegistry.DEFAULT_RUN]
+
+def test_priority_served_first():
+    registry = RunRegistry({'speculative': False})
+    registry.add(RunRegistry.DEFAULT_RUN, '../../meta-data/test-simple-jobs.json')
+    registry.add('urgent', '../../meta-data/test-simple-jobs.json', priority=1)
+    for _ in range(3):
+        run, job = registry.next_job()
+        assert run.name == 'urgent'
+        claim(run, job)
+    # urgent run drained, default run picks up
+    run, job = registry.next_job()
+    assert run.name == RunRegistry.DEFAULT_RUN
+    assert job.status == JobStatusEnum.WAITING_4_WORKER
+
+def test_remove_run():
+    registry = RunRegistry()
+    registry.add(RunRegistry.DEFAULT_RUN, '../../meta-data/test-simple-jobs.json')
+    registry.add('jungle', '../../meta-data/test-simple-jobs.json')
+    assert not registry.remove(RunRegistry.DEFAULT_RUN)
+    assert registry.remove('jungle')
+    assert registry.get('jungle') is None
+
+def test_reset_keeps_shared_hosts(tmp_path):
+    (tmp_path / 'datacenter.env').write_text('')
+    service = WebService('../../meta-data/test-simple-jobs.json', str(tmp_path / 'datacenter.env'))
+    service.hosts.set_count(2)
+    service.hosts.record_instance('i-0abc')
+    service.runs.add('jungle', '../../meta-data/test-simple-jobs.json')
+    # jungle still runs on the fleet
+    service.reset('../../meta-data/test-simple-jobs.json', str(tmp_path / 'datacenter.env'))
+    assert service.hosts.host_count == 2
+    assert 'i-0abc' in service.hosts.instances
+    service.runs.remove('jungle')
+    service.reset('../../meta-data/test-simple-jobs.json', str(tmp_path / 'datacenter.env'))
+    assert not service.hosts.has_hosts()
+    assert not service.hosts.instances
@@ -0,0 +1,101 @@
+"""Module provides testing for speculative copies of straggler jobs"""
+from datetime import datetime, timedelta
+import pytest
+from replay_configuration import ReplayConfigManager
+from job_status import JobManager, JobStatusEnum
+
+@pytest.fixture
+def working_manager():
+    """all jobs working, slice 2 at a tenth the rate of the others"""
+    replay_config_manager = ReplayConfigManager('../../meta-data/test-simple-jobs.json')
+    manager = JobManager(replay_config_manager)
+    now = datetime.now()
+    for position, blocks in ((1, 10000), (2, 1000), (3, 10000)):
+        job = manager.get_by_position(position)
+        job.status = JobStatusEnum.WORKING
+        start = job.slice_config.start_block_id
+        job.progress_start = (now - timedelta(minutes=60), start)
+        job.progress_last = (now, start + blocks)
+        job.last_block_processed = start + blocks
+    return manager
+
+def test_no_backup_while_waiting():
+    replay_config_manager = ReplayConfigManager('../../meta-data/test-simple-jobs.json')
+    manager = JobManager(replay_config_manager)
+    job = manager.get_next_job()
+    assert job.primary_job_id is None
+
+def test_backup_for_straggler(working_manager):
+    straggler = working_manager.get_by_position(2)
+    backup = working_manager.get_next_job()
+    assert backup is not None
+    assert backup.primary_job_id == straggler.job_id
+    assert straggler.backup_job_id == backup.job_id
+    # unclaimed backup handed out again, no second backup created
+    assert working_manager.get_next_job().job_id == backup.job_id
+    assert len(working_manager.backups) == 1
+    # backups are not counted as jobs
+    assert len(working_manager) == 3
+
+def test_backup_wins(working_manager):
+    straggler = working_manager.get_by_position(2)
+    backup = working_manager.get_next_job()
+    working_manager.set_job({'job_id': backup.job_id, 'status': 'STARTED', 'instance_id': 'i-backup'})
+    working_manager.set_job({'job_id': backup.job_id,
+        'status': 'COMPLETE',
+        'last_block_processed': straggler.slice_config.end_block_id,
+        'actual_integrity_hash': straggler.slice_config.expected_integrity_hash})
+    assert straggler.status == JobStatusEnum.COMPLETE
+    assert straggler.actual_integrity_hash == straggler.slice_config.expected_integrity_hash
+    assert straggler.instance_id == 'i-backup'
+    # host running the straggler is told to stop
+    assert working_manager.is_superseded(straggler.job_id)
+    assert not working_manager.is_superseded(backup.job_id)
+
+def test_primary_wins(working_manager):
+    straggler = working_manager.get_by_position(2)
+    backup = working_manager.get_next_job()
+    working_manager.set_job({'job_id': straggler.job_id, 'status': 'COMPLETE'})
+    assert working_manager.is_superseded(backup.job_id)
+    assert not working_manager.is_superseded(straggler.job_id)
+    # superseded backup is not handed out
+    assert working_manager.get_next_job() is None
+
+def test_speculative_disabled():
+    replay_config_manager = ReplayConfigManager('../../meta-data/test-simple-jobs.json')
+    manager = JobManager(replay_config_manager, speculative=False)
+    for job in manager.get_all().values():
+        job.status = JobStatusEnum.WORKING
+    assert manager.get_next_job() is None
+
+def test_rerun_after_backup_wins(working_manager):
+    straggler = working_manager.get_by_position(2)
+    backup = working_manager.get_next_job()
+    working_manager.set_job({'job_id': backup.job_id, 'status': 'STARTED'})
+    working_manager.set_job({'job_id': backup.job_id,
+        'status': 'COMPLETE',
+        'last_block_processed': straggler.slice_config.end_block_id,
+        'actual_integrity_hash': straggler.slice_config.expected_integrity_hash})
+    assert straggler.superseded
+    updated = working_manager.set_priority(5, {'sliceids': [straggler.slice_config.replay_slice_id]}, True)
+    assert updated == [straggler]
+    assert straggler.status == JobStatusEnum.WAITING_4_WORKER
+    assert not straggler.superseded
+    assert straggler.backup_job_id is None
+    # stale backup is detached, never handed out or reported on the primary
+    assert backup.primary_job_id is None
+    assert working_manager.is_superseded(backup.job_id)
+    assert working_manager.get_next_job() is straggler
+    working_manager.set_job({'job_id': straggler.job_id, 'status': 'STARTED'})
+    assert straggler.status == JobStatusEnum.STARTED
+    # rerun straggles again, gets a new backup
+    straggler.status = JobStatusEnum.WORKING
+    now = datetime.now()
+    start = straggler.slice_config.start_block_id
+    straggler.progress_start = (now - timedelta(minutes=60), start)
+    straggler.progress_last = (now, start + 1000)
+    straggler.last_block_processed = start + 1000
+    second = working_manager.get_next_job()
+    assert second.job_id != backup.job_id
+    assert second.primary_job_id == straggler.job_id
+    assert straggler.backup_job_id == second.job_id
@@ -26,32 +26,48 @@ def test_repair_hashmismatch():
     # update expected integrity hash to None, simulate late arriving hash
     config.expected_integrity_hash = None
     job_manager = JobManager(replay_config_manager)
-    # update corrisponding job to COMPLETE with actual integrity hash from above
+    # complete corrisponding job with actual integrity hash from above
     for this_job_obj in job_manager.get_all().items():
         # jobid = this_job_obj[0]
         job = this_job_obj[1]
         if job.slice_config.expected_integrity_hash is None:
-            job.status = JobStatusEnum.COMPLETE
-            job.actual_integrity_hash = expected_integrity_hash
-            job.last_block_processed = job.slice_config.end_block_id
-            job.end_time = datetime.now().strftime('%Y-%m-%dT%H:%M:%S')
-    # run report, should have 1 failure with HASH_MISMATCH status
+            job_manager.set_job({'job_id': job.job_id,
+                'status': 'COMPLETE',
+                'actual_integrity_hash': expected_integrity_hash,
+                'last_block_processed': job.slice_config.end_block_id,
+                'end_time': datetime.now().strftime('%Y-%m-%dT%H:%M:%S')})
+            # no expected hash yet, waits instead of failing
+            assert job.status == JobStatusEnum.VERIFYING
     report = JobSummary.create(job_manager)
     assert report['total_jobs'] == 3
     assert report['blocks_processed'] > 0
-    assert report['jobs_failed'] == 1
+    assert report['jobs_failed'] == 0
     assert report['jobs_succeeded'] == 0
-    assert report['failed_jobs'][0]['status'] == JobStatusEnum.HASH_MISMATCH.name
-    # go back and update expected integrity hash to match actual
-    for this_job_obj in job_manager.get_all().items():
-        # jobid = this_job_obj[0]
-        job = this_job_obj[1]
-        if job.slice_config.expected_integrity_hash is None:
-            job.slice_config.expected_integrity_hash = expected_integrity_hash
+    assert report['jobs_verifying'] == 1
+    # expected integrity hash arrives, as done by /config POST
+    config.expected_integrity_hash = expected_integrity_hash
+    settled = job_manager.settle_verifying(config.end_block_id, config.spring_version)
+    assert len(settled) == 1
+    assert settled[0].status == JobStatusEnum.COMPLETE
     # re-run report, and now 1 job success with status COMPLETE, 0 jobs failed
     report = JobSummary.create(job_manager)
     assert report['total_jobs'] == 3
     assert report['blocks_processed'] > 0
     assert report['jobs_failed'] == 0
     assert report['jobs_succeeded'] == 1
+    assert report['jobs_verifying'] == 0
     assert len(report['failed_jobs']) == 0
+
+def test_verify_hashmismatch():
+    replay_config_manager = ReplayConfigManager('../../meta-data/test-simple-jobs.json')
+    config = replay_config_manager.get(2)
+    config.expected_integrity_hash = None
+    job_manager = JobManager(replay_config_manager)
+    job = job_manager.get_by_position(2)
+    job_manager.set_job({'job_id': job.job_id, 'status': 'COMPLETE', 'actual_integrity_hash': 'ABC'})
+    config.expected_integrity_hash = 'DEF'
+    job_manager.settle_verifying(config.end_block_id, config.spring_version)
+    assert job.status == JobStatusEnum.HASH_MISMATCH
+    report = JobSummary.create(job_manager)
+    assert report['jobs_failed'] == 1
+    assert report['failed_jobs'][0]['status'] == JobStatusEnum.HASH_MISMATCH.name
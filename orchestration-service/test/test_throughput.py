@@ -0,0 +1,67 @@
+"""Module provides testing for rates and time remaining"""
+from datetime import datetime, timedelta
+import pytest
+from replay_configuration import ReplayConfigManager
+from job_status import JobManager, JobStatus, JobStatusEnum
+from job_summary import JobSummary
+from duration_estimator import DurationEstimator
+from throughput import Throughput
+
+def working_job(manager, position, blocks_per_second, samples=3):
+    """job in WORKING reporting progress at a steady rate, a minute apart"""
+    job = manager.get_by_position(position)
+    job.status = JobStatusEnum.WORKING
+    start = datetime.now() - timedelta(minutes=samples)
+    for sample in range(samples):
+        block = job.slice_config.start_block_id + sample * 60 * blocks_per_second
+        job.record_progress(block, start + timedelta(minutes=sample))
+        job.last_block_processed = block
+    return job
+
+def test_smoothed_rate():
+    manager = JobManager(ReplayConfigManager('../../meta-data/test-simple-jobs.json'))
+    job = working_job(manager, 1, 10)
+    assert job.blocks_per_second == 10
+    # a burst only moves the rate part way
+    last_time, last_block = job.progress_samples[-1]
+    job.record_progress(last_block + 60 * 20, last_time + timedelta(minutes=1))
+    smoothing = JobStatus.RATE_SMOOTHING
+    assert job.blocks_per_second == pytest.approx(10 * (1 - smoothing) + 20 * smoothing)
+    # going backwards starts over
+    job.record_progress(job.slice_config.start_block_id, last_time + timedelta(minutes=2))
+    assert job.blocks_per_second is None
+    job.requeue()
+    assert len(job.progress_samples) == 0
+
+def test_job_and_run_eta():
+    manager = JobManager(ReplayConfigManager('../../meta-data/test-simple-jobs.json'))
+    # nothing has a rate, no history
+    assert Throughput.run_estimate(manager)['eta_seconds'] is None
+    job = working_job(manager, 1, 10)
+    estimates = Throughput.job_estimates(manager, manager.get_all().values())
+    remaining = Throughput.remaining_blocks(job)
+    assert estimates[job.job_id] == (10, int(remaining / 10))
+    # waiting jobs use the rate observed across the run
+    waiting = manager.get_by_position(2)
+    assert estimates[waiting.job_id][1] == int(Throughput.remaining_blocks(waiting) / 10)
+    # one job in progress, remaining work runs one after another
+    report = JobSummary.create(manager)
+    assert report['blocks_per_second'] == 10
+    total = sum(eta for _, eta in estimates.values())
+    assert report['eta_seconds'] == total
+    assert report['estimated_finish'] is not None
+    # finished jobs need no more time
+    waiting.status = JobStatusEnum.COMPLETE
+    assert Throughput.job_estimates(manager, [waiting])[waiting.job_id][1] == 0
+
+def test_history_rate_for_unstarted():
+    config = ReplayConfigManager('../../meta-data/test-simple-jobs.json')
+    first = config.get(1)
+    estimator = DurationEstimator()
+    # one minute per 600 blocks, 10 blocks per second
+    estimator.add_records([(first.start_block_id, first.end_block_id, 1 / 600)])
+    manager = JobManager(config, estimator=estimator)
+    job = manager.get_by_position(1)
+    _, eta_seconds = Throughput.job_estimates(manager, [job])[job.job_id]
+    assert eta_seconds == int((first.end_block_id - first.start_block_id) / 10)
+    assert Throughput.format_eta(3 * 3600 + 125) == "3h 2m"
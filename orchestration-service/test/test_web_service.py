@@ -138,6 +138,31 @@ def test_update_job(setup_module):
     # fails on ETag Mismatch
     assert updated.status_code == 400
 
+def test_patch_job(setup_module):
+    """Field level update with preconditions, no ETag needed"""
+    cntx, session = setup_module
+
+    params = { 'nextjob': 1 }
+    response = session.get(cntx['base_url'] + '/job', params=params, headers=cntx['json_headers'])
+    assert response.status_code == 200
+    job = json.loads(response.content.decode('utf-8'))
+
+    # claim only when still waiting
+    params = { 'jobid': job['job_id'] }
+    claim = { 'status': 'STARTED', 'preconditions': { 'status': 'WAITING_4_WORKER' } }
+    patched = session.patch(cntx['base_url'] + '/job', params=params, headers=cntx['json_headers'], data=json.dumps(claim))
+    assert patched.status_code == 200
+    assert json.loads(patched.content.decode('utf-8'))['status'] == 'STARTED'
+
+    # second claim fails precondition
+    patched = session.patch(cntx['base_url'] + '/job', params=params, headers=cntx['json_headers'], data=json.dumps(claim))
+    assert patched.status_code == 412
+
+    # restore job to enable reruns of tests
+    restore = { 'status': 'WAITING_4_WORKER' }
+    patched = session.patch(cntx['base_url'] + '/job', params=params, headers=cntx['json_headers'], data=json.dumps(restore))
+    assert patched.status_code == 200
+
 def test_no_more_jobs(setup_module):
     """Using nextjob loop over the jobs updating status; eventually no more jobs and None is returned"""
     cntx, session = setup_module
@@ -0,0 +1,111 @@
+"""Module estimates processing rates and time remaining for jobs and runs"""
+from datetime import datetime, timedelta
+from job_status import JobStatusEnum
+
+class Throughput:
+    """
+    Rates come from each job's smoothed `blocks_per_second`
+    Jobs without a rate of their own use history, the DurationEstimator rate for the block range
+    then the median rate observed across the run
+    A run finishes when its remaining work is spread over the jobs in progress,
+    and no sooner then its slowest job in progress
+    """
+    IN_PROGRESS = (JobStatusEnum.STARTED, JobStatusEnum.LOADING_SNAPSHOT, JobStatusEnum.WORKING)
+
+    @staticmethod
+    def is_remaining(job):
+        """true when job still has blocks to process, includes failed jobs awaiting retry"""
+        if job.status in (JobStatusEnum.ERROR, JobStatusEnum.TIMEOUT):
+            return job.retry_at is not None
+        return job.status == JobStatusEnum.WAITING_4_WORKER or job.status in Throughput.IN_PROGRESS
+
+    @staticmethod
+    def remaining_blocks(job):
+        """blocks left to process"""
+        config = job.slice_config
+        done_to = max(job.last_block_processed, config.start_block_id)
+        return max(config.end_block_id - done_to, 0)
+
+    @staticmethod
+    def observed_rate(job_manager):
+        """median blocks per second of jobs in this run with a rate, None when none"""
+        rates = sorted(job.blocks_per_second for job in job_manager.get_all().values()
+            if job.blocks_per_second)
+        if not rates:
+            return None
+        return rates[len(rates) // 2]
+
+    @staticmethod
+    def history_rate(job_manager, job, observed_rate):
+        """blocks per second expected for job's block range, None when unknown"""
+        estimator = job_manager.estimator
+        config = job.slice_config
+        minutes_per_block = estimator.minutes_per_block(config.start_block_id, config.end_block_id)
+        if minutes_per_block:
+            return 1 / (minutes_per_block * 60)
+        return observed_rate
+
+    @staticmethod
+    def job_estimate(job_manager, job, observed_rate):
+        """(blocks_per_second, eta_seconds) for job, eta is 0 when finished, None when unknown"""
+        if not Throughput.is_remaining(job):
+            return job.blocks_per_second, 0
+        rate = job.blocks_per_second if job.status == JobStatusEnum.WORKING else None
+        if not rate:
+            rate = Throughput.history_rate(job_manager, job, observed_rate)
+        if not rate or rate <= 0:
+            return job.blocks_per_second, None
+        return job.blocks_per_second, int(Throughput.remaining_blocks(job) / rate)
+
+    @staticmethod
+    def job_estimates(job_manager, jobs):
+        """dictionary of job id to (blocks_per_second, eta_seconds)"""
+        observed_rate = Throughput.observed_rate(job_manager)
+        return {job.job_id: Throughput.job_estimate(job_manager, job, observed_rate)
+            for job in jobs}
+
+    @staticmethod
+    def run_estimate(job_manager, now=None):
+        """rate across jobs in progress and estimated finish for the run"""
+        if now is None:
+            now = datetime.now()
+        observed_rate = Throughput.observed_rate(job_manager)
+        run_rate = 0.0
+        in_progress = 0
+        work_seconds = 0
+        slowest = 0
+        unknown = False
+        for job in job_manager.get_all().values():
+            if not Throughput.is_remaining(job):
+                continue
+            rate, eta_seconds = Throughput.job_estimate(job_manager, job, observed_rate)
+            if job.status in Throughput.IN_PROGRESS:
+                in_progress += 1
+                if job.status == JobStatusEnum.WORKING and rate:
+                    run_rate += rate
+                if eta_seconds is not None:
+                    slowest = max(slowest, eta_seconds)
+            if eta_seconds is None:
+                unknown = True
+            else:
+                work_seconds += eta_seconds
+        estimate = {
+            'blocks_per_second': round(run_rate, 2),
+            'eta_seconds': None,
+            'estimated_finish': None
+        }
+        if unknown:
+            return estimate
+        eta_seconds = max(int(work_seconds / max(in_progress, 1)), slowest)
+        estimate['eta_seconds'] = eta_seconds
+        estimate['estimated_finish'] = (now + timedelta(seconds=eta_seconds)) \
+            .strftime('%Y-%m-%dT%H:%M:%S')
+        return estimate
+
+    @staticmethod
+    def format_eta(eta_seconds):
+        """hours and minutes for reports"""
+        if eta_seconds is None:
+            return "unknown"
+        hours, seconds = divmod(int(eta_seconds), 3600)
+        return f"{hours}h {seconds // 60}m"
@@ -5,7 +5,8 @@ import logging
 import sys
 import re
 import os
-import subprocess
+import threading
+import time
 from datetime import datetime, timedelta
 from urllib.parse import unquote, urlencode
 from werkzeug.wrappers import Request, Response
@@ -13,62 +14,149 @@ from werkzeug.serving import run_simple
 from werkzeug.http import generate_etag
 from werkzeug.utils import redirect
 from report_templates import ReportTemplate
-from replay_configuration import ReplayConfigManager
 from replay_configuration import UserConfig
 from html_page import HtmlPage
 from job_status import JobManager
+from run_registry import RunRegistry
 from job_summary import JobSummary
+from throughput import Throughput
 from env_store import EnvStore
 from github_oauth import GitHubOauth
 from control_config import ControlConfig
 from host_runner import Hosts
 from get_artifact_url import ArtifactURL
-
+from duration_estimator import DurationEstimator
+from autoscaler import Autoscaler, ShellProvisioner
+from retry_policy import RetryPolicy, ErrorLogReader
+from log_store import LogStore
+from log_index import LogIndex
+from file_service import FileService
+from run_history import RunHistory
+from job_export import JobExport
+from package_mirror import PackageMirror
+
+# pylint: disable=too-many-public-methods
 class WebService:
     """class managing all the web service actions to run jobs
     for the chicken-dance aka replay-test"""
-    def __init__(self, jobs_config, datacenter_config):
+    # HTML pages, built from html_dir
+    PAGES = ('/progress', '/grid', '/control', '/detail', '/showlog')
+    # request path to the method handling it
+    ROUTES = {path: f"handle_{path[1:]}" for path in ('/job', '/status', '/config', '/userconfig',
+        '/clean', '/healthcheck', '/restart', '/release_versions', '/repo_branches', '/config_files',
+        '/deb_download_url', '/joblog', '/logsearch', '/package', '/summary', '/logout', '/oauthback',
+        '/start', '/stop', '/autoscale', '/runs', '/priority', '/history', '/export')}
+    ROUTES.update({page: 'handle_page' for page in PAGES})
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, jobs_config, datacenter_config, scheduler='fifo', estimator=None,
+        speculative=True, autoscaler=None, retry_policy=None, run_history=None,
+        package_mirror=None, log_store=None, log_index=None):
         """initialize the context for the webservice"""
         self.jobs_config = jobs_config
-        # load the configuration
-        self.replay_config_manager = ReplayConfigManager(jobs_config)
-        # build the JobSummary
-        self.jobs = JobManager(self.replay_config_manager)
-        # track hosts running jobs
-        self.hosts = Hosts(datacenter_config)
+        # preserved across resets
+        self.autoscaler = autoscaler
+        self.run_history = run_history
+        # job logs and packages replay hosts upload and download
+        self.files = FileService(log_store, log_index, package_mirror)
+        # requests and the autoscaling thread both read and change runs, jobs and hosts
+        self.lock = threading.Lock()
+        # named runs share the replay hosts, each has its own manifest and jobs
+        self.runs = RunRegistry({
+            'scheduler': scheduler,
+            'estimator': estimator,
+            'speculative': speculative,
+            'retry_policy': retry_policy})
+        self.replay_config_manager = None
+        self.jobs = None
+        self.hosts = None
+        self.reset(jobs_config, datacenter_config)
 
     def reset(self,jobs_config, datacenter_config):
-        """reset jobs and replay config manager"""
-        self.__init__(jobs_config,datacenter_config)
+        """reset default run, other named runs and the hosts they share are kept
+        hosts are reset when the default run is the only run"""
+        self.jobs_config = jobs_config
+        run = self.add_run(RunRegistry.DEFAULT_RUN, jobs_config)
+        # load the configuration
+        self.replay_config_manager = run.replay_config_manager
+        # build the JobSummary
+        self.jobs = run.jobs
+        # track hosts running jobs, the fleet is shared and kept while other runs use it
+        if self.hosts is None or len(self.runs.runs) == 1:
+            self.hosts = Hosts(datacenter_config)
+        # error messages persisted with the jobs are searchable with the logs
+        for job in self.runs.get_all().values():
+            self.files.set_error_message(job)
+
+    def add_run(self, name, jobs_config, weight=1, priority=0):
+        """add a run, a run with the same name is archived and replaced, returns run"""
+        existing = self.runs.get(name)
+        if existing is not None:
+            self.archive_run(existing, True)
+            self.files.forget(WebService.job_ids(existing))
+        run = self.runs.add(name, jobs_config, weight, priority)
+        self.files.forget(WebService.job_ids(run))
+        return run
+
+    @staticmethod
+    def job_ids(run):
+        """ids of a run's jobs, speculative backups and retired jobs"""
+        return set(run.jobs.get_all()) | set(run.jobs.backups) | set(run.jobs.retired)
+
+    def archive_run(self, run, forced=False):
+        """store a finished run in run history, forced stores a run that started but did not finish
+        returns run history id or None when not stored"""
+        jobs = run.jobs
+        if not self.run_history or jobs.archived or not jobs.start_time:
+            return None
+        if not forced and (jobs.is_running or not jobs.end_time):
+            return None
+        run_id = self.run_history.archive(run.name, run.jobs_config, jobs)
+        jobs.archived = True
+        logger.info("Archived run %s as run history id %s", run.name, run_id)
+        return run_id
+
+    def job_updated(self, job, data):
+        """bookkeeping after a host updates a job"""
+        # hosts report instance id when claiming a job
+        if 'instance_id' in data:
+            self.hosts.record_instance(data['instance_id'])
+        if 'error_message' in data:
+            self.files.set_error_message(job)
+        # log timings for completed jobs
+        # parsed by scripts/statistics/process_orchestration_log.py
+        # parser needs both times, skip records missing end time
+        if data.get('status') == 'COMPLETE' and job.start_time and job.end_time:
+            logger.info("Completed Job, starttime: %s, endtime: %s, jobid: %s, config: %s, snapshot: %s",
+                job.start_time,
+                job.end_time,
+                job.job_id,
+                job.slice_config.replay_slice_id,
+                job.slice_config.snapshot_path)
+
+    def autoscale(self):
+        """run one autoscaling step across all runs, returns actions taken"""
+        actions = self.autoscaler.evaluate(self.runs, self.hosts)
+        logger.info("Autoscale current %s desired %s launched %s terminated %s",
+            actions['current_hosts'],
+            actions['desired_hosts'],
+            actions['launched'],
+            actions['terminated'])
+        if not actions['success']:
+            logger.warning("Autoscale failed %s", getattr(self.autoscaler.provisioner, 'last_error', None))
+        return actions
 
     @Request.application
-    # pylint: disable=too-many-return-statements disable=too-many-branches
-    # pylint: disable=too-many-statements disable=used-before-assignment
     def application(self, request):
+        """handle one request, holding the lock shared with the autoscaling thread"""
+        with self.lock:
+            return self.handle(request)
+
+    def handle(self, request):
         """
-        using werkzeug and python create a web application that supports
-        /job
-        /status
-        /healthcheck
-        /process /control /grid
-        /login /logout
-        /oauthback
-        /showlog
-        /restart
-        /config /userconfig 
-        /start
-        /stop
+        check access and pass the request to the method handling its path
+        see ROUTES, paths and methods not handled are not found
         """
-
-        # /job GET request
-        # two params nextjob with no values or jobid with a value
-        # when no params redirect to /job?nextjob
-        #
-        # nextjob get the next job ready for work, idle replay node would pick this up
-        # jobid get the configuration for a job
-        #
-        # how the results are reported depends on content-type passed in
-        # results could come page as text or json
         print (f"""\nSTART:
         Request URL {request.base_url}
         Request Path {request.path}
@@ -81,13 +169,15 @@ class WebService:
         # auth check /progress /grid /control /detail are HTML pages
         # /healthcheck does not require acess control
         #  /oauthback is called before access control is avalible
+        #  /package is limited to private IPs by nginx
         # API calls can only go to port 4000 and are secured by a firewall.
         #    We allow all calls going to port 4000 as those made it past firewalls
         #    Pattern matches IPv4 addresses only
         pattern = r'^http[s]*://\d+\.\d+\.\d+\.\d+:(\d+)/[a-zA-Z0-9_-]+'
         auth_match = re.match(pattern, request.base_url)
 
-        if request.path not in ['/progress', '/grid', '/control', '/detail', '/healthcheck', '/oauthback'] and \
+        if request.path not in ['/progress', '/grid', '/control', '/detail', '/healthcheck', '/oauthback',
+            '/package'] and \
             not (auth_match and auth_match.group(1) == "4000") and \
             not (ALWAYS_ALLOW or GitHubOauth.is_authorized(request.cookies,
                 request.headers.get('Authorization'),
@@ -95,526 +185,712 @@ class WebService:
                 env_name_values.get('team'))):
             return Response("Not Authorized", status=403)
 
-        if request.path == '/job':
-            # Work through GET Requests first
-            if request.method == 'GET':
+        handler = WebService.ROUTES.get(request.path)
+        response = getattr(self, handler)(request) if handler else None
+        # methods and content types not handled
+        if response is None:
+            return Response("Not found", status=404)
+        return response
 
-                # Handle URL Parameters
-                if request.args.get('jobid') is not None:
-                    result = self.jobs.get_job(request.args.get('jobid')) # pylint: disable=used-before-assignment
-                elif 'nextjob' in request.args.keys():
-                    result = self.jobs.get_next_job()
-                else:
-                    return Response("", status=301, headers={"Location": "/job?nextjob"})
-
-                # Check we have a legit value
-                if result is None:
-                    return Response("Could not find job", status=404)
-
-                etag_value = generate_etag(str(result.as_dict()).encode("utf-8"))
-
-                # Format based on content type
-                # content type is None when no content-type passed in
-                # redirect strips content type
-                # DEFAULT and PLAIN TEXT
-                if ('text/plain; charset=utf-8' in request.headers.get('Accept') or
-                    'text/plain' in request.headers.get('Accept') or
-                    '*/*' in request.headers.get('Accept') or
-                    request.headers.get('Accept') is None):
-                    response = Response(str(result), content_type='text/plain; charset=utf-8')
-                    response.headers['ETag'] = etag_value
-                    return response
-                # JSON
-                if 'application/json' in request.headers.get('Accept'):
-                    response = Response(json.dumps(result.as_dict()), content_type='application/json')
-                    response.headers['ETag'] = etag_value
-                    return response
-
-            # Work through POST Requests
-            elif request.method == 'POST':
-                request_etag = request.headers.get('ETag')
-
-                # must have jobid parameter
-                if not request.args.get('jobid'):
-                    return Response('jobid parameter is missing', status=404)
-                # validate etags to avoid race conditions
-                job_as_str = str(
-                    self.jobs.get_job(request.args.get('jobid')).as_dict()).encode("utf-8")
-                expected_etag = generate_etag(job_as_str)
-                if expected_etag != request_etag:
-                    return Response("Invalid ETag", status=400)
-
-                data = request.get_json()
-                if not data:
-                    return Response("Invalid JSON data", status=400)
-
-                # expects id to exist
-                if not 'job_id' in data:
-                    data['job_id'] = request.args.get('jobid')
-
-                # log timings for completed jobs if data['status'] == 'COMPLETE':
-
-                # check bool success for set_job to ensure valid data
-                if self.jobs.set_job(data):
-                    stringified = str(
-                        self.jobs.get_job(request.args.get('jobid')).as_dict()
-                        ).encode("utf-8")
-                    etag_value = generate_etag(stringified)
-                    response = Response(
-                        json.dumps({"status": "updated"}),
-                        content_type='application/json')
-                    response.headers['ETag'] = etag_value
-                    return response
-                return Response("Invalid job JSON data", status=400)
-
-        elif request.path == '/status':
-            # update the jobs status
-            report_obj = JobSummary.create(self.jobs)
-            self.jobs.update_running_status(report_obj['is_running'])
-            replay_slice = request.args.get('sliceid')
-            results = []
+    # pylint: disable=too-many-return-statements disable=too-many-branches
+    def handle_job(self, request):
+        """/job GET next job or a job by id, POST and PATCH updates from replay hosts"""
+        # /job GET request
+        # two params nextjob with no values or jobid with a value
+        # when no params redirect to /job?nextjob
+        #
+        # nextjob get the next job ready for work, idle replay node would pick this up
+        # jobid get the configuration for a job
+        #
+        # how the results are reported depends on content-type passed in
+        # results could come page as text or json
+        # Work through GET Requests first
+        if request.method == 'GET':
 
             # Handle URL Parameters
-            if request.method == 'GET':
-                # if id push one element into an array
-                # else return the entire array
-                if replay_slice:
-                    this_slice = self.jobs.get_by_position(replay_slice)
-
-                    # check if not set and results empty
-                    if this_slice is None:
-                        return Response("Not found", status=404)
-                    # set the slice
-                    results.append(this_slice)
-
-                else:
-                    for this_slice in self.jobs.get_all().items():
-                        results.append(this_slice[1])
-
-                # Format based on content type
-                # content type is None when no content-type passed in
-                # redirect strips content type
-                # HTML
-                if 'text/html' in request.headers.get('Accept'):
-                    # Converting to simple HTML representation (adjust as needed)
-                    content = ReportTemplate.status_html_report(results)
-                    return Response(content, content_type='text/html')
-                # JSON
-                if 'application/json' in request.headers.get('Accept'):
-                    # Converting from object to dictionarys to dump json
-                    results_as_dict = [obj.as_dict() for obj in results]
-                    return Response(json.dumps(results_as_dict),content_type='application/json')
-                # DEFAULT and PLAIN TEXT
-                if ('text/plain; charset=utf-8' in request.headers.get('Accept') or
-                    'text/plain' in request.headers.get('Accept') or
-                    '*/*' in request.headers.get('Accept') or
-                    request.headers.get('Accept') is None):
-                    # Converting to simple Text format
-                    content = ReportTemplate.status_text_report(results)
-                    return Response(content,content_type='text/plain; charset=uft-8')
-
-        elif request.path == '/config':
-            slice_id = request.args.get('sliceid')
-            this_config = self.replay_config_manager.get(slice_id) # pylint: disable=used-before-assignment
-
-            # only GET with param
-            if request.method == 'GET' and slice_id is not None:
-                # Format based on content type
-                # content type is None when no content-type passed in
-                # redirect strips content type
-                # HTML
-                if 'text/html' in request.headers.get('Accept'):
-                    # Converting to simple HTML representation (adjust as needed)
-                    content = ReportTemplate.config_html_report(this_config)
-                    return Response(content, content_type='text/html')
-                # JSON
-                if ('application/json' in request.headers.get('Accept') or
-                    '*/*' in request.headers.get('Accept') or
-                    request.headers.get('Accept') is None):
-                    # Converting from object to dictionarys to dump json
-                    results_as_dict = this_config.as_dict()
-                    return Response(json.dumps(results_as_dict),content_type='application/json')
-
-            elif request.method == 'POST':
-                # posted json body end_block_id and integrity_hash
-                # return sliceid and message
-                data = request.get_json()
-                if not data:
-                    return Response("Invalid JSON data", status=400)
-
-                # search for block by end_block_num and by spring_version
-                block = self.replay_config_manager.return_record_by_end_block_id(int(data['end_block_num']),data['spring_version'])
-                if block is None:
-                    return Response(f"Config Record with {data['end_block_num']} Not found", status=404)
-                block.expected_integrity_hash = data['integrity_hash']
-                self.replay_config_manager.set(block)
-                self.replay_config_manager.persist()
-
-                response_message = {
-                    'sliceid': block.replay_slice_id,
-                    'message': 'updated integrity hash'
-                }
-
-                return Response(json.dumps(response_message),content_type='application/json')
-
-        elif request.path == '/userconfig':
-            if request.method == 'POST':
-                form_data = json.loads(request.get_data())
-                logger.debug("in /userconfig with form data %s",form_data['userconfigtxt'])
-                user_config = UserConfig(form_data['userconfigtxt'],logger)
-                logger.debug("Post User Config")
-                user_config_status = user_config.check_status()
-                if user_config_status['isok']:
-                    return Response('{"status":"OK"}',content_type='application/json')
-
-                if user_config_status['badword'] != '':
-                    return Response(
-                        f'{{"status":"Denied","badword":"{user_config_status["badword"]}"}}',
-                        content_type='application/json',
-                        status=400)
-            return Response('{"status":"Error","message":"unknown error"}',
-                content_type='application/json',
-                status=400)
-
-        elif request.path == '/clean':
-            if request.method == 'POST':
-                user_config = UserConfig('',logger)
-                user_config.clean()
-                return Response('{"status":"OK"}',content_type='application/json')
-            return Response('{"status":"Error","message":"unknown error"}',
-                content_type='application/json',
-                status=400)
-
-        elif request.path == '/healthcheck':
-            return Response('OK',content_type='text/plain; charset=utf-8')
-
-        # pylint: disable=too-many-nested-blocks
-        elif request.path == '/restart':
-            # form submissions only allow POST
-            if request.method in ['POST', 'PUT']:
-                body = request.get_data(as_text=True)
-                # split by & or new line
-                # forms will post as one line sep by &
-                # sometimes browsers will post as mutiple lines
-                lines = re.split(r'[\n&]', body)
-                # parse body to get parameters
-                body_parameters = {}
-                for line in lines:
-                    if '=' in line:
-                        key, value = line.split('=', 1)  # Split only at the first '='
-                        body_parameters[key.strip()] = value.strip()
-                    else:
-                        pass  # Handle lines without '='
-
-                # unescape string if it looks like it is escaped
-                if 'config_file_path' in body_parameters:
-                    # normalize path if URL encoded
-                    if '%' in body_parameters['config_file_path']:
-                        body_parameters['config_file_path'] = unquote(body_parameters['config_file_path'])
-                    # abort if config file does not exist
-                    if not os.path.exists(body_parameters['config_file_path']):
-                        params = urlencode({"error": f"Configuration file {body_parameters['config_file_path']} does not exist"})
-                        if 'application/json' in request.headers.get('Accept'):
-                            return Response(params, status=404)
-                        return redirect(f"/control?{params}")
-
-                    # update configuration file with new version
-                    # either official version number or branch name
-                    if 'target_version' in body_parameters:
-                        ControlConfig.set_version(body_parameters['target_version'],
-                            body_parameters['config_file_path'])
-                    if 'target_branch' in body_parameters and 'target_version' not in body_parameters:
-                        # check to see if the branch is ok to use
-                        # can we find a CI/CD build
-                        env_name_values.get('config_dir')
-                        [owner,repo] = env_name_values.get('repo').split('/')
-                        artifact_dict_response = ArtifactURL.deb_url_by_branch(
-                            owner,
-                            repo,
-                            body_parameters['target_branch'],
-                            env_name_values.get('artifact'),
-                            env_name_values.get('github_read_token'))
-                        if not artifact_dict_response['success']:
-                            params = urlencode({
-                                "error": "Bad branch, unable to find valid build from CI/CD\n"
-                            })
-                            if 'application/json' in request.headers.get('Accept'):
-                                return Response(params, status=400)
-                            return redirect(f"/control?{params}")
-                        ControlConfig.set_version(body_parameters['target_branch'],
-                            body_parameters['config_file_path'])
-
-                    forced = False
-                    if 'forced' in body_parameters \
-                        and body_parameters['forced'].lower() in ['true','yes']:
-                        forced = True
-
-
-                    report_obj = JobSummary.create(self.jobs)  # check for job in progress
-                    self.jobs.update_running_status(report_obj['is_running'])
-                    if report_obj['is_running'] and not forced:
-                        params = urlencode({
-                            "error": "Jobs not complete requires `force` option"
-                        })
-                        if 'application/json' in request.headers.get('Accept'):
-                            return Response(params, status=400)
-                        return redirect(f"/control?{params}")
-
-                    # reset the state using the provided config
-                    self.reset(body_parameters['config_file_path'],env_name_values.get('datacenter_config'))
-                    # successfully reload configs
-                    params = urlencode({
-                        "success": "Sucessfully loaded new configuration"
-                    })
-                    if 'application/json' in request.headers.get('Accept'):
-                        return Response(params, status=200)
-                    return redirect(f"/control?{params}")
-
-                # no configuration file
-                params = urlencode({
-                    "error": "Requires config_file_path value in body of post"
-                })
-                if 'application/json' in request.headers.get('Accept'):
-                    return Response(params, status=400)
-                return redirect(f"/control?{params}")
-
-            # not supported request.method in ['GET','DELETE']
-            return Response("method not supported", status=405)
-
-        elif request.path == '/release_versions':
-            if request.method == 'GET':
-                [owner,repo] = env_name_values.get('repo').split('/')
-                versions = ControlConfig.get_versions(owner,repo)
-                return Response(json.dumps(versions), content_type='application/json')
-
-            # not supported request.method in ['POST','PUT','DELETE']
-            return Response("method not supported", status=405)
-
-        elif request.path == '/repo_branches':
-            if request.method == 'GET':
-                [owner,repo] = env_name_values.get('repo').split('/')
-                branches = ControlConfig.get_branches(owner,repo)
-                return Response(json.dumps(branches), content_type='application/json')
-
-            # not supported request.method in ['POST','PUT','DELETE']
-            return Response("method not supported", status=405)
-
-        elif request.path == '/config_files':
-            if request.method == 'GET':
-                config_dir = env_name_values.get('config_dir')
-                config_files = ControlConfig.config_files(config_dir)
-                return Response(json.dumps(config_files), content_type='application/json')
-
-            # not supported request.method in ['POST','PUT','DELETE']
-            return Response("method not supported", status=405)
-
-        elif request.path == '/deb_download_url':
-            if request.method == 'GET':
-                branch = request.args.get('branch')
-                if not branch:
-                    return Response("no branch argument provided", status=400)
+            if request.args.get('jobid') is not None:
+                _, result = self.runs.find_job(request.args.get('jobid')) # pylint: disable=used-before-assignment
+            elif 'nextjob' in request.args.keys():
+                # hosts report artifacts left from previous jobs
+                # and who is asking, a job the host's slot leased is returned first
+                instance_id = request.args.get('instance')
+                self.hosts.record_slots(instance_id, request.args.get('slots'))
+                _, result = self.runs.next_job(
+                    JobManager.parse_held(request.args.get('strides'), as_int=True),
+                    JobManager.parse_held(request.args.get('snapshots')),
+                    Hosts.slot_name(instance_id, request.args.get('slot')))
+            else:
+                return Response("", status=301, headers={"Location": "/job?nextjob"})
 
-                env_name_values.get('config_dir')
-                [owner,repo] = env_name_values.get('repo').split('/')
-                artifact_dict_response = ArtifactURL.deb_url_by_branch(
-                    owner,
-                    repo,
-                    branch,
-                    env_name_values.get('artifact'),
-                    env_name_values.get('github_read_token'))
+            # Check we have a legit value
+            if result is None:
+                return Response("Could not find job", status=404)
 
-                return Response(json.dumps(artifact_dict_response), content_type='application/json')
+            etag_value = generate_etag(str(result.as_dict()).encode("utf-8"))
 
-            # not supported request.method in ['POST','PUT','DELETE']
-            return Response("method not supported", status=405)
+            # Format based on content type
+            # content type is None when no content-type passed in
+            # redirect strips content type
+            # DEFAULT and PLAIN TEXT
+            if ('text/plain; charset=utf-8' in request.headers.get('Accept') or
+                'text/plain' in request.headers.get('Accept') or
+                '*/*' in request.headers.get('Accept') or
+                request.headers.get('Accept') is None):
+                response = Response(str(result), content_type='text/plain; charset=utf-8')
+                response.headers['ETag'] = etag_value
+                return response
+            # JSON
+            if 'application/json' in request.headers.get('Accept'):
+                response = Response(json.dumps(result.as_dict()), content_type='application/json')
+                response.headers['ETag'] = etag_value
+                return response
+
+        # Work through POST Requests
+        elif request.method == 'POST':
+            request_etag = request.headers.get('ETag')
+
+            # must have jobid parameter
+            if not request.args.get('jobid'):
+                return Response('jobid parameter is missing', status=404)
+            # job may belong to any run
+            run, job = self.runs.find_job(request.args.get('jobid'))
+            if job is None:
+                return Response("Could not find job", status=404)
+            # another copy of this job finished first, tell the host to stop
+            if job.superseded:
+                return Response("Job superseded by speculative copy", status=410)
+            # validate etags to avoid race conditions
+            job_as_str = str(job.as_dict()).encode("utf-8")
+            expected_etag = generate_etag(job_as_str)
+            if expected_etag != request_etag:
+                return Response("Invalid ETag", status=400)
+
+            data = request.get_json()
+            if not data:
+                return Response("Invalid JSON data", status=400)
+
+            # expects id to exist
+            if not 'job_id' in data:
+                data['job_id'] = request.args.get('jobid')
+
+            # check bool success for set_job to ensure valid data
+            if run.jobs.set_job(data):
+                self.job_updated(job, data)
+                stringified = str(job.as_dict()).encode("utf-8")
+                etag_value = generate_etag(stringified)
+                response = Response(
+                    json.dumps({"status": "updated"}),
+                    content_type='application/json')
+                response.headers['ETag'] = etag_value
+                return response
+            return Response("Invalid job JSON data", status=400)
+
+        # field level updates, no ETag, optional preconditions
+        elif request.method == 'PATCH':
+            run, job = self.runs.find_job(request.args.get('jobid'))
+            if job is None:
+                return Response("Could not find job", status=404)
+            if job.superseded:
+                return Response("Job superseded by speculative copy", status=410)
+            data = request.get_json(force=True, silent=True)
+            if not data or not isinstance(data, dict):
+                return Response("Invalid JSON data", status=400)
+            preconditions = data.pop('preconditions', None)
+            if not JobManager.check_preconditions(job, preconditions):
+                return Response(json.dumps(job.as_dict()),
+                    status=412,
+                    content_type='application/json')
+            if not run.jobs.patch_job(job.job_id, data):
+                return Response("Invalid job JSON data", status=400)
+            self.job_updated(job, data)
+            response = Response(json.dumps(job.as_dict()), content_type='application/json')
+            response.headers['ETag'] = generate_etag(str(job.as_dict()).encode("utf-8"))
+            return response
+        return None
+
+    def handle_status(self, request):
+        """/status GET jobs of a run as html, json or text"""
+        run = self.runs.get(request.args.get('run'))
+        if run is None:
+            return Response("Run not found", status=404)
+        # update the jobs status
+        report_obj = JobSummary.create(run.jobs)
+        run.jobs.update_running_status(report_obj['is_running'])
+        self.archive_run(run)
+        replay_slice = request.args.get('sliceid')
+        results = []
+
+        # Handle URL Parameters
+        if request.method == 'GET':
+            # if id push one element into an array
+            # else return the entire array
+            if replay_slice:
+                this_slice = run.jobs.get_by_position(replay_slice)
+
+                # check if not set and results empty
+                if this_slice is None:
+                    return Response("Not found", status=404)
+                # set the slice
+                results.append(this_slice)
 
-        elif request.path == '/summary':
-            report_obj = JobSummary.create(self.jobs)
-            if self.hosts.host_count:
-                report_obj['host_count'] = self.hosts.host_count
             else:
-                report_obj['host_count'] = 0
-            self.jobs.update_running_status(report_obj['is_running'])
+                for this_slice in run.jobs.get_all().items():
+                    results.append(this_slice[1])
+            # job id to (blocks_per_second, eta_seconds)
+            estimates = Throughput.job_estimates(run.jobs, results)
 
             # Format based on content type
             # content type is None when no content-type passed in
+            # redirect strips content type
             # HTML
             if 'text/html' in request.headers.get('Accept'):
                 # Converting to simple HTML representation (adjust as needed)
-                return Response(ReportTemplate.summary_html_report(report_obj), \
-                    content_type='text/html')
+                content = ReportTemplate.status_html_report(results, estimates)
+                return Response(content, content_type='text/html')
             # JSON
             if 'application/json' in request.headers.get('Accept'):
-                return Response(json.dumps(report_obj),content_type='application/json')
+                # Converting from object to dictionarys to dump json
+                results_as_dict = [dict(obj.as_dict(), blocks_per_second=estimates[obj.job_id][0],
+                    eta_seconds=estimates[obj.job_id][1]) for obj in results]
+                return Response(json.dumps(results_as_dict),content_type='application/json')
             # DEFAULT and PLAIN TEXT
             if ('text/plain; charset=utf-8' in request.headers.get('Accept') or
                 'text/plain' in request.headers.get('Accept') or
                 '*/*' in request.headers.get('Accept') or
                 request.headers.get('Accept') is None):
                 # Converting to simple Text format
-                return Response(ReportTemplate.summary_text_report(report_obj), \
-                    content_type='text/plain; charset=uft-8')
-
-        elif request.path == '/logout':
-            response = redirect('/progress')
-            response.delete_cookie('replay_auth')
-            return response
-
-        elif request.path in ['/progress', '/grid', '/control', '/detail', '/showlog']:
-            # save the referer passed back in /oauthback
-            # quote url encodes string
-            referring_url = request.path
-
-            if ALWAYS_ALLOW or \
-                GitHubOauth.is_authorized(request.cookies,
-                request.headers.get('Authorization'),
-                env_name_values.get('user_info_url'),
-                env_name_values.get('team')):
-                # Retrieve the auth cookie
-                cookie_value = request.cookies.get('replay_auth')
-                login, avatar_url = GitHubOauth.str_to_public_profile(cookie_value)
-                html_content = html_factory.contents('header.html') \
-                + HtmlPage.profile_top_bar_html(login, avatar_url) \
-                + html_factory.contents('navbar.html') \
-                + html_factory.contents(request.path) \
-                + html_factory.contents('footer.html')
-            else:
-                html_content = html_factory.contents('header.html') \
-                + HtmlPage.default_top_bar_html(\
-                    GitHubOauth.assemble_oauth_url(referring_url, env_name_values)\
-                ) \
-                + HtmlPage.not_authorized() \
-                + html_factory.contents('footer.html')
-
-            return Response(html_content, content_type='text/html')
-
-        elif request.path == '/oauthback':
-            # this is where we do the login
-            # state passed from the user, just the path to return to
-            referral_path = request.args.get('state')
-
-            # build request to get access token from code
-            code = request.args.get('code')
-
-            # hold token for very short time
-            bearer_token = GitHubOauth.get_oauth_access_token(code, env_name_values)
-            if bearer_token:
-                profile_data = GitHubOauth.create_auth_string(bearer_token, env_name_values.get('user_info_url'))
-                login, avatar_url = GitHubOauth.str_to_public_profile(profile_data)
-                is_authorized_member = GitHubOauth.check_membership(bearer_token,
-                    login,
-                    env_name_values.get('team'))
-                # wipe out token after getting profile data, and checking authorization
-                bearer_token = None
-                if is_authorized_member:
-                    # Calculate the expiration time, 1 week (7 days) from now
-                    expires = datetime.utcnow() + timedelta(days=7)
-
-                    html_content = html_factory.contents('header.html') \
-                    + HtmlPage.profile_top_bar_html(login, avatar_url) \
-                    + html_factory.contents('navbar.html') \
-                    + html_factory.contents(referral_path) \
-                    + html_factory.contents('footer.html')
-
-                    response = Response(html_content, content_type='text/html')
-
-                    # Build an html page using the referal path
-                    # Set an HTTP cookie with the expiration time, with highest security
-                    # Return response
-                    response.set_cookie('replay_auth',
-                        profile_data,
-                        expires=expires,
-                        secure=True,
-                        httponly=True,
-                        samesite='Strict')
-                    return response
-
-            # failed to get access token
-            no_token_html = html_factory.contents('header.html') \
-            + HtmlPage.default_top_bar_html(GitHubOauth.assemble_oauth_url(referral_path, env_name_values)) \
-            + HtmlPage.not_authorized("Auth Failed Could Not Retreive Access Token: Try Again") \
-            + html_factory.contents('footer.html')
-            return Response(no_token_html, status=403, content_type='text/html')
-
-        elif request.path == '/start':
-            if self.jobs.is_running:
-                params = urlencode({
-                    "error": "Jobs Already In Progress can not start\n"
-                })
-                if 'application/json' in request.headers.get('Accept'):
-                    return Response(params, status=400)
-                return redirect(f"/control?{params}")
-
-            # Path to the shell script
-            script_dir = env_name_values.get('script_dir')
-            script_path = f"{script_dir}/replayhost/run-replay-instance.sh"
-            # divide jobs by 5 return a whole number max 120 min of 5
-            workers = max(5, min(120, len(self.jobs) // 5))
-            # Execute the shell script
-            result = subprocess.run([script_path, str(workers)],
-                shell=False,
-                check=False,
-                capture_output=True,
-                text=True)
-            if result.returncode == 0:
-                # set number of hosts allocated
-                self.hosts.set_count(workers)
-                params = urlencode({
-                    "success": f"Successfully Allocated {workers} Hosts"
-                })
-                if 'application/json' in request.headers.get('Accept'):
-                    return Response(params, status=200)
-                return redirect(f"/control?{params}")
-
-            params = urlencode({
-                "error": f"Error: {result.stderr}"
-            })
-            if 'application/json' in request.headers.get('Accept'):
-                return Response(params, status=500)
-            return redirect(f"/control?{params}")
-
-        elif request.path == '/stop':
-            if not self.hosts.has_hosts():
-                params = urlencode({
-                    "error": "No jobs running can not stop\n"
-                })
-                if 'application/json' in request.headers.get('Accept'):
-                    return Response(params, status=400)
-                return redirect(f"/control?{params}")
-
-            # Path to the shell script
-            script_dir = env_name_values.get('script_dir')
-            script_path = f"{script_dir}/replayhost/terminate-replay-instance.sh"
-            workers = "ALL"
-            # Execute the shell script
-            result = subprocess.run([script_path, workers],
-                shell=False,
-                check=False,
-                capture_output=True,
-                text=True)
-            if result.returncode == 0:
-                # set number of hosts allocated
-                self.hosts.set_count(0)
-                params = urlencode({
-                    "success": "Sucessfully Shutdown Hosts"
-                })
-                if 'application/json' in request.headers.get('Accept'):
-                    return Response(params, status=200)
-                return redirect(f"/control?{params}")
-
-            params = urlencode({
-                "error": result.stderr
-            })
-            if 'application/json' in request.headers.get('Accept'):
-                return Response(params, status=500)
-            return redirect(f"/control?{params}")
-
-        return Response("Not found", status=404)
+                content = ReportTemplate.status_text_report(results, estimates)
+                return Response(content,content_type='text/plain; charset=uft-8')
+        return None
+
+    def handle_config(self, request):
+        """/config GET slice configuration, POST expected integrity hash of a slice"""
+        slice_id = request.args.get('sliceid')
+        run = self.runs.get(request.args.get('run'))
+        if run is None:
+            return Response("Run not found", status=404)
+        this_config = run.replay_config_manager.get(slice_id) # pylint: disable=used-before-assignment
+
+        # only GET with param
+        if request.method == 'GET' and slice_id is not None:
+            # Format based on content type
+            # content type is None when no content-type passed in
+            # redirect strips content type
+            # HTML
+            if 'text/html' in request.headers.get('Accept'):
+                # Converting to simple HTML representation (adjust as needed)
+                content = ReportTemplate.config_html_report(this_config)
+                return Response(content, content_type='text/html')
+            # JSON
+            if ('application/json' in request.headers.get('Accept') or
+                '*/*' in request.headers.get('Accept') or
+                request.headers.get('Accept') is None):
+                # Converting from object to dictionarys to dump json
+                results_as_dict = this_config.as_dict()
+                return Response(json.dumps(results_as_dict),content_type='application/json')
+
+        elif request.method == 'POST':
+            # posted json body end_block_id and integrity_hash
+            # return sliceid and message
+            data = request.get_json()
+            if not data:
+                return Response("Invalid JSON data", status=400)
+
+            # hosts send their job id, update the run the job belongs to
+            if data.get('job_id'):
+                job_run, _ = self.runs.find_job(data['job_id'])
+                if job_run is not None:
+                    run = job_run
+
+            # search for block by end_block_num and by spring_version
+            block = run.replay_config_manager.return_record_by_end_block_id(int(data['end_block_num']),
+                data['spring_version'])
+            if block is None:
+                return Response(f"Config Record with {data['end_block_num']} Not found", status=404)
+            block.expected_integrity_hash = data['integrity_hash']
+            run.replay_config_manager.set(block)
+            run.replay_config_manager.persist()
+            # jobs that finished before this hash was known
+            settled = run.jobs.settle_verifying(block.end_block_id, block.spring_version)
+
+            response_message = {
+                'sliceid': block.replay_slice_id,
+                'message': 'updated integrity hash',
+                'settled_jobs': [job.job_id for job in settled]
+            }
+
+            return Response(json.dumps(response_message),content_type='application/json')
+        return None
+
+    def handle_userconfig(self, request):
+        """/userconfig POST check user supplied configuration"""
+        if request.method == 'POST':
+            form_data = json.loads(request.get_data())
+            logger.debug("in /userconfig with form data %s",form_data['userconfigtxt'])
+            user_config = UserConfig(form_data['userconfigtxt'],logger)
+            logger.debug("Post User Config")
+            user_config_status = user_config.check_status()
+            if user_config_status['isok']:
+                return Response('{"status":"OK"}',content_type='application/json')
 
-if __name__ == '__main__':
-    # env holds oauth, location of config files, and github repos
-    env_name_values = EnvStore('env')
+            if user_config_status['badword'] != '':
+                return Response(
+                    f'{{"status":"Denied","badword":"{user_config_status["badword"]}"}}',
+                    content_type='application/json',
+                    status=400)
+        return Response('{"status":"Error","message":"unknown error"}',
+            content_type='application/json',
+            status=400)
+
+    def handle_clean(self, request):
+        """/clean POST remove user supplied configuration"""
+        if request.method == 'POST':
+            user_config = UserConfig('',logger)
+            user_config.clean()
+            return Response('{"status":"OK"}',content_type='application/json')
+        return Response('{"status":"Error","message":"unknown error"}',
+            content_type='application/json',
+            status=400)
+
+    def handle_healthcheck(self, _request):
+        """/healthcheck always OK"""
+        return Response('OK',content_type='text/plain; charset=utf-8')
 
+    # pylint: disable=too-many-return-statements disable=too-many-branches
+    def handle_restart(self, request):
+        """/restart POST load a configuration into the default or a named run"""
+        # form submissions only allow POST
+        if request.method in ['POST', 'PUT']:
+            body = request.get_data(as_text=True)
+            # forms will post as one line sep by &
+            # sometimes browsers will post as mutiple lines
+            body_parameters = {}
+            for line in re.split(r'[\n&]', body):
+                if '=' in line:
+                    key, value = line.split('=', 1)  # Split only at the first '='
+                    body_parameters[key.strip()] = value.strip()
+
+            # unescape string if it looks like it is escaped
+            if 'config_file_path' in body_parameters:
+                # normalize path if URL encoded
+                if '%' in body_parameters['config_file_path']:
+                    body_parameters['config_file_path'] = unquote(body_parameters['config_file_path'])
+                # abort if config file does not exist
+                if not os.path.exists(body_parameters['config_file_path']):
+                    return WebService.control_response(request, "error",
+                        f"Configuration file {body_parameters['config_file_path']} does not exist", 404)
+
+                # update configuration file with new version
+                # either official version number or branch name
+                if 'target_version' in body_parameters:
+                    ControlConfig.set_version(body_parameters['target_version'],
+                        body_parameters['config_file_path'])
+                if 'target_branch' in body_parameters and 'target_version' not in body_parameters:
+                    # check to see if the branch is ok to use
+                    # can we find a CI/CD build
+                    [owner,repo] = env_name_values.get('repo').split('/')
+                    artifact_dict_response = ArtifactURL.deb_url_by_branch(
+                        owner,
+                        repo,
+                        body_parameters['target_branch'],
+                        env_name_values.get('artifact'),
+                        env_name_values.get('github_read_token'))
+                    if not artifact_dict_response['success']:
+                        return WebService.control_response(request, "error",
+                            "Bad branch, unable to find valid build from CI/CD\n", 400)
+                    ControlConfig.set_version(body_parameters['target_branch'],
+                        body_parameters['config_file_path'])
+
+                forced = False
+                if 'forced' in body_parameters \
+                    and body_parameters['forced'].lower() in ['true','yes']:
+                    forced = True
+
+
+                # named run, otherwise the default run
+                run_name = body_parameters.get('run', RunRegistry.DEFAULT_RUN)
+                run = self.runs.get(run_name)
+
+                # reload keeps job state for unchanged slices, safe while running
+                if body_parameters.get('mode') == 'reload' and run is not None:
+                    kept_ids = WebService.job_ids(run)
+                    counts = run.reload(body_parameters['config_file_path'])
+                    self.files.forget(WebService.job_ids(run) - kept_ids)
+                    if run_name == RunRegistry.DEFAULT_RUN:
+                        self.jobs_config = run.jobs_config
+                        self.replay_config_manager = run.replay_config_manager
+                    logger.info("Reloaded run %s kept %s added %s retired %s",
+                        run_name, counts['kept'], counts['added'], counts['retired'])
+                    return WebService.control_response(request, "success",
+                        f"Reloaded configuration kept {counts['kept']} "
+                        f"added {counts['added']} retired {counts['retired']} jobs", 200)
+
+                is_running = False
+                if run is not None:
+                    report_obj = JobSummary.create(run.jobs)  # check for job in progress
+                    run.jobs.update_running_status(report_obj['is_running'])
+                    is_running = report_obj['is_running']
+                if is_running and not forced:
+                    return WebService.control_response(request, "error",
+                        "Jobs not complete requires `force` option", 400)
+
+                # reset the state using the provided config
+                if run_name == RunRegistry.DEFAULT_RUN:
+                    self.reset(body_parameters['config_file_path'],env_name_values.get('datacenter_config'))
+                else:
+                    self.add_run(run_name,
+                        body_parameters['config_file_path'],
+                        WebService.to_int(body_parameters.get('weight'), 1),
+                        WebService.to_int(body_parameters.get('priority'), 0))
+                # successfully reload configs
+                return WebService.control_response(request, "success",
+                    "Sucessfully loaded new configuration", 200)
+
+            # no configuration file
+            return WebService.control_response(request, "error",
+                "Requires config_file_path value in body of post", 400)
+
+        # not supported request.method in ['GET','DELETE']
+        return Response("method not supported", status=405)
+
+    def handle_release_versions(self, request):
+        """/release_versions GET release versions of the repo"""
+        if request.method == 'GET':
+            [owner,repo] = env_name_values.get('repo').split('/')
+            versions = ControlConfig.get_versions(owner,repo)
+            return Response(json.dumps(versions), content_type='application/json')
+
+        # not supported request.method in ['POST','PUT','DELETE']
+        return Response("method not supported", status=405)
+
+    def handle_repo_branches(self, request):
+        """/repo_branches GET branches of the repo"""
+        if request.method == 'GET':
+            [owner,repo] = env_name_values.get('repo').split('/')
+            branches = ControlConfig.get_branches(owner,repo)
+            return Response(json.dumps(branches), content_type='application/json')
+
+        # not supported request.method in ['POST','PUT','DELETE']
+        return Response("method not supported", status=405)
+
+    def handle_config_files(self, request):
+        """/config_files GET configuration files in config_dir"""
+        if request.method == 'GET':
+            config_dir = env_name_values.get('config_dir')
+            config_files = ControlConfig.config_files(config_dir)
+            return Response(json.dumps(config_files), content_type='application/json')
+
+        # not supported request.method in ['POST','PUT','DELETE']
+        return Response("method not supported", status=405)
+
+    def handle_deb_download_url(self, request):
+        """/deb_download_url GET url of the CI/CD build of a branch"""
+        if request.method == 'GET':
+            branch = request.args.get('branch')
+            if not branch:
+                return Response("no branch argument provided", status=400)
+
+            [owner,repo] = env_name_values.get('repo').split('/')
+            artifact_dict_response = ArtifactURL.deb_url_by_branch(
+                owner,
+                repo,
+                branch,
+                env_name_values.get('artifact'),
+                env_name_values.get('github_read_token'))
+
+            return Response(json.dumps(artifact_dict_response), content_type='application/json')
+
+        # not supported request.method in ['POST','PUT','DELETE']
+        return Response("method not supported", status=405)
+
+    def handle_joblog(self, request):
+        """/joblog upload and page job logs"""
+        return self.files.joblog(request, self.runs)
+
+    def handle_logsearch(self, request):
+        """/logsearch GET jobs whose logs hold a phrase or error signatures"""
+        return self.files.search(request,
+            self.runs.get(request.args.get('run')),
+            WebService.to_int(request.args.get('limit'), 100))
+
+    def handle_package(self, request):
+        """/package GET mirrored nodeos package"""
+        return self.files.package(request)
+
+    def handle_summary(self, request):
+        """/summary GET progress of a run as html, json or text"""
+        run = self.runs.get(request.args.get('run'))
+        if run is None:
+            return Response("Run not found", status=404)
+        report_obj = JobSummary.create(run.jobs)
+        if self.hosts.host_count:
+            report_obj['host_count'] = self.hosts.host_count
+        else:
+            report_obj['host_count'] = 0
+        run.jobs.update_running_status(report_obj['is_running'])
+        self.archive_run(run)
+
+        # Format based on content type
+        # content type is None when no content-type passed in
+        # HTML
+        if 'text/html' in request.headers.get('Accept'):
+            # Converting to simple HTML representation (adjust as needed)
+            return Response(ReportTemplate.summary_html_report(report_obj), \
+                content_type='text/html')
+        # JSON
+        if 'application/json' in request.headers.get('Accept'):
+            return Response(json.dumps(report_obj),content_type='application/json')
+        # DEFAULT and PLAIN TEXT
+        if ('text/plain; charset=utf-8' in request.headers.get('Accept') or
+            'text/plain' in request.headers.get('Accept') or
+            '*/*' in request.headers.get('Accept') or
+            request.headers.get('Accept') is None):
+            # Converting to simple Text format
+            return Response(ReportTemplate.summary_text_report(report_obj), \
+                content_type='text/plain; charset=uft-8')
+        return None
+
+    def handle_logout(self, _request):
+        """/logout remove auth cookie"""
+        response = redirect('/progress')
+        response.delete_cookie('replay_auth')
+        return response
+
+    def handle_page(self, request):
+        """PAGES HTML pages, login prompt when not authorized"""
+        # save the referer passed back in /oauthback
+        # quote url encodes string
+        referring_url = request.path
+
+        if ALWAYS_ALLOW or \
+            GitHubOauth.is_authorized(request.cookies,
+            request.headers.get('Authorization'),
+            env_name_values.get('user_info_url'),
+            env_name_values.get('team')):
+            # Retrieve the auth cookie
+            cookie_value = request.cookies.get('replay_auth')
+            login, avatar_url = GitHubOauth.str_to_public_profile(cookie_value)
+            html_content = html_factory.profile_page(request.path, login, avatar_url)
+        else:
+            html_content = html_factory.login_page(
+                GitHubOauth.assemble_oauth_url(referring_url, env_name_values))
+
+        return Response(html_content, content_type='text/html')
+
+    def handle_oauthback(self, request):
+        """/oauthback GitHub login, sets auth cookie for members of the team"""
+        # this is where we do the login
+        # state passed from the user, just the path to return to
+        referral_path = request.args.get('state')
+
+        # build request to get access token from code
+        code = request.args.get('code')
+
+        # hold token for very short time
+        bearer_token = GitHubOauth.get_oauth_access_token(code, env_name_values)
+        if bearer_token:
+            profile_data = GitHubOauth.create_auth_string(bearer_token, env_name_values.get('user_info_url'))
+            login, avatar_url = GitHubOauth.str_to_public_profile(profile_data)
+            is_authorized_member = GitHubOauth.check_membership(bearer_token,
+                login,
+                env_name_values.get('team'))
+            # wipe out token after getting profile data, and checking authorization
+            bearer_token = None
+            if is_authorized_member:
+                # Calculate the expiration time, 1 week (7 days) from now
+                expires = datetime.utcnow() + timedelta(days=7)
+
+                html_content = html_factory.profile_page(referral_path, login, avatar_url)
+                response = Response(html_content, content_type='text/html')
+
+                # Build an html page using the referal path
+                # Set an HTTP cookie with the expiration time, with highest security
+                # Return response
+                response.set_cookie('replay_auth',
+                    profile_data,
+                    expires=expires,
+                    secure=True,
+                    httponly=True,
+                    samesite='Strict')
+                return response
+
+        # failed to get access token
+        no_token_html = html_factory.login_page(
+            GitHubOauth.assemble_oauth_url(referral_path, env_name_values),
+            "Auth Failed Could Not Retreive Access Token: Try Again")
+        return Response(no_token_html, status=403, content_type='text/html')
+
+    def handle_start(self, request):
+        """/start POST allocate replay hosts"""
+        if self.runs.is_running():
+            return WebService.control_response(request, "error",
+                "Jobs Already In Progress can not start\n", 400)
+
+        if self.autoscaler:
+            # size fleet to finish remaining work in target time
+            workers = max(1, self.autoscaler.desired_hosts(self.runs, self.hosts.slots_per_host()))
+        else:
+            # divide jobs across all runs by 5 return a whole number max 120 min of 5
+            workers = max(5, min(120, len(self.runs) // 5))
+        # Execute the shell script
+        provisioner = ShellProvisioner(env_name_values.get('script_dir'))
+        if provisioner.launch(workers):
+            # set number of hosts allocated
+            self.hosts.set_count(workers)
+            return WebService.control_response(request, "success",
+                f"Successfully Allocated {workers} Hosts", 200)
+        return WebService.control_response(request, "error",
+            f"Error: {provisioner.last_error}", 500)
+
+    def handle_stop(self, request):
+        """/stop POST terminate all replay hosts"""
+        if not self.hosts.has_hosts():
+            return WebService.control_response(request, "error",
+                "No jobs running can not stop\n", 400)
+
+        # Execute the shell script
+        provisioner = ShellProvisioner(env_name_values.get('script_dir'))
+        if provisioner.terminate("ALL"):
+            # set number of hosts allocated
+            self.hosts.clear()
+            return WebService.control_response(request, "success",
+                "Sucessfully Shutdown Hosts", 200)
+        return WebService.control_response(request, "error",
+            provisioner.last_error, 500)
+
+    def handle_autoscale(self, request):
+        """/autoscale GET autoscaling plan, POST act on it"""
+        if not self.autoscaler:
+            return Response("Autoscaling not enabled, start with --autoscale", status=400)
+        # GET reports the plan, POST acts on it
+        if request.method == 'GET':
+            return Response(json.dumps(self.autoscaler.report(self.runs, self.hosts)),
+                content_type='application/json')
+        if request.method == 'POST':
+            actions = self.autoscale()
+            status = 200 if actions['success'] else 500
+            return Response(json.dumps(actions), status=status, content_type='application/json')
+        return Response("method not supported", status=405)
+
+    # pylint: disable=too-many-return-statements
+    def handle_runs(self, request):
+        """/runs GET list runs, POST add or replace a named run, DELETE remove one"""
+        if request.method == 'GET':
+            runs_as_dict = [run.as_dict() for run in self.runs.runs.values()]
+            return Response(json.dumps(runs_as_dict), content_type='application/json')
+        if request.method == 'POST':
+            data = request.get_json()
+            if not data or not data.get('name') or not data.get('config_file_path'):
+                return Response("Requires name and config_file_path", status=400)
+            if data['name'] == RunRegistry.DEFAULT_RUN:
+                return Response("Use /restart to replace the default run", status=400)
+            if not os.path.exists(data['config_file_path']):
+                return Response(f"Configuration file {data['config_file_path']} does not exist",
+                    status=404)
+            existing = self.runs.get(data['name'])
+            if existing is not None and existing.jobs.is_running and not data.get('forced'):
+                return Response("Jobs not complete requires `forced` option", status=400)
+            run = self.add_run(data['name'],
+                data['config_file_path'],
+                WebService.to_int(data.get('weight'), 1),
+                WebService.to_int(data.get('priority'), 0))
+            return Response(json.dumps(run.as_dict()), content_type='application/json')
+        if request.method == 'DELETE':
+            removing = self.runs.get(request.args.get('run'))
+            if removing is not None and removing.name != RunRegistry.DEFAULT_RUN:
+                self.archive_run(removing, True)
+                self.files.forget(WebService.job_ids(removing))
+            if not self.runs.remove(request.args.get('run')):
+                return Response("Run not found or is the default run", status=404)
+            return Response(json.dumps({"status": "removed"}), content_type='application/json')
+        return Response("method not supported", status=405)
+
+    def handle_priority(self, request):
+        """/priority POST set priority of filtered jobs"""
+        if request.method != 'POST':
+            return Response("method not supported", status=405)
+        data = request.get_json()
+        if not data or WebService.to_int(data.get('priority'), None) is None:
+            return Response("Requires integer priority", status=400)
+        run = self.runs.get(data.get('run'))
+        if run is None:
+            return Response("Run not found", status=404)
+        try:
+            updated = run.jobs.set_priority(int(data['priority']),
+                data,
+                bool(data.get('rerun')))
+        except (ValueError, TypeError):
+            return Response("Invalid filter values", status=400)
+        logger.info("Priority %s set on %s jobs in run %s",
+            data['priority'], len(updated), run.name)
+        response_message = {
+            'updated': len(updated),
+            'jobids': [job.job_id for job in updated]
+        }
+        return Response(json.dumps(response_message), content_type='application/json')
+
+    def handle_history(self, request):
+        """/history GET queries across archived runs"""
+        if not self.run_history:
+            return Response("Run history not enabled, start with --results-db", status=400)
+        if request.method != 'GET':
+            return Response("method not supported", status=405)
+        try:
+            result = self.run_history.query(request.args.get('query', 'runs'),
+                WebService.to_int(request.args.get('limit'), 10),
+                WebService.to_int(request.args.get('start_block'), None),
+                WebService.to_int(request.args.get('end_block'), None))
+        except ValueError as error:
+            return Response(str(error), status=400)
+        if result is None:
+            return Response("No mismatch found", status=404)
+        return Response(json.dumps(result), content_type='application/json')
+
+    def handle_export(self, request):
+        """/export GET stream jobs of a run as NDJSON or CSV"""
+        if request.method != 'GET':
+            return Response("method not supported", status=405)
+        run = self.runs.get(request.args.get('run'))
+        if run is None:
+            return Response("Run not found", status=404)
+        filters = JobExport.filters_from_args(request.args)
+        # validate before streaming, errors can not be reported mid stream
+        if not JobExport.numbers_valid(filters):
+            return Response("sliceids, start_block and end_block must be integers", status=400)
+        export_format = JobExport.format_from_request(request.args, request.headers.get('Accept'))
+        return Response(JobExport.stream(run.jobs.get_all(), filters, export_format),
+            content_type=JobExport.CONTENT_TYPES[export_format])
+
+
+    @staticmethod
+    def control_response(request, key, message, status):
+        """urlencoded error or success message for API calls, forms go back to /control showing it"""
+        params = urlencode({key: message})
+        if 'application/json' in request.headers.get('Accept'):
+            return Response(params, status=status)
+        return redirect(f"/control?{params}")
+
+    @staticmethod
+    def to_int(value, default):
+        """integer from request value, default when missing or invalid"""
+        if value is None or not str(value).lstrip('-').isnumeric():
+            return default
+        return int(value)
+
+def autoscale_loop(service, interval_minutes):
+    """background thread, periodically scale hosts while hosts are allocated
+    a failed pass is logged, the next pass tries again"""
+    while True:
+        time.sleep(interval_minutes * 60)
+        try:
+            with service.lock:
+                if service.hosts.has_hosts():
+                    service.autoscale()
+        except Exception: # pylint: disable=broad-exception-caught
+            logger.exception("Autoscale pass failed")
+
+def parse_args():
+    """command line options"""
     parser = argparse.ArgumentParser(
         description='Orchestration Service to manage tests to replay on the antelope blockchain'
     )
@@ -627,8 +903,81 @@ if __name__ == '__main__':
         help="log file for service")
     parser.add_argument('--disable-auth', action='store_true',
         help="when set disables access control, used for testing")
+    parser.add_argument('--scheduler', type=str, default='fifo',
+        choices=JobManager.SCHEDULERS,
+        help="order jobs are handed out, longest-first uses --history to predict durations")
+    parser.add_argument('--history', type=str, default=None,
+        help="csv of block timings from process_orchestration_log.py --block-times")
+    parser.add_argument('--speculative', action=argparse.BooleanOptionalAction, default=True,
+        help="when no jobs are waiting hand idle hosts a backup copy of straggler jobs")
+    parser.add_argument('--autoscale', action='store_true',
+        help="size replay hosts to remaining work, uses --history to predict durations")
+    parser.add_argument('--target-minutes', type=int, default=180,
+        help="autoscaling aims to finish remaining work in this many minutes")
+    parser.add_argument('--min-hosts', type=int, default=0,
+        help="autoscaling never goes below this many hosts")
+    parser.add_argument('--max-hosts', type=int, default=120,
+        help="autoscaling never goes above this many hosts")
+    parser.add_argument('--autoscale-interval', type=int, default=10,
+        help="minutes between autoscaling steps, 0 only scales on POST /autoscale")
+    parser.add_argument('--max-attempts', type=int, default=3,
+        help="times a job with a retryable error is run, 1 disables retries")
+    parser.add_argument('--retry-minutes', type=int, default=5,
+        help="backoff before first retry, doubles with each attempt")
+    parser.add_argument('--retry-max-minutes', type=int, default=60,
+        help="longest backoff before a retry")
+    parser.add_argument('--results-db', type=str, default=None,
+        help="sqlite file finished runs are archived to, enables /history")
+    parser.add_argument('--error-log-dir', type=str, default='/var/log/jobfiles',
+        help="directory holding job logs uploaded to /joblog, used to classify failures")
+    parser.add_argument('--package-dir', type=str, default=None,
+        help="directory for mirrored nodeos packages served at /package, nginx serves it as /packages/")
+    return parser.parse_args()
+
+def main(options):
+    """build the service from command line options and serve requests"""
+    # remove this if Local config works
+    if options.config is None:
+        sys.exit("Must provide config with --config option")
+    if options.history and not os.path.exists(options.history):
+        sys.exit(f"History file {options.history} does not exist, check --history option")
 
-    args = parser.parse_args()
+    # initialize
+    autoscaler = None
+    if options.autoscale:
+        autoscaler = Autoscaler(ShellProvisioner(env_name_values.get('script_dir')),
+            options.target_minutes,
+            options.min_hosts,
+            options.max_hosts)
+    retry_policy = RetryPolicy(options.max_attempts,
+        options.retry_minutes,
+        options.retry_max_minutes,
+        ErrorLogReader(options.error_log_dir))
+    run_history = RunHistory(options.results_db) if options.results_db else None
+    package_mirror = None
+    if options.package_dir:
+        package_mirror = PackageMirror(options.package_dir,
+            env_name_values.get('repo'),
+            env_name_values.get('artifact'),
+            env_name_values.get('github_read_token'))
+    log_store = LogStore(options.error_log_dir)
+    log_index = LogIndex()
+    app = WebService(options.config,env_name_values.get('datacenter_config'),
+        options.scheduler, DurationEstimator(options.history), options.speculative, autoscaler,
+        retry_policy, run_history, package_mirror, log_store, log_index)
+    # logs uploaded before a restart are searchable once indexed
+    threading.Thread(target=log_index.rebuild, args=(log_store,), daemon=True).start()
+    if autoscaler and options.autoscale_interval > 0:
+        threading.Thread(target=autoscale_loop,
+            args=(app, options.autoscale_interval),
+            daemon=True).start()
+    # run web service
+    run_simple(options.host, options.port, app.application)
+
+if __name__ == '__main__':
+    # env holds oauth, location of config files, and github repos
+    env_name_values = EnvStore('env')
+    args = parse_args()
     ALWAYS_ALLOW = args.disable_auth
 
     # setup logging
@@ -641,12 +990,4 @@ if __name__ == '__main__':
     logger = logging.getLogger('OrchWebSrv')
 
     html_factory = HtmlPage(args.html_dir)
-
-    # remove this if Local config works
-    if args.config is None:
-        sys.exit("Must provide config with --config option")
-
-    # initialize
-    app = WebService(args.config,env_name_values.get('datacenter_config'))
-    # run web service
-    run_simple(args.host, args.port, app.application)
+    main(args)
@@ -0,0 +1,39 @@
+#!/usr/bin/env bash
+
+# sourced by replay scripts to talk to replay_agent.py
+# bash opens the local socket with /dev/tcp, no python process per call
+# one tab seperated command per connection, agent replies with one line
+
+AGENT_PORT=${AGENT_PORT:-4100}
+
+# send command and arguments, prints reply, returns 1 when agent is not reachable
+function agent_call() {
+  local IFS=$'\t'
+  local reply
+  exec 3<>/dev/tcp/127.0.0.1/"${AGENT_PORT}" || return 1
+  # newlines would end the command early
+  printf '%s\n' "${*//$'\n'/ }" >&3
+  IFS= read -r reply <&3
+  exec 3<&-
+  printf '%s\n' "$reply"
+}
+
+# start agent in background and wait for it to accept commands
+function agent_start() {
+  local host=$1
+  local port=$2
+  # slot_env.sh sets the slot, its job files and agent port
+  python3 "${REPLAY_CLIENT_DIR:?}"/replay_agent.py --host "${host}" --port "${port}" \
+     --listen-port "${AGENT_PORT}" --slot "${SLOT:-0}" --slots "${SLOTS:-1}" \
+     --job-file "${JOB_FILE:-/tmp/job.conf.json}" --next-job-file "${NEXT_JOB_FILE:-/tmp/next-job.conf.json}" &
+  AGENT_PID=$!
+  for _ in $(seq 1 20); do
+    [ "$(agent_call ping 2>/dev/null)" == "pong" ] && return 0
+    sleep 0.5
+  done
+  return 1
+}
+
+function agent_stop() {
+  agent_call stop > /dev/null 2>&1
+}
@@ -0,0 +1,224 @@
+"""Module keeps snapshots, blocks log strides and nodeos packages on the replay host between jobs."""
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+#
+# Examples
+# python3 artifact_cache.py --cache-dir /data/cache path \
+#     --key https://github.com/AntelopeIO/spring/releases/download/v1.0.1/antelope-spring_1.0.1_amd64.deb
+# python3 artifact_cache.py --cache-dir /data/cache put \
+#     --key https://github.com/AntelopeIO/spring/releases/download/v1.0.1/antelope-spring_1.0.1_amd64.deb \
+#     --source /home/enf-replay/antelope-spring_1.0.1_amd64.deb
+# python3 artifact_cache.py --cache-dir /data/cache evict --min-free-gb 40
+# python3 artifact_cache.py --cache-dir /data/cache list
+# python3 artifact_cache.py --cache-dir /data/cache stats --reset
+#
+
+class ArtifactCache:
+    """
+    Content addressed store, `objects/<sha256>` holds the bytes
+    `index.json` maps artifact names to digest, size and last use
+    names are the storage location without scheme, strides of each network are seperate
+    Names with the same content share one object
+    Readers use the object path in place, nothing is copied out of the cache
+    Least recently used names are evicted when free space runs low
+    `stats` counts hits, misses and bytes not downloaded since last reset
+    Hosts running several job slots share one cache, counters are kept per slot
+    `slot` defaults to REPLAY_SLOT from the environment, set by slot_env.sh
+    """
+    READ_SIZE = 4 * 1024 * 1024
+    GIGABYTE = 1024 * 1024 * 1024
+    # staged files untouched this long were left by interrupted fetches
+    STALE_SECONDS = 3600
+
+    def __init__(self, cache_dir, slot=None):
+        self.cache_dir = os.path.abspath(cache_dir)
+        if slot is None:
+            slot = os.environ.get('REPLAY_SLOT', '0')
+        # first slot keeps the counters of a host running one job
+        self.stats_key = 'stats' if str(slot) in ('', '0') else f"stats-{slot}"
+        self.objects_dir = os.path.join(self.cache_dir, 'objects')
+        self.staging_dir = os.path.join(self.cache_dir, 'staging')
+        self.index_path = os.path.join(self.cache_dir, 'index.json')
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.staging_dir, exist_ok=True)
+
+    @contextmanager
+    def _index(self):
+        """index under an exclusive lock, saved on exit, snapshot and blocks fetches run at once"""
+        with open(os.path.join(self.cache_dir, 'index.lock'), 'w', encoding='utf-8') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            index = {'entries': {}}
+            if os.path.exists(self.index_path):
+                with open(self.index_path, 'r', encoding='utf-8') as file:
+                    index = json.load(file)
+            index.setdefault(self.stats_key, ArtifactCache.empty_stats())
+            yield index
+            with open(self.index_path + '.tmp', 'w', encoding='utf-8') as file:
+                json.dump(index, file)
+            os.replace(self.index_path + '.tmp', self.index_path)
+
+    @staticmethod
+    def empty_stats():
+        """counters since last reset"""
+        return {'hits': 0, 'misses': 0, 'hit_bytes': 0}
+
+    @staticmethod
+    def digest_file(path):
+        """sha256 hex digest of file"""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for data in iter(lambda: file.read(ArtifactCache.READ_SIZE), b''):
+                digest.update(data)
+        return digest.hexdigest()
+
+    @staticmethod
+    def key(url):
+        """cache name for an s3:// or file:// url or a plain file name"""
+        parsed = urlparse(url)
+        return (parsed.netloc + parsed.path).lstrip('/')
+
+    def object_path(self, digest):
+        """where content with digest is stored"""
+        return os.path.join(self.objects_dir, digest)
+
+    def staging_path(self, name):
+        """where to write an artifact before adding it, same filesystem as objects
+        unique per process, job slots may fetch the same artifact at once"""
+        return os.path.join(self.staging_dir, f"{os.path.basename(name)}.{os.getpid()}")
+
+    def lookup(self, name):
+        """object path for name and counts a hit, None and counts a miss"""
+        with self._index() as index:
+            entry = index['entries'].get(name)
+            if entry and os.path.exists(self.object_path(entry['digest'])):
+                entry['last_used'] = time.time()
+                index[self.stats_key]['hits'] += 1
+                index[self.stats_key]['hit_bytes'] += entry['size']
+                return self.object_path(entry['digest'])
+            index['entries'].pop(name, None)
+            index[self.stats_key]['misses'] += 1
+            return None
+
+    def add(self, name, path, digest=None):
+        """store file under name, files in staging are moved, others are linked or copied
+        returns object path"""
+        staged = path
+        if os.path.dirname(os.path.abspath(path)) != self.staging_dir:
+            staged = self.staging_path(name) + '.adding'
+            try:
+                os.link(path, staged)
+            # other filesystem
+            except OSError:
+                shutil.copyfile(path, staged)
+        if digest is None:
+            digest = ArtifactCache.digest_file(staged)
+        size = os.path.getsize(staged)
+        with self._index() as index:
+            if os.path.exists(self.object_path(digest)):
+                os.remove(staged)
+            else:
+                os.replace(staged, self.object_path(digest))
+            index['entries'][name] = {'digest': digest, 'size': size, 'last_used': time.time()}
+        return self.object_path(digest)
+
+    def forget(self, name):
+        """drop name, used when cached bytes fail to decompress"""
+        with self._index() as index:
+            entry = index['entries'].pop(name, None)
+            if entry and not any(other['digest'] == entry['digest'] for other in index['entries'].values()) \
+                and os.path.exists(self.object_path(entry['digest'])):
+                os.remove(self.object_path(entry['digest']))
+
+    def names(self):
+        """cached artifact names"""
+        with self._index() as index:
+            return sorted(index['entries'].keys())
+
+    @staticmethod
+    def _usage(entries):
+        """bytes used by distinct objects"""
+        return sum({entry['digest']: entry['size'] for entry in entries.values()}.values())
+
+    def usage(self):
+        """bytes stored"""
+        with self._index() as index:
+            return ArtifactCache._usage(index['entries'])
+
+    def evict(self, min_free_bytes=0, max_usage_bytes=None):
+        """remove least recently used names until free space and cache size limits are met
+        objects are removed once no name refers to them, returns names evicted"""
+        evicted = []
+        with self._index() as index:
+            entries = index['entries']
+            by_age = sorted(entries, key=lambda name: entries[name]['last_used'])
+            for name in by_age:
+                if shutil.disk_usage(self.cache_dir).free >= min_free_bytes \
+                    and (max_usage_bytes is None or ArtifactCache._usage(entries) <= max_usage_bytes):
+                    break
+                digest = entries.pop(name)['digest']
+                evicted.append(name)
+                if not any(entry['digest'] == digest for entry in entries.values()) \
+                    and os.path.exists(self.object_path(digest)):
+                    os.remove(self.object_path(digest))
+        for leftover in os.listdir(self.staging_dir):
+            leftover = os.path.join(self.staging_dir, leftover)
+            if time.time() - os.path.getmtime(leftover) > ArtifactCache.STALE_SECONDS:
+                os.remove(leftover)
+        return evicted
+
+    def stats(self, reset=False):
+        """hits, misses and bytes reused since last reset"""
+        with self._index() as index:
+            stats = dict(index[self.stats_key])
+            if reset:
+                index[self.stats_key] = ArtifactCache.empty_stats()
+            return stats
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='host local cache of snapshots, blocks logs and nodeos packages'
+    )
+    parser.add_argument('--cache-dir',
+        type=str, default='/data/cache',
+        help='cache directory, default /data/cache')
+    subparsers = parser.add_subparsers(dest='operation', required=True)
+    path_parser = subparsers.add_parser('path', help='print cached file for key, exit code 2 on miss')
+    path_parser.add_argument('--key', type=str, required=True, help='url or file name')
+    put_parser = subparsers.add_parser('put', help='add file under key')
+    put_parser.add_argument('--key', type=str, required=True, help='url or file name')
+    put_parser.add_argument('--source', type=str, required=True)
+    evict_parser = subparsers.add_parser('evict', help='evict least recently used artifacts')
+    evict_parser.add_argument('--min-free-gb', type=int, default=0)
+    evict_parser.add_argument('--max-gb', type=int, default=None)
+    subparsers.add_parser('list', help='print cached keys')
+    stats_parser = subparsers.add_parser('stats', help='print hits misses and bytes reused')
+    stats_parser.add_argument('--reset', action='store_true')
+
+    args = parser.parse_args()
+    cache = ArtifactCache(args.cache_dir)
+    if args.operation == 'path':
+        cached = cache.lookup(ArtifactCache.key(args.key))
+        if cached is None:
+            sys.exit(2)
+        print(cached)
+    elif args.operation == 'put':
+        print(cache.add(ArtifactCache.key(args.key), args.source))
+    elif args.operation == 'evict':
+        max_bytes = args.max_gb * ArtifactCache.GIGABYTE if args.max_gb is not None else None
+        for evicted_name in cache.evict(args.min_free_gb * ArtifactCache.GIGABYTE, max_bytes):
+            print(f"Evicted {evicted_name}")
+    elif args.operation == 'list':
+        for cached_name in cache.names():
+            print(cached_name)
+    elif args.operation == 'stats':
+        cache_stats = cache.stats(args.reset)
+        print(f"{cache_stats['hits']} {cache_stats['misses']} {cache_stats['hit_bytes']}")
@@ -0,0 +1,247 @@
+"""Module restores a blocks log spanning several archived strides without merge copies."""
+import argparse
+import os
+import shutil
+import struct
+import sys
+from array import array
+from artifact_cache import ArtifactCache
+from fetch_artifact import ArtifactFetcher
+
+#
+# Examples
+# python3 blocks_log.py --source-dir s3://chicken-dance/mainnet/blocks \
+#     --strides blocks-2000001-4000000,blocks-4000001-6000000 \
+#     --blocks-dir /data/nodeos/data/blocks --cache-dir /data/cache
+#
+
+class BlocksLogError(Exception):
+    """blocks log strides can not be joined"""
+
+class BlocksLogMerger:
+    """
+    Appends the next stride of blocks to blocks.log and blocks.index as it streams in
+    blocks.log is a preamble followed by entries, each entry ends with its uint64 file position
+    blocks.index is the uint64 file position of each entry
+    Appending drops the stride's preamble and rebases every position by the bytes before it
+    """
+    POSITION = struct.Struct('<Q')
+
+    def __init__(self, blocks_dir):
+        self.log_path = os.path.join(blocks_dir, 'blocks.log')
+        self.index_path = os.path.join(blocks_dir, 'blocks.index')
+
+    @staticmethod
+    def read_index(chunks):
+        """uint64 positions from decompressed index chunks"""
+        data = b''.join(chunks)
+        if len(data) % 8 != 0:
+            raise BlocksLogError("index size is not a multiple of 8 bytes")
+        positions = array('Q')
+        positions.frombytes(data)
+        if sys.byteorder == 'big':
+            positions.byteswap()
+        return positions
+
+    def preamble(self):
+        """(version, first block number) of blocks.log"""
+        with open(self.log_path, 'rb') as log_file:
+            return struct.unpack('<II', log_file.read(8))
+
+    def block_count(self):
+        """blocks in blocks.log"""
+        return os.path.getsize(self.index_path) // 8
+
+    def append(self, log_chunks, positions):
+        """append stride streamed as decompressed log chunks with its index positions"""
+        if len(positions) == 0:
+            raise BlocksLogError("stride has no blocks")
+        version, first_block = self.preamble()
+        expected_block = first_block + self.block_count()
+        offset_in_log = os.path.getsize(self.log_path)
+        delta = offset_in_log - positions[0]
+        # trailing position of each entry except the last, which ends the stream
+        trailers = [positions[block] - 8 for block in range(1, len(positions))]
+
+        buffer = bytearray()
+        # stride offset of buffer[0]
+        buffer_start = 0
+        next_trailer = 0
+        preamble_checked = False
+        with open(self.log_path, 'ab') as log_file:
+            for chunk in log_chunks:
+                buffer += chunk
+                if not preamble_checked:
+                    if len(buffer) < 8:
+                        continue
+                    stride_version, stride_first = struct.unpack('<II', buffer[:8])
+                    if stride_version != version or stride_first != expected_block:
+                        raise BlocksLogError(f"stride version {stride_version} first block "
+                            f"{stride_first} does not follow version {version} block {expected_block}")
+                    preamble_checked = True
+                # drop stride preamble, blocks.log keeps its own
+                if buffer_start < positions[0]:
+                    skip = min(positions[0] - buffer_start, len(buffer))
+                    del buffer[:skip]
+                    buffer_start += skip
+                    if buffer_start < positions[0]:
+                        continue
+                buffer_end = buffer_start + len(buffer)
+                while next_trailer < len(trailers) and trailers[next_trailer] + 8 <= buffer_end:
+                    self._rebase(buffer, trailers[next_trailer] - buffer_start,
+                        positions[next_trailer], delta)
+                    next_trailer += 1
+                # hold back bytes that may still hold an unpatched position
+                flush_to = len(buffer) - 8
+                if next_trailer < len(trailers):
+                    flush_to = min(flush_to, trailers[next_trailer] - buffer_start)
+                if flush_to > 0:
+                    log_file.write(buffer[:flush_to])
+                    del buffer[:flush_to]
+                    buffer_start += flush_to
+            if next_trailer != len(trailers) or len(buffer) < 8:
+                raise BlocksLogError("stride log ended before its last block")
+            self._rebase(buffer, len(buffer) - 8, positions[-1], delta)
+            log_file.write(buffer)
+
+        rebased = array('Q', (position + delta for position in positions))
+        if sys.byteorder == 'big':
+            rebased.byteswap()
+        with open(self.index_path, 'ab') as index_file:
+            rebased.tofile(index_file)
+
+    @staticmethod
+    def _rebase(buffer, at, expected, delta):
+        """replace entry position at buffer offset, must match the index"""
+        position = BlocksLogMerger.POSITION.unpack_from(buffer, at)[0]
+        if position != expected:
+            raise BlocksLogError(f"entry position {position} does not match index {expected}")
+        BlocksLogMerger.POSITION.pack_into(buffer, at, position + delta)
+
+class BlocksLogRestore:
+    """
+    Restores the strides a slice needs into one blocks.log and blocks.index
+    the first stride decompresses straight into place, later strides stream into the merger
+    strides are used in order until one is missing or the disk would run out
+    compressed strides are read from and added to the ArtifactCache
+    """
+    # decompressed size when the zstd frame does not record it
+    ESTIMATED_RATIO = 4
+    GIGABYTE = 1024 * 1024 * 1024
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, source_dir, blocks_dir, cache, reserve_gb=20, workers=ArtifactFetcher.WORKERS,
+        regional_cache=None):
+        self.source_dir = source_dir.rstrip('/')
+        self.blocks_dir = blocks_dir
+        self.cache = cache
+        self.reserve = reserve_gb * BlocksLogRestore.GIGABYTE
+        self.workers = workers
+        self.regional_cache = regional_cache
+
+    def fetcher(self, name):
+        """(fetcher, keep path) reading the cached copy when present"""
+        key = ArtifactCache.key(f"{self.source_dir}/{name}")
+        cached = self.cache.lookup(key)
+        if cached:
+            return ArtifactFetcher(f"file://{cached}", workers=self.workers), None
+        return ArtifactFetcher(f"{self.source_dir}/{name}", workers=self.workers,
+            regional_cache=self.regional_cache), self.cache.staging_path(key)
+
+    def keep(self, name, fetcher, keep):
+        """add downloaded copy to cache"""
+        if keep:
+            self.cache.add(ArtifactCache.key(f"{self.source_dir}/{name}"), keep, fetcher.kept_digest)
+
+    @staticmethod
+    def needed_bytes(fetcher, keep):
+        """disk used by an artifact, decompressed plus kept compressed copy, None when missing"""
+        size = fetcher.size()
+        if size is None:
+            return None
+        content = fetcher.content_size()
+        if content is None:
+            content = size * BlocksLogRestore.ESTIMATED_RATIO
+        return content + (size if keep else 0)
+
+    def plan(self, strides):
+        """leading strides that exist and fit on disk, each (name, log, index) fetcher pairs"""
+        free = shutil.disk_usage(self.blocks_dir).free - self.reserve
+        planned = []
+        for stride in strides:
+            log = self.fetcher(f"{stride}.log.zst")
+            index = self.fetcher(f"{stride}.index.zst")
+            log_bytes = BlocksLogRestore.needed_bytes(*log)
+            index_bytes = BlocksLogRestore.needed_bytes(*index)
+            if log_bytes is None or index_bytes is None:
+                print(f"{self.source_dir}/{stride} does not exist, blocks after it come from peers")
+                break
+            if log_bytes + index_bytes > free:
+                print(f"Not enough space for {stride}, needs {(log_bytes + index_bytes) // BlocksLogRestore.GIGABYTE}GB, "
+                    "blocks after it come from peers")
+                break
+            free -= log_bytes + index_bytes
+            planned.append((stride, log, index))
+        return planned
+
+    def restore(self, strides):
+        """restore planned strides, returns names restored"""
+        planned = self.plan(strides)
+        merger = BlocksLogMerger(self.blocks_dir)
+        for number, (stride, log, index) in enumerate(planned):
+            print(f"Restoring {stride}")
+            try:
+                if number == 0:
+                    log[0].fetch(merger.log_path, log[1])
+                    index[0].fetch(merger.index_path, index[1])
+                else:
+                    positions = BlocksLogMerger.read_index(index[0].stream(index[1]))
+                    merger.append(log[0].stream(log[1]), positions)
+            except (BlocksLogError, IOError, OSError):
+                # bad cached copies are downloaded again by the next job
+                for name, (_, keep) in ((f"{stride}.log.zst", log), (f"{stride}.index.zst", index)):
+                    if not keep:
+                        self.cache.forget(ArtifactCache.key(f"{self.source_dir}/{name}"))
+                raise
+            self.keep(f"{stride}.log.zst", *log)
+            self.keep(f"{stride}.index.zst", *index)
+        return [stride for stride, _, _ in planned]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='restore blocks.log and blocks.index from one or more archived strides'
+    )
+    parser.add_argument('--source-dir',
+        type=str, required=True,
+        help='s3:// or file:// directory holding blocks-<start>-<end>.log.zst and .index.zst')
+    parser.add_argument('--strides',
+        type=str, required=True,
+        help='comma seperated stride names in block order, like blocks-1-2000000')
+    parser.add_argument('--blocks-dir',
+        type=str, default='/data/nodeos/data/blocks',
+        help='nodeos blocks directory, default /data/nodeos/data/blocks')
+    parser.add_argument('--cache-dir',
+        type=str, default='/data/cache',
+        help='host artifact cache, default /data/cache')
+    parser.add_argument('--reserve-gb',
+        type=int, default=20,
+        help='free space to leave for nodeos state, default 20')
+    parser.add_argument('--regional-cache',
+        type=str, default=None,
+        help='url of regional cache service to read s3:// strides through')
+
+    args = parser.parse_args()
+    restorer = BlocksLogRestore(args.source_dir, args.blocks_dir, ArtifactCache(args.cache_dir), args.reserve_gb,
+        regional_cache=args.regional_cache)
+    try:
+        restored = restorer.restore([stride for stride in args.strides.split(',') if stride])
+    except (BlocksLogError, IOError, OSError) as error:
+        print(f"Failed to restore blocks log: {error}", file=sys.stderr)
+        # partial log would replay the wrong blocks
+        for path in ('blocks.log', 'blocks.index'):
+            if os.path.exists(os.path.join(args.blocks_dir, path)):
+                os.remove(os.path.join(args.blocks_dir, path))
+        sys.exit(1)
+    if not restored:
+        sys.exit(2)
+    print(f"Restored {','.join(restored)}")
@@ -2,69 +2,63 @@
 import json
 import argparse
 import sys
-import time
 import requests
+from http_transport import HttpTransport
 
+# retries, backoff and circuit breaker for orchestration service calls
+# replay_agent.py swaps in the transport it shares with job_operations.py
+HTTP = HttpTransport()
 
-def update_by_end_block(base_url, max_tries, end_block_num, integrity_hash, nodeos_version):
-    """Update Config Object, only updates by end_block_id"""
+# pylint: disable=too-many-arguments
+def update_by_end_block(base_url, max_tries, end_block_num, integrity_hash, nodeos_version,
+    job_id=None):
+    """Update Config Object, only updates by end_block_id
+    job_id selects the orchestrator run the job belongs to"""
     # initialize params
     post_headers = {
         'Content-Type': 'application/json',
     }
 
-    # 100 milisecs double every loop
-    backoff = 0.1
-    update_complete = False
-    # will increate by 1 each loop
-    current_try = 0
-
-    # loop getting and setting until success
-    # etag is checksum to ensure content has not been updated by another process
-    while not update_complete and current_try <= max_tries:
-        # first update counter and backoff
-        current_try = current_try + 1
-        backoff = backoff * 2
-
-        # data stucture we will be returning
-        update_job_message = { 'status_code': None,
-            'sliceid': None,
-            'message': None }
-
-        config = {
-            "end_block_num": end_block_num,
-            "integrity_hash": integrity_hash,
-            "spring_version": nodeos_version
-        }
-
-        contents = json.dumps(config)
-
-        # make POST call; json passed in as string
-        update_config_response = requests.post(base_url + '/config',
+    # data stucture we will be returning
+    update_job_message = { 'status_code': None,
+        'sliceid': None,
+        'message': None }
+
+    config = {
+        "end_block_num": end_block_num,
+        "integrity_hash": integrity_hash,
+        "spring_version": nodeos_version
+    }
+    if job_id:
+        config['job_id'] = job_id
+
+    contents = json.dumps(config)
+
+    # make POST call; json passed in as string
+    # transport retries connection and service errors
+    try:
+        update_config_response = HTTP.post(base_url + '/config',
+            max_tries,
             headers=post_headers,
             timeout=3,
             data=contents.encode('utf-8'))
-
-        # populate data structure
-        update_job_message['status_code'] = update_config_response.status_code
-
-        # good job
-        if update_config_response.status_code == 200:
-            if update_config_response.content is not None:
-                config_obj = json.loads(update_config_response.content.decode('utf-8'))
-            update_job_message['sliceid'] = config_obj['sliceid']
-            update_job_message['message'] = config_obj['message']
-            update_complete = True
-        # 4xx error means client issue, no retries will fix that, abort
-        elif update_config_response.status_code > 399 \
-            and update_config_response.status_code < 500:
-            print(f"Warning: update job failed with code {update_config_response.status_code}",
-                file=sys.stderr)
-            break
-        # rest and try again, assume this is service side error
-        else:
-            # we try again pause to avoid collisions
-            time.sleep(backoff)
+    except requests.exceptions.RequestException as error:
+        print(f"Warning: update config failed with {error}", file=sys.stderr)
+        return update_job_message
+
+    # populate data structure
+    update_job_message['status_code'] = update_config_response.status_code
+
+    # good job
+    if update_config_response.status_code == 200:
+        if update_config_response.content is not None:
+            config_obj = json.loads(update_config_response.content.decode('utf-8'))
+        update_job_message['sliceid'] = config_obj['sliceid']
+        update_job_message['message'] = config_obj['message']
+    # no retries will fix client errors or errors the service did not ask to retry
+    else:
+        print(f"Warning: update config failed with code {update_config_response.status_code}",
+            file=sys.stderr)
 
     return update_job_message
 
@@ -93,6 +87,9 @@ if __name__ == '__main__':
     parser.add_argument('--spring-version',
         type=str,
         help='software version to update')
+    parser.add_argument('--job-id',
+        type=str, default=None,
+        help='job reporting the hash, selects the run to update')
 
     args = parser.parse_args()
 
@@ -113,15 +110,18 @@ if __name__ == '__main__':
         'message': None }
 
     # updates config using end block as a key
-    # spring version is needed to Disambiguate when multiple version 
+    # spring version is needed to Disambiguate when multiple version
     #    are used with the same block ranges
     job_message = update_by_end_block(url,
         args.max_tries,
         args.end_block_num,
         args.integrity_hash,
-        args.spring_version)
+        args.spring_version,
+        args.job_id)
 
     # nicer print messages
+    if job_message['status_code'] is None:
+        sys.exit(f"Config {args.operation} Failed, orchestration service not reachable")
     if job_message['status_code'] == 200:
         print (f"Config Operation {args.operation} Succeeded")
     if job_message['status_code'] > 200 and job_message['status_code'] < 300:
@@ -3,6 +3,8 @@
 # Create directory structure for replay 
 
 CONFIG_DIR="${1}"
+# each job slot has its own directory, see slot_env.sh
+NODEOS_DIR="${2:-/data/nodeos}"
 TUID=$(id -ur)
 
 # must not be root to run
@@ -12,10 +14,10 @@ if [ "$TUID" -eq 0 ]; then
 fi
 
 echo "Creating nodeos directories"
-[ ! -d /data/nodeos ] && mkdir /data/nodeos
-[ ! -d /data/nodeos/config ] && mkdir /data/nodeos/config
-[ ! -d /data/nodeos/data ] && mkdir /data/nodeos/data
-[ ! -d /data/nodeos/snapshot ] && mkdir /data/nodeos/snapshot
-[ ! -d /data/nodeos/log ] && mkdir /data/nodeos/log
+[ ! -d "${NODEOS_DIR}" ] && mkdir "${NODEOS_DIR}"
+[ ! -d "${NODEOS_DIR}"/config ] && mkdir "${NODEOS_DIR}"/config
+[ ! -d "${NODEOS_DIR}"/data ] && mkdir "${NODEOS_DIR}"/data
+[ ! -d "${NODEOS_DIR}"/snapshot ] && mkdir "${NODEOS_DIR}"/snapshot
+[ ! -d "${NODEOS_DIR}"/log ] && mkdir "${NODEOS_DIR}"/log
 
-cp "${CONFIG_DIR}"/*.* /data/nodeos/config
+cp "${CONFIG_DIR}"/*.* "${NODEOS_DIR}"/config
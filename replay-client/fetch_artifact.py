@@ -0,0 +1,385 @@
+"""Module streams a compressed artifact from storage straight into zstd."""
+import argparse
+import hashlib
+import json
+import os
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+import requests
+from artifact_cache import ArtifactCache
+
+#
+# Examples
+# python3 fetch_artifact.py --source s3://chicken-dance/mainnet/snapshots/snapshot.bin.zst \
+#     --output /data/nodeos/snapshot/snapshot.bin --keep /data/artifacts/snapshot.bin.zst
+# python3 fetch_artifact.py --source file:///data/artifacts/blocks-1-2000000.log.zst \
+#     --output /data/nodeos/data/blocks/blocks-1-2000000.log
+# python3 fetch_artifact.py --source s3://chicken-dance/mainnet/blocks/blocks-1-2000000.log.zst --exists
+# python3 fetch_artifact.py --source s3://chicken-dance/mainnet/snapshots/snapshot.bin.zst \
+#     --output /data/nodeos/snapshot/snapshot.bin --cache-dir /data/cache
+# python3 fetch_artifact.py --source s3://chicken-dance/mainnet/snapshots/snapshot.bin.zst \
+#     --output /data/nodeos/snapshot/snapshot.bin --regional-cache http://10.0.0.5:4200
+#
+
+class FileBackend:
+    """local files, file:// urls or plain paths"""
+    def __init__(self, url):
+        parsed = urlparse(url)
+        self.path = parsed.path if parsed.scheme == 'file' else url
+
+    def size(self):
+        """bytes in object, None when missing"""
+        if not os.path.isfile(self.path):
+            return None
+        return os.path.getsize(self.path)
+
+    def read_range(self, start, end):
+        """bytes from start to end inclusive"""
+        with open(self.path, 'rb') as file:
+            file.seek(start)
+            return file.read(end - start + 1)
+
+class S3Backend:
+    """s3:// urls through the aws cli, same tool as S3Interface and the replay scripts"""
+    def __init__(self, url):
+        parsed = urlparse(url)
+        self.bucket = parsed.netloc
+        self.key = parsed.path.lstrip('/')
+
+    def size(self):
+        """bytes in object, None when missing"""
+        head = subprocess.run(["aws", "s3api", "head-object",
+            "--bucket", self.bucket, "--key", self.key],
+            check=False, capture_output=True, text=True)
+        if head.returncode != 0:
+            return None
+        return int(json.loads(head.stdout)['ContentLength'])
+
+    def read_range(self, start, end):
+        """bytes from start to end inclusive, ranged GET written to a temporary file
+        raises IOError when the body is not the length in the response metadata"""
+        with tempfile.NamedTemporaryFile(prefix='range-') as part_file:
+            part = subprocess.run(["aws", "s3api", "get-object",
+                "--bucket", self.bucket, "--key", self.key,
+                "--range", f"bytes={start}-{end}", part_file.name],
+                check=False, capture_output=True, text=True)
+            if part.returncode != 0:
+                raise IOError(f"ranged get {start}-{end} of s3://{self.bucket}/{self.key} failed: "
+                    + part.stderr.strip())
+            data = part_file.read()
+        try:
+            content_length = int(json.loads(part.stdout)['ContentLength'])
+        except (ValueError, KeyError) as error:
+            raise IOError(f"ranged get {start}-{end} of s3://{self.bucket}/{self.key} "
+                f"returned no content length") from error
+        if len(data) != content_length:
+            raise IOError(f"ranged get {start}-{end} of s3://{self.bucket}/{self.key} "
+                f"returned {len(data)} of {content_length} bytes")
+        return data
+
+    def parts(self, size, part_size):
+        """whole object in order through one `aws s3 cp` to stdout, the cli downloads ranges in parallel
+        raises IOError when the copy fails or is not `size` bytes"""
+        received = 0
+        finished = False
+        with tempfile.TemporaryFile() as errors, \
+            subprocess.Popen(["aws", "s3", "cp", "--only-show-errors",
+                f"s3://{self.bucket}/{self.key}", "-"],
+                stdout=subprocess.PIPE, stderr=errors) as copy:
+            try:
+                while True:
+                    data = copy.stdout.read(part_size)
+                    if not data:
+                        break
+                    received += len(data)
+                    yield data
+                finished = True
+            finally:
+                # reader stopped early
+                if not finished:
+                    copy.kill()
+            if copy.wait() != 0 or received != size:
+                errors.seek(0)
+                raise IOError(f"copy of s3://{self.bucket}/{self.key} returned {received} of {size} bytes: "
+                    + errors.read().decode('utf-8', errors='replace').strip())
+
+class RegionalBackend:
+    """s3:// urls read through the regional cache service, see regional_cache.py
+    falls back to reading s3 directly when the cache is down or fails"""
+    # longest wait for the cache to download an object before reading s3 directly
+    WAIT_SECONDS = 1800
+
+    def __init__(self, url, regional_cache):
+        parsed = urlparse(url)
+        self.url = f"{regional_cache.rstrip('/')}/{parsed.netloc}{parsed.path}"
+        self.direct = S3Backend(url)
+        self.use_direct = False
+        self.session = requests.Session()
+
+    def size(self):
+        """bytes in object, None when missing, waits while the cache downloads it"""
+        deadline = time.time() + RegionalBackend.WAIT_SECONDS
+        while not self.use_direct:
+            try:
+                response = self.session.head(self.url, timeout=30)
+            except requests.exceptions.RequestException:
+                break
+            if response.status_code == 200:
+                return int(response.headers['Content-Length'])
+            if response.status_code == 404:
+                return None
+            if response.status_code != 503 or time.time() > deadline:
+                break
+            time.sleep(int(response.headers.get('Retry-After', 5)))
+        self.use_direct = True
+        return self.direct.size()
+
+    def read_range(self, start, end):
+        """bytes from start to end inclusive"""
+        if not self.use_direct:
+            try:
+                response = self.session.get(self.url, timeout=60,
+                    headers={'Range': f"bytes={start}-{end}"})
+                if response.status_code == 206 and len(response.content) == end - start + 1:
+                    return response.content
+            except requests.exceptions.RequestException:
+                pass
+            # object evicted or cache gone, later ranges read s3
+            self.use_direct = True
+        return self.direct.read_range(start, end)
+
+class ArtifactFetcher:
+    """
+    Downloads `workers` ranges of `part_size` bytes at a time, writes them in order
+    into `zstd -d` while later ranges are still downloading
+    s3:// objects are read by one `aws s3 cp`, it downloads ranges in parallel itself
+    Optionally keeps the compressed bytes, written alongside for reuse by the next job
+    `kept_digest` is the sha256 of the kept bytes, used to add them to the ArtifactCache
+    Memory held is bounded by `workers * 2` parts
+    s3:// urls are read through `regional_cache` when given
+    """
+    BACKENDS = {'s3': S3Backend, 'file': FileBackend, '': FileBackend}
+    PART_SIZE = 32 * 1024 * 1024
+    WORKERS = 8
+    READ_SIZE = 4 * 1024 * 1024
+    ZSTD_MAGIC = 0xFD2FB528
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, url, part_size=PART_SIZE, workers=WORKERS, regional_cache=None):
+        scheme = urlparse(url).scheme
+        if scheme not in ArtifactFetcher.BACKENDS:
+            raise ValueError(f"unsupported storage {scheme} for {url}")
+        self.url = url
+        if scheme == 's3' and regional_cache:
+            self.backend = RegionalBackend(url, regional_cache)
+        else:
+            self.backend = ArtifactFetcher.BACKENDS[scheme](url)
+        self.part_size = part_size
+        self.workers = workers
+        self.kept_digest = None
+
+    def exists(self):
+        """true when object exists in storage"""
+        return self.backend.size() is not None
+
+    def size(self):
+        """compressed bytes in storage, None when missing"""
+        return self.backend.size()
+
+    def content_size(self):
+        """decompressed bytes from the zstd frame header, None when not recorded"""
+        header = self.backend.read_range(0, 17)
+        if len(header) < 6 or struct.unpack('<I', header[:4])[0] != ArtifactFetcher.ZSTD_MAGIC:
+            return None
+        descriptor = header[4]
+        fcs_flag = descriptor >> 6
+        single_segment = (descriptor >> 5) & 1
+        position = 5 + (0 if single_segment else 1) + (0, 1, 2, 4)[descriptor & 3]
+        fcs_size = (1 if single_segment else 0, 2, 4, 8)[fcs_flag]
+        if fcs_size == 0 or len(header) < position + fcs_size:
+            return None
+        value = int.from_bytes(header[position:position + fcs_size], 'little')
+        # two byte sizes are offset by 256
+        return value + 256 if fcs_size == 2 else value
+
+    def parts(self):
+        """compressed bytes in order, fetched in parallel"""
+        size = self.backend.size()
+        if size is None:
+            raise FileNotFoundError(f"{self.url} does not exist")
+        backend = self.backend
+        # regional cache is down, read s3 directly
+        if isinstance(backend, RegionalBackend) and backend.use_direct:
+            backend = backend.direct
+        if isinstance(backend, S3Backend):
+            yield from backend.parts(size, self.part_size)
+            return
+        ranges = [(start, min(start + self.part_size, size) - 1)
+            for start in range(0, size, self.part_size)]
+        window = self.workers * 2
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            pending = [(part_range, pool.submit(backend.read_range, *part_range))
+                for part_range in ranges[:window]]
+            next_range = len(pending)
+            while pending:
+                (start, end), future = pending.pop(0)
+                data = future.result()
+                if len(data) != end - start + 1:
+                    raise IOError(f"read {len(data)} of {end - start + 1} bytes at {start} of {self.url}")
+                if next_range < len(ranges):
+                    pending.append((ranges[next_range],
+                        pool.submit(backend.read_range, *ranges[next_range])))
+                    next_range += 1
+                yield data
+
+    def stream(self, keep_path=None):
+        """decompressed bytes in chunks, for callers transforming the data as it arrives
+        compressed bytes are fed to zstd by a thread, raises IOError on failure"""
+        keep_part = keep_path + '.part' if keep_path else None
+        errors = []
+        digest = hashlib.sha256()
+        with subprocess.Popen(["zstd", "-d", "-q", "-c"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE) as zstd:
+            def feed():
+                keep_file = open(keep_part, 'wb') if keep_part else None # pylint: disable=consider-using-with
+                try:
+                    for data in self.parts():
+                        zstd.stdin.write(data)
+                        if keep_file:
+                            keep_file.write(data)
+                            digest.update(data)
+                except (IOError, OSError) as error:
+                    errors.append(error)
+                finally:
+                    if keep_file:
+                        keep_file.close()
+                    zstd.stdin.close()
+            feeder = threading.Thread(target=feed, daemon=True)
+            feeder.start()
+            try:
+                while True:
+                    data = zstd.stdout.read(ArtifactFetcher.READ_SIZE)
+                    if not data:
+                        break
+                    yield data
+                feeder.join()
+                # report bad data over the broken pipe it causes
+                if zstd.wait() != 0:
+                    errors.insert(0, IOError(f"zstd failed to decompress {self.url}"))
+            finally:
+                if zstd.poll() is None:
+                    zstd.kill()
+                    zstd.wait()
+                # feeder stops on the broken pipe, before zstd pipes are closed
+                feeder.join()
+        if errors:
+            if keep_part and os.path.exists(keep_part):
+                os.remove(keep_part)
+            raise errors[0]
+        if keep_part:
+            os.replace(keep_part, keep_path)
+            self.kept_digest = digest.hexdigest()
+
+    def fetch(self, output, keep_path=None):
+        """decompress into output, keep compressed copy when keep_path is a path
+        partial files are removed on failure"""
+        keep_part = keep_path + '.part' if keep_path else None
+        with open(output, 'wb') as output_file, \
+            subprocess.Popen(["zstd", "-d", "-q", "-c"],
+                stdin=subprocess.PIPE, stdout=output_file) as zstd:
+            keep_file = open(keep_part, 'wb') if keep_part else None # pylint: disable=consider-using-with
+            digest = hashlib.sha256()
+            try:
+                for data in self.parts():
+                    zstd.stdin.write(data)
+                    if keep_file:
+                        keep_file.write(data)
+                        digest.update(data)
+                zstd.stdin.close()
+                if zstd.wait() != 0:
+                    raise IOError(f"zstd failed to decompress {self.url}")
+            except (IOError, OSError):
+                zstd.kill()
+                zstd.wait()
+                for path in (output, keep_part):
+                    if path and os.path.exists(path):
+                        os.remove(path)
+                raise
+            finally:
+                if keep_file:
+                    keep_file.close()
+        if keep_part:
+            os.replace(keep_part, keep_path)
+            self.kept_digest = digest.hexdigest()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='stream compressed artifact from s3:// or file:// into zstd'
+    )
+    parser.add_argument('--source',
+        type=str, required=True,
+        help='s3:// or file:// url of .zst artifact')
+    parser.add_argument('--output',
+        type=str,
+        help='path for decompressed file')
+    parser.add_argument('--keep',
+        type=str, default=None,
+        help='path to keep the compressed artifact for later jobs')
+    parser.add_argument('--cache-dir',
+        type=str, default=None,
+        help='read from and add to the host artifact cache, replaces --keep')
+    parser.add_argument('--regional-cache',
+        type=str, default=None,
+        help='url of regional cache service to read s3:// artifacts through')
+    parser.add_argument('--exists',
+        action='store_true',
+        help='only check the artifact exists, exit code 1 when missing')
+    parser.add_argument('--part-size',
+        type=int, default=ArtifactFetcher.PART_SIZE // (1024 * 1024),
+        help='megabytes per ranged request, default 32')
+    parser.add_argument('--workers',
+        type=int, default=ArtifactFetcher.WORKERS,
+        help='parallel ranged requests, default 8')
+
+    args = parser.parse_args()
+
+    source = args.source
+    keep = args.keep
+    cache = None
+    if args.cache_dir and not args.exists:
+        cache = ArtifactCache(args.cache_dir)
+        cached = cache.lookup(ArtifactCache.key(source))
+        if cached:
+            print(f"Cache hit for {source}")
+            source = f"file://{cached}"
+            keep = None
+        else:
+            keep = cache.staging_path(ArtifactCache.key(source))
+    try:
+        fetcher = ArtifactFetcher(source, args.part_size * 1024 * 1024, args.workers,
+            args.regional_cache)
+    except ValueError as error:
+        sys.exit(f"Error {error}")
+    if args.exists:
+        sys.exit(0 if fetcher.exists() else 1)
+    if not args.output:
+        sys.exit("Error --output is required")
+    try:
+        fetcher.fetch(args.output, keep)
+        if cache and keep:
+            cache.add(ArtifactCache.key(args.source), keep, fetcher.kept_digest)
+    except FileNotFoundError as error:
+        print(f"{error}", file=sys.stderr)
+        sys.exit(2)
+    except (IOError, OSError) as error:
+        print(f"Failed to fetch {args.source}: {error}", file=sys.stderr)
+        # bad cached copy is downloaded again by the next job
+        if cache and not keep:
+            cache.forget(ArtifactCache.key(args.source))
+        sys.exit(1)
@@ -0,0 +1,138 @@
+"""Module provides the HTTP transport replay client operations use to call the orchestration service"""
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import requests
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """orchestration service failed repeatedly, calls are paused until the circuit closes"""
+
+class HttpTransport:
+    """
+    One pooled keep-alive session for all calls to the orchestration service
+    Connection errors, timeouts, 408, 429, 502, 503 and 504 are retried, other responses are returned
+    Retries wait a random time up to the exponential backoff, hosts failing together retry apart
+    `Retry-After` from the service replaces the backoff
+    After `failure_threshold` failures in a row the circuit opens for `open_seconds`,
+    doubling each time the first call after it fails, while open calls wait and
+    single try calls fail right away with CircuitOpenError
+    A service answering with `Retry-After` is up, those replies do not count as failures
+    """
+    RETRY_STATUS = (408, 429, 502, 503, 504)
+    # service overloaded or gone
+    FAILURE_STATUS = (502, 503, 504)
+    # longest Retry-After waited for
+    MAX_RETRY_AFTER = 300
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, base_seconds=0.5, max_seconds=60, failure_threshold=5, open_seconds=30,
+        max_open_seconds=300):
+        self.base_seconds = base_seconds
+        self.max_seconds = max_seconds
+        self.failure_threshold = failure_threshold
+        self.min_open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        # connections are kept open and reused between calls
+        self.session = requests.Session()
+        # log follower thread and commands share the transport
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.open_seconds = open_seconds
+        self.open_until = 0
+
+    def backoff(self, attempt):
+        """full jitter, random seconds up to the exponential backoff for attempt"""
+        return random.uniform(0, min(self.max_seconds, self.base_seconds * 2 ** attempt))
+
+    @staticmethod
+    def retry_after(response):
+        """seconds from the Retry-After header, None when missing or invalid"""
+        if response is None or not response.headers.get('Retry-After'):
+            return None
+        value = response.headers['Retry-After'].strip()
+        if value.isdigit():
+            return min(int(value), HttpTransport.MAX_RETRY_AFTER)
+        try:
+            seconds = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+        return min(max(seconds, 0), HttpTransport.MAX_RETRY_AFTER)
+
+    def circuit_wait(self):
+        """seconds until the circuit lets a call through, 0 when closed or the open time passed"""
+        with self.lock:
+            return max(self.open_until - time.monotonic(), 0)
+
+    def record_success(self):
+        """service answered, close the circuit"""
+        with self.lock:
+            self.failures = 0
+            self.open_seconds = self.min_open_seconds
+            self.open_until = 0
+
+    def record_failure(self):
+        """service failed, open the circuit after too many failures in a row"""
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.open_until = time.monotonic() + self.open_seconds
+                print(f"Warning: orchestration service failed {self.failures} times, "
+                    f"pausing calls for {self.open_seconds} seconds", file=sys.stderr)
+                self.open_seconds = min(self.open_seconds * 2, self.max_open_seconds)
+
+    def delay(self, attempt, response=None):
+        """seconds to wait before the next attempt, at least until the circuit lets calls through"""
+        retry_after = HttpTransport.retry_after(response)
+        wait = self.backoff(attempt) if retry_after is None else retry_after
+        return max(wait, self.circuit_wait())
+
+    def pause(self, attempt, response=None):
+        """wait before the next attempt"""
+        time.sleep(self.delay(attempt, response))
+
+    def request(self, method, url, max_tries=1, **kwargs):
+        """send request up to `max_tries` times, returns the first response not retried
+        or the last retried response, raises the last error when no response came back"""
+        response = None
+        last_error = None
+        for attempt in range(max_tries):
+            if attempt > 0:
+                self.pause(attempt, response)
+            elif self.circuit_wait() > 0:
+                if max_tries == 1:
+                    raise CircuitOpenError(f"orchestration service unavailable, calls paused for "
+                        f"{round(self.circuit_wait())} seconds")
+                time.sleep(self.circuit_wait())
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.exceptions.RequestException as error:
+                print(f"Warning: {method} {url} failed with {error}", file=sys.stderr)
+                last_error = error
+                response = None
+                self.record_failure()
+                continue
+            if response.status_code not in HttpTransport.RETRY_STATUS:
+                self.record_success()
+                return response
+            print(f"Warning: {method} {url} failed with code {response.status_code}", file=sys.stderr)
+            if response.status_code in HttpTransport.FAILURE_STATUS \
+                and HttpTransport.retry_after(response) is None:
+                self.record_failure()
+        if response is not None:
+            return response
+        raise last_error
+
+    def get(self, url, max_tries=1, **kwargs):
+        """GET request, see request"""
+        return self.request('GET', url, max_tries, **kwargs)
+
+    def post(self, url, max_tries=1, **kwargs):
+        """POST request, see request"""
+        return self.request('POST', url, max_tries, **kwargs)
+
+    def patch(self, url, max_tries=1, **kwargs):
+        """PATCH request, see request"""
+        return self.request('PATCH', url, max_tries, **kwargs)
@@ -5,11 +5,44 @@ set -eo pipefail
 SPRING_VERSION="${1}"
 ORCH_IP="${2}"
 PORT="${3}"
+# release packages are kept in the host artifact cache, see artifact_cache.py
+CACHE_DIR="${4}"
+# set when prefetching for the next job, package is only fetched, nodeos is not replaced
+DOWNLOAD_ONLY="${5}"
+# packages are downloaded here and installed under its nodeos directory, one per job slot see slot_env.sh
+SLOT_HOME="${6:-${HOME}}"
 OS="ubuntu22.04"
+CACHED_DEB=""
+
+# orchestrator mirrors packages, downloading each from GitHub once for all hosts
+# 503 while the orchestrator is downloading, partial downloads resume with a range request
+function mirror_download() {
+  local output="$1"
+  local http_status
+  for ((i=1; i<=24; i++)); do
+    http_status=$(curl -f -s -C - -D "${output}.headers" -w "%{http_code}" -o "${output}" \
+       --get "http://${ORCH_IP}/package" --data-urlencode "version=${SPRING_VERSION}") || true
+    if [ "$http_status" == "200" ] || [ "$http_status" == "206" ]; then
+      local expected
+      expected=$(grep -i '^x-checksum-sha256:' "${output}.headers" | cut -d' ' -f2 | tr -d '\r')
+      rm -f "${output}.headers"
+      if [ -z "$expected" ] || [ "$(sha256sum "${output}" | cut -d' ' -f1)" == "$expected" ]; then
+        return 0
+      fi
+      echo "Mirrored package failed checksum"
+      break
+    fi
+    [ "$http_status" != "503" ] && break
+    sleep 5
+  done
+  rm -f "${output}" "${output}.headers"
+  return 1
+}
 
 ## root setup ##
+mkdir -p "${SLOT_HOME:?}"
 # clean out un-needed files
-for not_needed_deb_file in "${HOME:?}"/*_*.deb; do
+for not_needed_deb_file in "${SLOT_HOME:?}"/*_*.deb; do
   echo "Removing not needed deb ${not_needed_deb_file}"
   rm -rf "${not_needed_deb_file}"
 done
@@ -28,8 +61,35 @@ if [[ "$SPRING_VERSION" =~ ^v?[1-9]\.[0-9]\.[0-9][\-rc0-9]*$ ]]; then
     DEB_FILE="antelope-spring_${SPRING_VERSION}_amd64.deb"
     DEB_URL="https://github.com/AntelopeIO/spring/releases/download/v${SPRING_VERSION}/${DEB_FILE}"
   fi
-  # download file if needed
-  wget --directory-prefix="${HOME}" "${DEB_URL}" 2> /dev/null
+  # release packages never change, reuse the copy from an earlier job
+  if [ -n "${CACHE_DIR}" ]; then
+    CACHED_DEB=$(python3 "$(dirname "$0")"/artifact_cache.py --cache-dir "${CACHE_DIR}" path --key "${DEB_URL}") || CACHED_DEB=""
+  fi
+  if [ -n "${CACHED_DEB}" ]; then
+    echo "Using cached ${DEB_FILE}"
+  else
+    if mirror_download "${SLOT_HOME}/${DEB_FILE}"; then
+      echo "Downloaded ${DEB_FILE} from orchestrator mirror"
+    else
+      # mirror miss, download file from upstream
+      wget --directory-prefix="${SLOT_HOME}" "${DEB_URL}" 2> /dev/null
+    fi
+    if [ -n "${CACHE_DIR}" ] && [ -s "${SLOT_HOME}/${DEB_FILE}" ]; then
+      python3 "$(dirname "$0")"/artifact_cache.py --cache-dir "${CACHE_DIR}" put --key "${DEB_URL}" --source "${SLOT_HOME}/${DEB_FILE}" > /dev/null
+    fi
+  fi
+  if [ -n "${DOWNLOAD_ONLY}" ]; then
+    # install reads it from the cache
+    rm -f "${SLOT_HOME:?}/${DEB_FILE}"
+    echo "Fetched ${DEB_FILE}"
+    exit 0
+  fi
+elif [ -n "${DOWNLOAD_ONLY}" ]; then
+  # orchestrator mirror starts fetching the branch build, install downloads it from the mirror
+  curl -s -o /dev/null -I --get "http://${ORCH_IP}/package" --data-urlencode "version=${SPRING_VERSION}" || true
+  exit 0
+elif mirror_download "${SLOT_HOME}/${SPRING_VERSION//[^a-zA-Z0-9.-]/-}_mirror_amd64.deb"; then
+  echo "Downloaded ${SPRING_VERSION} build from orchestrator mirror"
 else
   BRANCH="${SPRING_VERSION}"
   response_json=$(curl --get http://${ORCH_IP}:${PORT:-4000}/deb_download_url --data-urlencode "branch=${BRANCH}" -H 'Accept: application/json')
@@ -39,7 +99,7 @@ else
     source ${HOME:?}/token.env
     # download artifact from debian
     for ((i=1; i<=8; i++)); do
-      http_status=$(curl -L -s -w "%{http_code}" -o ${HOME:?}/download.zip -H 'Accept: application/vnd.github+json' -H 'X-GitHub-Api-Version: 2022-11-28' -H "Authorization: Bearer ${TOKEN}" "$URL")
+      http_status=$(curl -L -s -w "%{http_code}" -o ${SLOT_HOME:?}/download.zip -H 'Accept: application/vnd.github+json' -H 'X-GitHub-Api-Version: 2022-11-28' -H "Authorization: Bearer ${TOKEN}" "$URL")
       if [ "$http_status" -eq 200 ]; then
         break
       fi
@@ -48,15 +108,20 @@ else
         sleep 2  # Wait 2 seconds before retrying
       fi
     done
-    cd $HOME || exit 127
-    unzip ${HOME:?}/download.zip
+    cd "${SLOT_HOME}" || exit 127
+    unzip ${SLOT_HOME:?}/download.zip
   else
     # didn't get valid URL to download artifact bad token or maybe artifact no longer exists
     exit 127
   fi
 fi
 
-DEB_FILE=$(ls -1 $HOME/*_*.deb | head -1)
+if [ -n "${CACHED_DEB}" ]; then
+  # installed straight from the cache, nothing copied
+  DEB_FILE="${CACHED_DEB}"
+else
+  DEB_FILE=$(ls -1 "${SLOT_HOME}"/*_*.deb | head -1)
+fi
 
 ## dry-run
 [[ "$(echo "$3" | grep -icP '^DRY(-_)>RUN$')" == '1' ]] && export DRY_RUN='true'
@@ -72,8 +137,8 @@ fi
 
 # install nodeos locally
 echo "Installing nodeos ${SPRING_VERSION} locally"
-[ -d "${HOME:?}/nodeos" ] && rm -rf "${HOME:?}/nodeos"
-mkdir "${HOME:?}/nodeos"
-dpkg -x "${DEB_FILE}" "${HOME:?}/nodeos"
+[ -d "${SLOT_HOME:?}/nodeos" ] && rm -rf "${SLOT_HOME:?}/nodeos"
+mkdir "${SLOT_HOME:?}/nodeos"
+dpkg -x "${DEB_FILE}" "${SLOT_HOME:?}/nodeos"
 
 echo "Done. - ${BASH_SOURCE[0]}"
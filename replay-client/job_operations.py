@@ -4,149 +4,148 @@ import os
 import json
 from datetime import datetime
 import argparse
+import gzip
 import sys
-import time
+import uuid
 import requests
+from http_transport import HttpTransport
 
+# retries, backoff and circuit breaker for orchestration service calls
+# replay_agent.py swaps in the transport it shares with config_operations.py
+HTTP = HttpTransport()
+# log bytes per uploaded chunk, before compression
+LOG_CHUNK_BYTES = 4 * 1024 * 1024
 
 #
 # Examples
 # python3 ../job_operations.py --operation pop
+# python3 ../job_operations.py --operation reserve --instance-id i-0123456789 --lease-minutes 60
+# python3 ../job_operations.py --operation pop --instance-id i-0123456789 --slot 2 --slots 4
 # python3 ../job_operations.py --operation update-status --status WORKING
 # python3 ../job_operations.py --operation update-status --status WORKING --job-id 4523686544
 # python3 ../job_operations.py --operation update-progress --block-processed 20 --job-id 4523686544
+# python3 ../job_operations.py --operation nodeos-error-log --log /data/previous-0/nodeos.log --job-id 4523686544
 #
 
-def proccess_job_update(base_url, max_tries, job_id, fields):
-    """Fetches Job, Updates Job Values, and Sets the Job Status"""
+# pylint: disable=too-many-arguments
+def proccess_job_update(base_url, max_tries, job_id, fields, nextjob_params=None, preconditions=None):
+    """Fetches next job needing a worker and claims it with fields
+    with a job_id only sends the changed fields
+    preconditions guard the claim, default the job is still waiting for a worker"""
+    if job_id is not None:
+        return patch_job(base_url, max_tries, job_id, fields)
+    if preconditions is None:
+        preconditions = {'status': 'WAITING_4_WORKER'}
 
     # initialize params
     get_headers = {
         'Accept': 'application/json',
     }
-    params = {}
-    # no job_id means we get next job from queue that needs a worker
-    if job_id is None:
-        params = { 'nextjob': 1 }
-    else:
-        params = { 'jobid': job_id }
+    params = { 'nextjob': 1 }
+    # optional hints for picking the next job, like local artifacts
+    if nextjob_params:
+        params.update(nextjob_params)
 
-    # data stucture we get from update_job
+    # data stucture we get from patch_job
     process_job_message = { 'status_code': None,
             'jobid': None,
             'json': None }
 
-    # 500 milisecs double every loop
-    backoff = 0.5
     update_complete = False
     # will increate by 1 each loop
     current_try = 0
 
     update_job_object = {}
+    job_response = None
 
-    # loop getting and setting until success
-    # etag is checksum to ensure content has not been updated by another process
+    # loop getting and claiming until success
+    # precondition on status ensures no other host claimed the job first
     while not update_complete and current_try <= max_tries:
-        # first update counter and backoff
+        # first update counter, wait with jitter or as the service asked before trying again
+        if current_try > 0:
+            HTTP.pause(current_try, job_response)
         current_try = current_try + 1
-        backoff = backoff * 2
-        # get open job
-        job_response = requests.get(base_url + '/job',
-            params=params,
-            headers=get_headers,
-            timeout=3)
-
-        # try again if error on get next job
+        # get open job, this loop does the retries
+        try:
+            job_response = HTTP.get(base_url + '/job',
+                params=params,
+                headers=get_headers,
+                timeout=3)
+        except requests.exceptions.RequestException as error:
+            print(f"Warning: request for next job failed with {error}", file=sys.stderr)
+            job_response = None
+            continue
+
+        # try again if error on get next job, like no job waiting
         # this is rare so we report errror
         if job_response.status_code != 200:
             print(f"Warning: request for next job failed with code {job_response.status_code}",
                 file=sys.stderr)
-            time.sleep(backoff)
             continue
 
-        # parse json, update status to claim job, grab the etag
+        # parse json, update status to claim job
         update_job_object = json.loads(job_response.content.decode('utf-8'))
         # loop over the passed in dictionary and update job object
         for key in fields.keys():
             update_job_object[key] = fields[key]
-        response_etag = job_response.headers.get('ETag')
-        # make a POST to update job
-        process_job_message = update_job(base_url, response_etag, update_job_object)
+        process_job_message = patch_job(base_url,
+            max_tries,
+            update_job_object['job_id'],
+            fields,
+            preconditions)
 
         if process_job_message['status_code'] == 200:
             update_complete = True
 
     # outside while loop
-    # if job_id is None, this is get next job, return full json
-    if not job_id:
-        update_job_object['status_code'] = process_job_message['status_code']
-        return update_job_object
-    return process_job_message
+    # this is get next job, return full json
+    update_job_object['status_code'] = process_job_message['status_code']
+    return update_job_object
 
-def update_job(base_url, etag, job):
-    """Update job with provided job object"""
+# pylint: disable=too-many-arguments
+def patch_job(base_url, max_tries, job_id, fields, preconditions=None):
+    """Send only changed fields, one request per attempt
+    preconditions maps job fields to a value or list of allowed values
+    a failed precondition returns 412 and is not retried"""
 
-    post_headers = {
+    patch_headers = {
         'Content-Type': 'application/json',
+        'Accept': 'application/json',
     }
     # data stucture we will be returning
     update_job_message = { 'status_code': None,
-            'jobid': None,
+            'jobid': job_id,
             'json': None }
 
-    # 500 milisecs doubles every loop
-    backoff = 0.5
-    update_complete = False
-    max_tries = 10
-    # will increate by 1 each loop
-    current_try = 0
-
-    # need to specify job id and new status
-    params = { 'jobid': job['job_id'] }
-    # ETag from previous request prevents race conditions
-    post_headers['ETag'] = etag
-
-    # loop getting and setting until success
-    # etag is checksum to ensure content has not been updated by another process
-    while not update_complete and current_try <= max_tries:
-        # first update counters and backoff
-        current_try = current_try + 1
-        backoff = backoff * 2
+    body = dict(fields)
+    if preconditions:
+        body['preconditions'] = preconditions
 
-        # make POST call; json passed in as string
-        update_job_response = requests.post(base_url + '/job',
-            params=params,
-            headers=post_headers,
+    # transport retries connection and service errors
+    try:
+        update_job_response = HTTP.patch(base_url + '/job',
+            max_tries,
+            params={ 'jobid': job_id },
+            headers=patch_headers,
             timeout=3,
-            data=json.dumps(job))
+            data=json.dumps(body))
+    except requests.exceptions.RequestException as error:
+        print(f"Warning: update job failed with {error}", file=sys.stderr)
+        return update_job_message
 
-        # populate data structure
-        update_job_message['status_code'] = update_job_response.status_code
-        update_job_message['jobid'] = job['job_id']
-        if update_job_response.content is not None:
-            update_job_message['json'] = update_job_response.content.decode('utf-8')
+    # populate data structure
+    update_job_message['status_code'] = update_job_response.status_code
+    if update_job_response.content is not None:
+        update_job_message['json'] = update_job_response.content.decode('utf-8')
+    if update_job_response.status_code > 399:
+        print(f"Warning: update job failed with code {update_job_response.status_code}",
+            file=sys.stderr)
 
-        # good job
-        if update_job_response.status_code == 200:
-            update_complete = True
-        # 4xx error means client issue, no retries will fix that, abort
-        elif update_job_response.status_code > 399 \
-            and update_job_response.status_code < 500:
-            print(f"Warning: update job failed with code {update_job_response.status_code}",
-                file=sys.stderr)
-            break
-        # rest and try again, assume this is service side error
-        else:
-            # we try again pause to avoid collisions
-            time.sleep(backoff)
-
-    # outside while loop
     return update_job_message
 
-def upload_error_log(base_url, job_id, log_type, log_path):
-    """upload error logs to orchestration service, no retries"""
-    upload_logpath = f"/errorlog/{log_type}{job_id}"
-
+def upload_log(base_url, max_tries, job_id, log_type, log_path, chunk_bytes=LOG_CHUNK_BYTES):
+    """upload whole log to orchestration service as gzip chunks
+    after a lost response or a conflict resumes from the offset the service reports"""
     # data stucture we will be returning
     update_job_message = { 'status_code': None,
         'jobid': job_id,
@@ -155,65 +154,139 @@ def upload_error_log(base_url, job_id, log_type, log_path):
         update_job_message['status_code'] = 404
         update_job_message['json'] = f'{{message:"{log_path} file does not exist"}}'
         return update_job_message
-    # read last 4,000 chars the limit for our log file
-    with open(log_path, 'r', encoding='utf-8') as file:
-        # Move the file pointer to 4000 characters before the end of the file
-        file.seek(0, 2)  # Move to the end of the file
-        file_size = file.tell()  # Get the total size of the file
-
-        # Calculate start position
-        start_pos = max(file_size - 8000, 0)
-        file.seek(start_pos)
-        contents = file.read()
-
-    job_response = requests.post(base_url + upload_logpath,
-        data=contents.encode('utf-8'),
-        timeout=10)
-    update_job_message['status_code'] = job_response.status_code
-    update_job_message['json'] = f'{{message:"process complete for {log_path}"}}'
+    # a retried attempt uploads again under a new name and replaces the log
+    upload_id = uuid.uuid4().hex
+    offset = 0
+    conflicts = 0
+
+    # file stays open, log may be moved or removed while uploading
+    with open(log_path, 'rb') as file:
+        # log written after this point is not uploaded
+        log_size = os.fstat(file.fileno()).st_size
+        while conflicts < max_tries:
+            file.seek(offset)
+            chunk = file.read(min(chunk_bytes, log_size - offset))
+            params = { 'jobid': job_id, 'log': log_type, 'upload': upload_id, 'offset': offset }
+            complete = offset + len(chunk) >= log_size
+            if complete:
+                params['complete'] = 'true'
+            # transport retries connection and service errors for each chunk
+            try:
+                log_response = HTTP.post(base_url + '/joblog',
+                    max_tries,
+                    params=params,
+                    timeout=30,
+                    data=gzip.compress(chunk))
+            except requests.exceptions.RequestException as error:
+                print(f"Warning: log upload failed with {error}", file=sys.stderr)
+                break
+
+            update_job_message['status_code'] = log_response.status_code
+            # 409 when offset is not where service has the log, continue from its offset
+            if log_response.status_code in (200, 409):
+                offset = min(int(log_response.headers.get('X-Log-Offset', '0')), log_size)
+                if log_response.status_code == 200 and complete:
+                    break
+                if log_response.status_code == 409:
+                    conflicts = conflicts + 1
+                continue
+            print(f"Warning: log upload failed with code {log_response.status_code}",
+                file=sys.stderr)
+            break
+
+    update_job_message['json'] = f'{{message:"uploaded {offset} of {log_size} bytes from {log_path}"}}'
     return update_job_message
 
 
-def pop_job(base_url, max_tries, instance_id):
-    """Fetch a job (GET) that needs a worker; update status to STARTED"""
+def slot_name(instance_id, slot=None):
+    """lease holder name for a job slot, the first slot is the bare instance id
+    matches Hosts.slot_name in the orchestration service"""
+    if not instance_id or not slot or str(slot) == '0':
+        return instance_id
+    return f"{instance_id}/{slot}"
+
+def nextjob_hints(instance_id, held_strides=None, held_snapshots=None, slot=None, slots=None):
+    """query parameters describing the asking host and its local artifacts"""
+    nextjob_params = {'instance': instance_id}
+    if held_strides:
+        nextjob_params['strides'] = held_strides
+    if held_snapshots:
+        nextjob_params['snapshots'] = held_snapshots
+    # hosts running several jobs at once advertise their slots
+    if slots:
+        nextjob_params['slot'] = slot or 0
+        nextjob_params['slots'] = slots
+    return nextjob_params
+
+# pylint: disable=too-many-arguments
+def pop_job(base_url, max_tries, instance_id, held_strides=None, held_snapshots=None, slot=None, slots=None):
+    """Fetch a job (GET) that needs a worker; update status to STARTED
+    held strides and snapshots are local artifacts, orchestrator prefers jobs reusing them
+    a job this instance's slot leased with reserve_job is returned first"""
     fields_to_update = {
         'status': 'STARTED',
         'start_time': datetime.now().strftime('%Y-%m-%dT%H:%M:%S'),
         'instance_id': instance_id
     }
-    return proccess_job_update(base_url, max_tries, None, fields_to_update)
+    return proccess_job_update(base_url, max_tries, None, fields_to_update,
+        nextjob_hints(instance_id, held_strides, held_snapshots, slot, slots))
+
+# pylint: disable=too-many-arguments
+def reserve_job(base_url, max_tries, instance_id, lease_minutes, held_strides=None, held_snapshots=None,
+    slot=None, slots=None):
+    """Lease the next job without starting it, the job stays waiting for a worker
+    other hosts and slots skip it until the lease expires, pop_job by this slot claims it"""
+    holder = slot_name(instance_id, slot)
+    fields_to_update = {
+        'reserved_by': holder,
+        'lease_minutes': lease_minutes
+    }
+    # free or already ours, another host may have leased it since the GET
+    not_leased = {'status': 'WAITING_4_WORKER', 'reserved_by': [None, holder]}
+    return proccess_job_update(base_url, max_tries, None, fields_to_update,
+        nextjob_hints(instance_id, held_strides, held_snapshots, slot, slots), not_leased)
+
+# pylint: disable=too-many-arguments
+def renew_lease(base_url, max_tries, job_id, instance_id, lease_minutes, slot=None):
+    """Extend lease on a reserved job, 412 when the lease was lost or the job started"""
+    holder = slot_name(instance_id, slot)
+    return patch_job(base_url, max_tries, job_id,
+        {'reserved_by': holder, 'lease_minutes': lease_minutes},
+        {'status': 'WAITING_4_WORKER', 'reserved_by': holder})
 
 def update_job_status(base_url, max_tries, job_id, status):
-    """Fetch a job (GET) by id; update status to provided value"""
-    return proccess_job_update(base_url, max_tries, job_id, {"status":status})
+    """Update status to provided value"""
+    return patch_job(base_url, max_tries, job_id, {"status":status})
 
 def update_error_message(base_url, max_tries, job_id, error_message):
-    """Fetch a job (GET) by id; set status to error and set error message"""
+    """Set status to error and set error message"""
     status = "ERROR"
     error_object = {
         'status':status,
         'error_message': error_message
     }
-    return proccess_job_update(base_url, max_tries, job_id, error_object)
+    return patch_job(base_url, max_tries, job_id, error_object)
 
 def update_job_progress(base_url, max_tries, job_id, block_processed):
-    """Fetch a job (GET) by id; update status to provided value"""
+    """Update last block processed, ignored once the job is no longer running"""
     fields_to_update = {
             'status': 'WORKING',
             'last_block_processed': block_processed
     }
-    return proccess_job_update(base_url, max_tries, job_id, fields_to_update)
+    # late progress must not move a finished or failed job back to WORKING
+    running = {'status': ['STARTED', 'LOADING_SNAPSHOT', 'WORKING']}
+    return patch_job(base_url, max_tries, job_id, fields_to_update, running)
 
 #pylint: disable=too-many-arguments
 def set_job_completed(base_url, max_tries, job_id, last_block_processed, end_time, integrity_hash):
-    """Fetch a job (GET) by id; update job with completed details"""
+    """Update job with completed details"""
     fields_to_update = {
         'status': 'COMPLETE',
         'last_block_processed': last_block_processed,
         'end_time': end_time,
         'actual_integrity_hash': integrity_hash
     }
-    return proccess_job_update(base_url, max_tries, job_id, fields_to_update)
+    return patch_job(base_url, max_tries, job_id, fields_to_update)
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(
@@ -230,7 +303,7 @@ if __name__ == '__main__':
         help='Number of attemps when HTTP call fails, default 10')
     parser.add_argument('--operation',
         type=str,
-        help='call to make pop, update-status, update-progress, complete')
+        help='call to make pop, reserve, update-status, update-progress, complete')
     parser.add_argument('--job-id',
         type=int,
         help='id of job to update')
@@ -240,6 +313,21 @@ if __name__ == '__main__':
     parser.add_argument('--instance-id',
         type=str,
         help='aws instance id of host')
+    parser.add_argument('--held-strides',
+        type=str,
+        help='comma seperated first block of blocks log strides held locally')
+    parser.add_argument('--held-snapshots',
+        type=str,
+        help='comma seperated snapshot file names held locally')
+    parser.add_argument('--slot',
+        type=int, default=0,
+        help='job slot on the host, default 0')
+    parser.add_argument('--slots',
+        type=int,
+        help='job slots on the host, sent when more then one job runs at once')
+    parser.add_argument('--lease-minutes',
+        type=int, default=60,
+        help='minutes to hold a reserved job, default 60')
     parser.add_argument('--error-message',
         type=str,
         help='error message')
@@ -259,7 +347,8 @@ if __name__ == '__main__':
     args = parser.parse_args()
 
     # validate argument values
-    if args.operation in ['update-status', 'update-error', 'update-progress', 'complete'] and args.job_id is None:
+    if args.operation in ['update-status', 'update-error', 'update-progress', 'complete',
+        'wrapper-error-log', 'nodeos-error-log'] and args.job_id is None:
         sys.exit(f"Error job_id must be specifid for operation {args.operation}")
     if args.max_tries < 1:
         sys.exit("Error max-tries must be greater then zero")
@@ -276,7 +365,22 @@ if __name__ == '__main__':
 
     # which operation
     if args.operation == "pop":
-        job_message = pop_job(url, args.max_tries, args.instance_id)
+        job_message = pop_job(url,
+            args.max_tries,
+            args.instance_id,
+            args.held_strides,
+            args.held_snapshots,
+            args.slot,
+            args.slots)
+    elif args.operation == "reserve":
+        job_message = reserve_job(url,
+            args.max_tries,
+            args.instance_id,
+            args.lease_minutes,
+            args.held_strides,
+            args.held_snapshots,
+            args.slot,
+            args.slots)
     elif args.operation == "update-status":
         job_message = update_job_status(url,
             args.max_tries,
@@ -300,12 +404,14 @@ if __name__ == '__main__':
             args.end_time,
             args.integrity_hash)
     elif args.operation == "wrapper-error-log":
-        job_message = upload_error_log(url,
+        job_message = upload_log(url,
+            args.max_tries,
             args.job_id,
             "wrapper",
             args.log)
     elif args.operation == "nodeos-error-log":
-        job_message = upload_error_log(url,
+        job_message = upload_log(url,
+            args.max_tries,
             args.job_id,
             "nodeos",
             args.log)
@@ -0,0 +1,124 @@
+"""Module follows nodeos.log and parses progress and integrity hashes as lines are written."""
+import os
+import re
+
+class NodeosLogFollower:
+    """
+    Reads only what was appended since the last poll, remembers the file offset
+    Parses the same lines as head_block_num_from_log.sh and get_integrity_hash_from_log.sh
+    - spring controller.cpp `Received block ... #<num>`
+    - leap v5 controller.cpp replay `] <num> of <total>`
+    - net_plugin.cpp recv_handshake, 4th comma field `head <num>` or `fhead <num>`
+    - `chain database started|stopped with hash: <hash>`
+    """
+    CHUNK_SIZE = 1024 * 1024
+    SPRING_BLOCK = re.compile(r"#(\d+)")
+    LEAP_REPLAY = re.compile(r"\]\s?(\d+) of ")
+    HANDSHAKE_HEAD = re.compile(r"^ f*head (\d+)")
+    INTEGRITY_HASH = re.compile(r"chain database (started|stopped) with hash:?\s*([0-9a-fA-F]+)")
+
+    def __init__(self, log_path):
+        self.log_path = log_path
+        self.offset = 0
+        self.inode = None
+        # bytes after the last newline, completed on the next poll
+        self.partial = b''
+        self.spring_block = None
+        self.leap_block = None
+        self.handshake_head = None
+        self.hashes = {}
+
+    def poll(self):
+        """parse lines appended since last poll, returns number of lines parsed"""
+        try:
+            stat = os.stat(self.log_path)
+        except FileNotFoundError:
+            return 0
+        # log replaced or truncated, start over
+        if stat.st_ino != self.inode or stat.st_size < self.offset:
+            self.inode = stat.st_ino
+            self.offset = 0
+            self.partial = b''
+        if stat.st_size == self.offset:
+            return 0
+        parsed = 0
+        with open(self.log_path, 'rb') as file:
+            file.seek(self.offset)
+            while True:
+                chunk = file.read(NodeosLogFollower.CHUNK_SIZE)
+                if not chunk:
+                    break
+                self.offset += len(chunk)
+                lines = (self.partial + chunk).split(b'\n')
+                self.partial = lines.pop()
+                for line in lines:
+                    self.parse_line(line.decode('utf-8', errors='replace'))
+                    parsed += 1
+        return parsed
+
+    def parse_line(self, line):
+        """update progress or hashes from one log line"""
+        if 'controller.cpp' in line:
+            if 'Received block' in line:
+                match = NodeosLogFollower.SPRING_BLOCK.search(line)
+                if match:
+                    self.spring_block = int(match.group(1))
+            elif 'replay' in line:
+                match = NodeosLogFollower.LEAP_REPLAY.search(line)
+                if match:
+                    self.leap_block = int(match.group(1))
+        if 'net_plugin.cpp:' in line and 'recv_handshake' in line:
+            fields = line.split(']')
+            if len(fields) > 2:
+                fields = fields[2].split(',')
+                if len(fields) > 3:
+                    match = NodeosLogFollower.HANDSHAKE_HEAD.match(fields[3])
+                    if match:
+                        self.handshake_head = int(match.group(1))
+        if 'chain database' in line:
+            match = NodeosLogFollower.INTEGRITY_HASH.search(line)
+            if match:
+                self.hashes[match.group(1)] = match.group(2)
+
+    def head_block(self):
+        """most recent block processed, None when nothing found yet
+        spring format wins over leap, peer handshake head wins when greater"""
+        from_log = self.spring_block if self.spring_block is not None else self.leap_block
+        if from_log is None or (self.handshake_head is not None and self.handshake_head > from_log):
+            return self.handshake_head
+        return from_log
+
+    def integrity_hash(self, hash_type):
+        """hash reported when chain database `started` or `stopped`, None when not seen"""
+        return self.hashes.get(hash_type)
+
+class ProgressPacer:
+    """
+    Decides when to report progress
+    reports once progress moved `1/steps` of the block range and `min_seconds` passed
+    reports at least every `max_seconds` while the head block keeps moving
+    fast replays report often, stalled or slow replays back off
+    """
+    def __init__(self, total_blocks, min_seconds=30, max_seconds=300, steps=100):
+        self.step_blocks = max(int(total_blocks) // steps, 1)
+        self.min_seconds = min_seconds
+        self.max_seconds = max_seconds
+        self.last_time = None
+        self.last_block = None
+
+    def due(self, now, head_block):
+        """true when head block should be reported now"""
+        if head_block is None or head_block == self.last_block:
+            return False
+        if self.last_time is None:
+            return True
+        elapsed = now - self.last_time
+        if elapsed >= self.max_seconds:
+            return True
+        return elapsed >= self.min_seconds \
+            and head_block - (self.last_block or 0) >= self.step_blocks
+
+    def reported(self, now, head_block):
+        """remember last report"""
+        self.last_time = now
+        self.last_block = head_block
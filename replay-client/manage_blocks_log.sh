@@ -1,12 +1,15 @@
 #!/usr/bin/env bash
 
 # Pulls block log file from cloud storage or saves block log to cloud storage
+# blocks log and index stream from storage into zstd, strides are joined as they stream, see blocks_log.py
 # Params
 #
 # NODEOS_DIR - local host top level directory
 # START_BLOCK_NUM - starting block to lable blocks log
 # END_BLOCK_NUM - ending block to lable blocks log
-# SNAPSHOT_PATH - used to figure out cloud directory and bucket
+# SNAPSHOT_PATH - used to figure out cloud directory and bucket, s3:// or file://
+# CACHE_DIR - host artifact cache, compressed blocks logs kept between jobs, see artifact_cache.py
+# REGIONAL_CACHE - optional url of regional cache service, s3:// strides are read through it
 #
 
 
@@ -14,6 +17,9 @@ NODEOS_DIR=${1:-/data/nodeos}
 START_BLOCK_NUM=$2
 END_BLOCK_NUM=$3
 SNAPSHOT_PATH=${4:-s3://chicken-dance/default/snapshots/snapshot.bin.zst}
+CACHE_DIR=${5:-/data/cache}
+REGIONAL_CACHE=${6:-}
+REPLAY_CLIENT_DIR=$(dirname "$0")
 UTIL="spring-util"
 # need to handle older versions of nodeos
 if [[ "$(nodeos -v | grep -ic v[45])" == '1' ]]; then
@@ -28,14 +34,11 @@ fi
 
 
 # Figure out S3 Blocks log dir from provided snapshot path
+# works the same for file:// snapshot paths
 # Remove the last directory using dirname
 S3_DIR="$(dirname "$SNAPSHOT_PATH")"
 # Strip off the file and last directory
 S3_DIR="${S3_DIR%/*}"/blocks
-# figure out s3 bucket
-S3_BUCKET=$(echo "${S3_DIR}" | sed 's#s3://##' | cut -d'/' -f1)
-# figure out s3 path
-S3_PATH=$(echo "${S3_DIR}" | sed 's#s3://##' | cut -d'/' -f2-)
 # figure out file name
 if [ ${START_BLOCK_NUM} -lt 1 ]; then
   START_BLOCK_NUM=1
@@ -48,61 +51,30 @@ UPPER_BOUND=$( echo "${END_BLOCK_NUM}/${STRIDE}*${STRIDE}" | bc)
 if [ ${END_BLOCK_NUM} -gt ${UPPER_BOUND} ]; then
   UPPER_BOUND=$( echo "${UPPER_BOUND}+${STRIDE}" | bc)
 fi
-# construct two files because the start/end might cross a block log stride
-LOWER_BOUND_END=$(echo "${LOWER_BOUND}+${STRIDE}" | bc)
-UPPER_BOUND_START=$(echo "${UPPER_BOUND}-${STRIDE}" | bc)
-let "BLOCK_START=LOWER_BOUND+1"
-S3_BLOCKS_LOWER=blocks-${BLOCK_START}-${LOWER_BOUND_END}.log.zst
-let "BLOCK_START=UPPER_BOUND_START+1"
-S3_BLOCKS_UPPER=blocks-${BLOCK_START}-${UPPER_BOUND}.log.zst
-
-# copy down files
-# leap-util/spring-util merge-blocks running out of space, just copy one blocks log for now
-#for S3_BLOCKS in $S3_BLOCKS_LOWER $S3_BLOCKS_UPPER
-for S3_BLOCKS in $S3_BLOCKS_LOWER
+# every stride the slice crosses, in block order
+STRIDES=""
+STRIDE_START=${LOWER_BOUND}
+while [ ${STRIDE_START} -lt ${UPPER_BOUND} ]
 do
-  aws s3api head-object --bucket "$S3_BUCKET" --key "$S3_PATH"/"$S3_BLOCKS" > /dev/null 2>&1 || NOT_EXIST=true
-
-  if [ $NOT_EXIST ]; then
-    echo "${S3_DIR}/${S3_FILE} does not exist skipping blocks log restore step"
-  else
-    # skip if local file already exists
-    if [ ! -s "$NODEOS_DIR"/data/blocks"${S3_FILE}"/"${S3_BLOCKS}" ]; then
-      aws s3 cp "${S3_DIR}"/"$S3_FILE""$S3_BLOCKS" "$NODEOS_DIR"/data/blocks/ > /dev/null 2>&1
-      aws s3 cp "${S3_DIR}"/"$S3_FILE""${S3_BLOCKS%%.*}.index.zst" "$NODEOS_DIR"/data/blocks/ > /dev/null 2>&1
-      for f in "$NODEOS_DIR"/data/blocks/blocks-*.zst
-      do
-        zstd -d $f > /dev/null 2>&1
-        if [ $? -eq 0 ]; then
-          rm $f
-        fi
-      done
-    fi
-  fi
+  let "STRIDE_END=STRIDE_START+STRIDE"
+  let "BLOCK_START=STRIDE_START+1"
+  STRIDES="${STRIDES:+${STRIDES},}blocks-${BLOCK_START}-${STRIDE_END}"
+  STRIDE_START=${STRIDE_END}
 done
 
-# now we have our files
-CNT=$(ls -1 "$NODEOS_DIR"/data/blocks/blocks-*.log | wc -l)
-# several blocks logs to merge
-if [ $CNT -gt 1 ]; then
-  [ ! -d "$NODEOS_DIR"/source-blocks/ ] && mkdir "$NODEOS_DIR"/source-blocks/
-  # move blocks out of the way before merge
-  mv "$NODEOS_DIR"/data/blocks/blocks-*.log "$NODEOS_DIR"/source-blocks/
-  mv "$NODEOS_DIR"/data/blocks/blocks-*.index "$NODEOS_DIR"/source-blocks/
-  $UTIL block-log merge-blocks \
-      --blocks-dir "$NODEOS_DIR"/source-blocks/ \
-      --output-dir "$NODEOS_DIR"/data/blocks/ > /dev/null 2>&1 || FAILED_MERGE=true
-  if [ $FAILED_MERGE ]; then
-    echo "Failed to merge blocks logs from ${NODEOS_DIR}/source-blocks/ into ${NODEOS_DIR}/data/blocks/"
-    exit 127
-  fi
-# just one blocks log rename
-else
-  for f in "$NODEOS_DIR"/data/blocks/blocks-*.log
-  do
-    mv $f "$NODEOS_DIR"/data/blocks/blocks.log
-    mv "${f%%.*}.index" "$NODEOS_DIR"/data/blocks/blocks.index
-  done
+# stream strides into one blocks.log and blocks.index, no merge copies, see blocks_log.py
+# strides past free disk space or missing from storage are synced from peers
+python3 "${REPLAY_CLIENT_DIR}"/blocks_log.py --source-dir "${S3_DIR}" \
+    --strides "${STRIDES}" \
+    --blocks-dir "$NODEOS_DIR"/data/blocks \
+    --cache-dir "$CACHE_DIR" \
+    ${REGIONAL_CACHE:+--regional-cache "$REGIONAL_CACHE"}
+RESTORE_EXIT=$?
+if [ $RESTORE_EXIT -eq 2 ]; then
+  echo "${S3_DIR}/${STRIDES%%,*} does not exist skipping blocks log restore step"
+elif [ $RESTORE_EXIT -ne 0 ]; then
+  echo "Failed to restore blocks logs ${STRIDES} into ${NODEOS_DIR}/data/blocks/"
+  exit 127
 fi
 
 $UTIL block-log --blocks-dir "$NODEOS_DIR"/data/blocks/ smoke-test > /dev/null 2>&1 || FAILED_SMOKE_TEST=true
@@ -0,0 +1,76 @@
+#!/usr/bin/env bash
+
+# Stages the next job's snapshot, blocks log and nodeos package while the current job finishes
+# replay_agent.py starts this in its own session once it leases the next job
+# start-nodeos-run-replay.sh moves the staged files into place when it claims the leased job
+# runs at lower priority, the current job's nodeos comes first
+# Params
+#
+# JOB_FILE - config of the leased job, written by replay_agent.py
+# ORCH_IP - orchestration service, nodeos packages are mirrored there
+# ORCH_PORT - orchestration service port
+# SLOT - job slot staging the next job, see slot_env.sh
+#
+
+REPLAY_CLIENT_DIR=$(dirname "$0")
+SLOT=${4:-0}
+source "${REPLAY_CLIENT_DIR}"/slot_env.sh
+JOB_FILE=${1:-${NEXT_JOB_FILE}}
+ORCH_IP=${2:-127.0.0.1}
+ORCH_PORT=${3:-4000}
+CACHE_DIR=/data/cache
+REGIONAL_CACHE=$(cat /home/enf-replay/regional-cache-url.txt 2> /dev/null)
+# current jobs keep this much free space
+MIN_FREE_GB=80
+# blocks log smoke test uses the installed spring-util
+PATH=${PATH}:${SLOT_HOME}/nodeos/usr/bin:${SLOT_HOME}/nodeos/usr/local/bin
+export PATH
+
+mkdir -p "$STAGING_DIR"
+exec >> "${STAGING_DIR}"/prefetch.log 2>&1
+echo $$ > "${STAGING_DIR}"/prefetch.pid
+renice -n 10 -p $$ > /dev/null
+
+JOBID=$(python3 "${REPLAY_CLIENT_DIR}"/parse_json.py job_id < "$JOB_FILE")
+START_BLOCK=$(python3 "${REPLAY_CLIENT_DIR}"/parse_json.py start_block_num < "$JOB_FILE")
+END_BLOCK=$(python3 "${REPLAY_CLIENT_DIR}"/parse_json.py end_block_num < "$JOB_FILE")
+SNAPSHOT_PATH=$(python3 "${REPLAY_CLIENT_DIR}"/parse_json.py snapshot_path < "$JOB_FILE")
+SPRING_VERSION=$(python3 "${REPLAY_CLIENT_DIR}"/parse_json.py spring_version < "$JOB_FILE")
+STAGED_DIR="${STAGING_DIR}/${JOBID:?}"
+
+function prefetch_failed() {
+  echo "$(date '+%Y-%m-%dT%H:%M:%S') prefetch of job ${JOBID} stopped: $1"
+  rm -rf "${STAGED_DIR:?}"
+  rm -f "${STAGING_DIR}"/prefetch.pid
+  exit 1
+}
+
+echo "$(date '+%Y-%m-%dT%H:%M:%S') prefetching job ${JOBID} blocks ${START_BLOCK} to ${END_BLOCK}"
+# one staged job at a time
+for STALE_DIR in "${STAGING_DIR}"/*/
+do
+  [ "${STALE_DIR%/}" != "${STAGED_DIR}" ] && rm -rf "${STALE_DIR:?}"
+done
+mkdir -p "${STAGED_DIR}"/snapshot "${STAGED_DIR}"/data/blocks "${STAGED_DIR}"/log
+
+# package goes to the host cache, nodeos in use is not replaced
+"${REPLAY_CLIENT_DIR}"/install-nodeos.sh "$SPRING_VERSION" "$ORCH_IP" "$ORCH_PORT" "$CACHE_DIR" download-only "$SLOT_HOME" \
+  || echo "Package not prefetched, downloaded at install"
+
+volsize=$(df -B 1073741824 /data | awk 'NR==2 {print $4}')
+if [ ${volsize:-0} -lt ${MIN_FREE_GB} ]; then
+  prefetch_failed "/data has ${volsize}GB free, needs ${MIN_FREE_GB}GB"
+fi
+
+if [ ${START_BLOCK} -gt 0 ] && [ -n "${SNAPSHOT_PATH}" ]; then
+  python3 "${REPLAY_CLIENT_DIR}"/fetch_artifact.py --source "${SNAPSHOT_PATH}" \
+    --output "${STAGED_DIR}"/snapshot/snapshot.bin --cache-dir "$CACHE_DIR" \
+    ${REGIONAL_CACHE:+--regional-cache "$REGIONAL_CACHE"} || prefetch_failed "snapshot download"
+fi
+
+"${REPLAY_CLIENT_DIR}"/manage_blocks_log.sh "${STAGED_DIR}" ${START_BLOCK} ${END_BLOCK} "${SNAPSHOT_PATH}" \
+  "$CACHE_DIR" "$REGIONAL_CACHE" || prefetch_failed "blocks log restore"
+
+touch "${STAGED_DIR}"/ready
+rm -f "${STAGING_DIR}"/prefetch.pid
+echo "$(date '+%Y-%m-%dT%H:%M:%S') staged job ${JOBID}"
@@ -1,14 +1,17 @@
 #!/usr/bin/env bash
 
 # cleans up data files and kills nodes enable replay to run again
+# only touches the given job slot, other slots keep running see slot_env.sh
 
 USER=${1:-"enf-replay"}
+SLOT=${2:-0}
+source "$(dirname "$0")"/slot_env.sh
 
-# aggressivley terminate nodeos
+# aggressivley terminate this slot's nodeos
 # start nicely then get mean
 for signal in 15 9
 do
-  PID=$(ps -u "${USER:?}" | grep nodeos | sed -e 's/^[[:space:]]*//' | cut -d" " -f1)
+  PID=$(pgrep -u "${USER:?}" -f -- "--data-dir ${NODEOS_DIR}/data/")
   if [ -n "$PID" ]; then
     kill -"${signal}" $PID
     sleep 5
@@ -16,8 +19,14 @@ do
 done
 
 # remove data
-rm -rf /data/nodeos
-rm /tmp/job.conf.json
+# /data/cache is kept for the next job, see artifact_cache.py
+# staging directory holds the next job's prefetched artifacts, see prefetch-next-job.sh
+# old data directory is deleted in the background, the next job starts right away
+[ -d "${NODEOS_DIR}" ] && mv "${NODEOS_DIR}" "${NODEOS_DIR}".old.$$
+nohup rm -rf "${NODEOS_DIR}".old.* > /dev/null 2>&1 &
+rm -f "${JOB_FILE}"
+# replaced by /data/cache
+rm -rf /data/artifacts
 
-# remove package
-rm /home/${USER:?}/*.deb
+# remove package, release packages are kept in /data/cache
+rm -f "${SLOT_HOME:?}"/*.deb
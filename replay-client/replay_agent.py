@@ -0,0 +1,356 @@
+"""Module runs a long lived agent making orchestration service calls for the replay scripts."""
+import argparse
+import json
+import os
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+import requests
+import job_operations
+import config_operations
+from http_transport import HttpTransport
+from log_follower import NodeosLogFollower, ProgressPacer
+
+#
+# Examples, bash talks to the agent over /dev/tcp see agent_client.sh
+# python3 replay_agent.py --host 10.0.0.5 --port 4000 --listen-port 4100 &
+# python3 replay_agent.py --host 10.0.0.5 --port 4000 --listen-port 4102 --slot 2 --slots 4 \
+#     --job-file /tmp/job-2.conf.json --next-job-file /tmp/next-job-2.conf.json &
+# source agent_client.sh && agent_call pop i-0123456789 "" ""
+# agent_call get job_id
+# agent_call follow /data/nodeos/log/nodeos.log /data/nodeos/log/superseded
+# agent_call hash started
+# agent_call cache 2 1 1073741824
+# agent_call prefetch i-0123456789 "322000001" "snapshot-2024-01-01-12-eos-v6-0322000000.bin.zst"
+#
+
+class ReplayAgent:
+    """
+    Keeps one pooled HTTP transport to the orchestration service and the config of the current job
+    Commands are one tab seperated line, the reply is one line
+    Replies are the HTTP status code for updates, the field value for `get`
+    `follow` reads nodeos.log in a background thread, reporting status and progress
+    `prefetch` leases the next job once the current one is nearly done
+    and starts prefetch-next-job.sh to stage its artifacts while nodeos finishes
+    `log` uploads a whole log in gzip chunks from its own process, the job is done by then
+    """
+    # commands acting on the claimed job
+    JOB_COMMANDS = ('status', 'progress', 'complete', 'error', 'config', 'log', 'follow', 'cache',
+        'prefetch')
+    # fraction of the current job's blocks processed before leasing the next job
+    PREFETCH_FRACTION = 0.9
+    # lease is renewed while the current job runs, it covers the gap to the next pop
+    LEASE_MINUTES = 60
+    # no job to lease, ask again after
+    RESERVE_RETRY_SECONDS = 300
+
+    # pylint: disable=too-many-arguments,too-many-instance-attributes
+    def __init__(self, host, port, max_tries=10, job_file='/tmp/job.conf.json',
+        next_job_file='/tmp/next-job.conf.json', slot=0, slots=1):
+        self.host = host
+        self.port = port
+        self.base_url = f"http://{host}:{port}"
+        self.max_tries = max_tries
+        self.job_file = job_file
+        # job slot this agent serves, hosts run one agent per slot
+        self.slot = slot
+        self.slots = slots
+        self.job = {}
+        self.next_job_file = next_job_file
+        self.prefetch_script = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+            'prefetch-next-job.sh')
+        self.job_operations_script = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+            'job_operations.py')
+        # (instance id, held strides, held snapshots, fraction) once armed
+        self.prefetch_request = None
+        self.next_job = {}
+        self.reserved_at = None
+        self.reserve_tried = None
+        self.stopping = False
+        # one HTTP call at a time, log follower thread shares the transport
+        self.lock = threading.Lock()
+        self.follower = None
+        self.stop_following = threading.Event()
+        # one session and circuit breaker for every call this agent makes
+        self.transport = HttpTransport()
+        job_operations.HTTP = self.transport
+        config_operations.HTTP = self.transport
+        self.commands = {
+            'ping': self.ping,
+            'pop': self.pop,
+            'get': self.get,
+            'status': self.status,
+            'progress': self.progress,
+            'complete': self.complete,
+            'error': self.error,
+            'config': self.config,
+            'log': self.log,
+            'cache': self.cache,
+            'prefetch': self.prefetch,
+            'follow': self.follow,
+            'unfollow': self.unfollow,
+            'head': self.head,
+            'hash': self.integrity_hash,
+            'stop': self.stop
+        }
+
+    def dispatch(self, line):
+        """run one command line, returns reply"""
+        command, *arguments = line.split('\t')
+        if command not in self.commands:
+            return f"ERROR unknown command {command}"
+        if command in ReplayAgent.JOB_COMMANDS and not self.job.get('job_id'):
+            return "ERROR no job"
+        if command in ('head', 'hash') and self.follower is None:
+            return "ERROR not following a log"
+        try:
+            with self.lock:
+                return str(self.commands[command](*arguments))
+        except (TypeError, ValueError):
+            return f"ERROR bad arguments for {command}"
+        except requests.exceptions.RequestException as error:
+            return f"ERROR {error}"
+
+    def ping(self):
+        """agent is up"""
+        return "pong"
+
+    def pop(self, instance_id, held_strides='', held_snapshots=''):
+        """claim next job, keep its config and write it to job file"""
+        result = job_operations.pop_job(self.base_url,
+            self.max_tries,
+            instance_id,
+            held_strides,
+            held_snapshots,
+            self.slot,
+            self.slots)
+        status_code = result.pop('status_code', None)
+        if status_code != 200 or 'job_id' not in result:
+            self.job = {}
+            return status_code
+        self.job = result
+        with open(self.job_file, 'w', encoding='utf-8') as file:
+            json.dump(self.job, file)
+        return status_code
+
+    def get(self, field):
+        """field from current job config, empty when missing"""
+        value = self.job.get(field)
+        return '' if value is None else value
+
+    def status(self, status):
+        """update status of current job"""
+        return job_operations.update_job_status(self.base_url,
+            self.max_tries, self.job['job_id'], status)['status_code']
+
+    def progress(self, block_processed):
+        """report last block processed, 410 means another host finished the job"""
+        return job_operations.update_job_progress(self.base_url,
+            self.max_tries, self.job['job_id'], block_processed)['status_code']
+
+    def complete(self, block_processed, integrity_hash, end_time=None):
+        """mark current job complete"""
+        if not end_time:
+            end_time = datetime.now().strftime('%Y-%m-%dT%H:%M:%S')
+        return job_operations.set_job_completed(self.base_url,
+            self.max_tries, self.job['job_id'], block_processed, end_time,
+            integrity_hash)['status_code']
+
+    def error(self, error_message):
+        """mark current job failed"""
+        return job_operations.update_error_message(self.base_url,
+            self.max_tries, self.job['job_id'], error_message)['status_code']
+
+    def config(self, end_block_num, integrity_hash):
+        """report integrity hash for end block, version and run come from the current job"""
+        return config_operations.update_by_end_block(self.base_url,
+            self.max_tries,
+            end_block_num,
+            integrity_hash,
+            self.job.get('spring_version'),
+            self.job['job_id'])['status_code']
+
+    def log(self, log_type, log_path):
+        """upload wrapper or nodeos log of current job in the background, outlives the agent"""
+        if log_type not in ('wrapper', 'nodeos'):
+            return f"ERROR unknown log type {log_type}"
+        subprocess.Popen([sys.executable, self.job_operations_script, # pylint: disable=consider-using-with
+            '--host', self.host, '--port', str(self.port), '--max-tries', str(self.max_tries),
+            '--operation', f"{log_type}-error-log", '--job-id', str(self.job['job_id']),
+            '--log', log_path],
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            start_new_session=True)
+        return 202
+
+    def cache(self, hits, misses, hit_bytes='0'):
+        """report artifacts reused from the host cache for current job"""
+        return job_operations.patch_job(self.base_url, self.max_tries, self.job['job_id'],
+            {'cache_hits': int(hits), 'cache_misses': int(misses),
+            'cache_hit_bytes': int(hit_bytes)})['status_code']
+
+    def prefetch(self, instance_id, held_strides='', held_snapshots='',
+        fraction=str(PREFETCH_FRACTION)):
+        """lease and stage the next job once `fraction` of current job's blocks are processed"""
+        self.prefetch_request = (instance_id, held_strides, held_snapshots, float(fraction))
+        return "armed"
+
+    def check_prefetch(self, head_block):
+        """lease the next job when due, keep an existing lease from expiring"""
+        if self.prefetch_request is None:
+            return
+        now = time.monotonic()
+        instance_id, held_strides, held_snapshots, fraction = self.prefetch_request
+        if self.next_job:
+            # renew at half the lease
+            if now - self.reserved_at > ReplayAgent.LEASE_MINUTES * 60 / 2:
+                status_code = job_operations.renew_lease(self.base_url, 1,
+                    self.next_job['job_id'], instance_id, ReplayAgent.LEASE_MINUTES, self.slot)['status_code']
+                if status_code == 200:
+                    self.reserved_at = now
+                elif status_code == 412:
+                    print(f"Lease on next job {self.next_job['job_id']} lost", file=sys.stderr)
+                    self.reserved_at = now
+            return
+        start_block = int(self.job['start_block_num'])
+        end_block = int(self.job['end_block_num'])
+        if head_block - start_block < fraction * (end_block - start_block):
+            return
+        if self.reserve_tried is not None and now - self.reserve_tried < ReplayAgent.RESERVE_RETRY_SECONDS:
+            return
+        self.reserve_tried = now
+        result = job_operations.reserve_job(self.base_url, 1, instance_id, ReplayAgent.LEASE_MINUTES,
+            held_strides, held_snapshots, self.slot, self.slots)
+        if result.pop('status_code', None) != 200 or 'job_id' not in result:
+            return
+        self.next_job = result
+        self.reserved_at = now
+        with open(self.next_job_file, 'w', encoding='utf-8') as file:
+            json.dump(self.next_job, file)
+        # own session, keeps running after this agent stops
+        subprocess.Popen([self.prefetch_script, self.next_job_file, self.host, str(self.port), # pylint: disable=consider-using-with
+            str(self.slot)],
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            start_new_session=True)
+
+    def follow(self, log_path, superseded_path, poll_seconds='5'):
+        """start following nodeos log, replaces any previous follower"""
+        self.stop_following.set()
+        self.stop_following = threading.Event()
+        self.follower = NodeosLogFollower(log_path)
+        total_blocks = int(self.job['end_block_num']) - int(self.job['start_block_num'])
+        pacer = ProgressPacer(total_blocks)
+        threading.Thread(target=self.follow_loop,
+            args=(self.follower, pacer, superseded_path, float(poll_seconds), self.stop_following),
+            daemon=True).start()
+        return "following"
+
+    # pylint: disable=too-many-arguments
+    def follow_loop(self, follower, pacer, superseded_path, poll_seconds, stop_following):
+        """WORKING once snapshot loaded hash is logged, then progress as pacer allows
+        on 410 another host finished the job, mark superseded and stop nodeos"""
+        loading = True
+        while not stop_following.wait(poll_seconds):
+            with self.lock:
+                if stop_following.is_set():
+                    return
+                follower.poll()
+                if loading:
+                    if follower.integrity_hash('started'):
+                        loading = False
+                        self.status('WORKING')
+                    continue
+                now = time.monotonic()
+                head_block = follower.head_block()
+                if not pacer.due(now, head_block):
+                    continue
+                status_code = self.progress(head_block)
+                pacer.reported(now, head_block)
+                if status_code == 410:
+                    print(f"Job {self.job['job_id']} superseded by another host, stopping nodeos",
+                        file=sys.stderr)
+                    with open(superseded_path, 'w', encoding='utf-8'):
+                        pass
+                    subprocess.run(['pkill', '-u', str(os.getuid()), '-x', 'nodeos'], check=False)
+                    return
+                self.check_prefetch(head_block)
+
+    def unfollow(self):
+        """stop reporting progress, log can still be read with head and hash"""
+        self.stop_following.set()
+        return "stopped following"
+
+    def head(self):
+        """most recent block in log, empty when not found"""
+        self.follower.poll()
+        head_block = self.follower.head_block()
+        return '' if head_block is None else head_block
+
+    def integrity_hash(self, hash_type):
+        """integrity hash logged when chain database `started` or `stopped`, empty when not found"""
+        self.follower.poll()
+        return self.follower.integrity_hash(hash_type) or ''
+
+    def stop(self):
+        """exit after replying"""
+        self.stop_following.set()
+        self.stopping = True
+        return "stopped"
+
+class AgentHandler(socketserver.StreamRequestHandler):
+    """one command per connection"""
+    def handle(self):
+        line = self.rfile.readline().decode('utf-8').rstrip('\r\n')
+        reply = self.server.agent.dispatch(line)
+        self.wfile.write((reply.replace('\n', ' ') + '\n').encode('utf-8'))
+
+class AgentServer(socketserver.TCPServer):
+    """single threaded, commands are handled in order"""
+    allow_reuse_address = True
+
+    def __init__(self, listen_port, agent):
+        self.agent = agent
+        super().__init__(('127.0.0.1', listen_port), AgentHandler)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='agent keeping a pooled connection to the orchestration service'
+    )
+    parser.add_argument('--port',
+        type=int, default=4000,
+        help='Port for web service, default 4000')
+    parser.add_argument('--host',
+        type=str, default='127.0.0.1',
+        help='Listening service name or ip, default 127.0.0.1')
+    parser.add_argument('--listen-port',
+        type=int, default=4100,
+        help='Local port the agent listens on, default 4100')
+    parser.add_argument('--max-tries',
+        type=int, default=10,
+        help='Number of attemps when HTTP call fails, default 10')
+    parser.add_argument('--next-job-file',
+        type=str, default='/tmp/next-job.conf.json',
+        help='where to write the config of the leased next job, default /tmp/next-job.conf.json')
+    parser.add_argument('--job-file',
+        type=str, default='/tmp/job.conf.json',
+        help='where to write the config of the claimed job, default /tmp/job.conf.json')
+    parser.add_argument('--slot',
+        type=int, default=0,
+        help='job slot on the host served by this agent, default 0')
+    parser.add_argument('--slots',
+        type=int, default=1,
+        help='job slots on the host, default 1')
+
+    args = parser.parse_args()
+    if args.max_tries < 1:
+        sys.exit("Error max-tries must be greater then zero")
+    if args.slot < 0 or args.slot >= args.slots:
+        sys.exit("Error slot must be between zero and slots - 1")
+
+    replay_agent = ReplayAgent(args.host, args.port, args.max_tries, args.job_file,
+        args.next_job_file, args.slot, args.slots)
+    with AgentServer(args.listen_port, replay_agent) as server:
+        while not replay_agent.stopping:
+            server.handle_request()
@@ -14,4 +14,14 @@ if [ -z "${ORCH_IP}" ]; then
   exit 1
 fi
 
-/home/${USER}/replay-test/replay-client/start-nodeos-run-replay.sh ${ORCH_IP} >> /home/${USER}/last-replay.log 2>&1
+# one replay per job slot, slots already running a job are skipped
+# see slot_env.sh for the number of slots and each slot's paths
+REPLAY_CLIENT_DIR=/home/${USER}/replay-test/replay-client
+source "${REPLAY_CLIENT_DIR}"/slot_env.sh
+for ((SLOT=0; SLOT<SLOTS; SLOT++)); do
+  (
+    source "${REPLAY_CLIENT_DIR}"/slot_env.sh
+    [ -f "${LOCK_FILE}" ] && exit 0
+    "${REPLAY_CLIENT_DIR}"/start-nodeos-run-replay.sh ${ORCH_IP} 4000 ${SLOT} >> "${REPLAY_LOG}" 2>&1
+  ) &
+done
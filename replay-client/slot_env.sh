@@ -0,0 +1,32 @@
+#!/usr/bin/env bash
+
+# sourced by replay scripts, sets paths and ports for one job slot
+# hosts run SLOTS jobs at once, each slot has its own nodeos directory, ports and agent
+# slot 0 keeps the paths of a host running one job
+# SLOT - job slot, 0 to SLOTS - 1
+# SLOTS_FILE - number of job slots on this host, defaults to 1
+
+SLOT=${SLOT:-0}
+SLOTS_FILE=/home/enf-replay/replay-slots.txt
+SLOTS=$(cat "${SLOTS_FILE}" 2> /dev/null)
+[[ "${SLOTS}" =~ ^[1-9][0-9]*$ ]] || SLOTS=1
+if [ "${SLOT}" -eq 0 ]; then
+  SLOT_SUFFIX=""
+else
+  SLOT_SUFFIX="-${SLOT}"
+fi
+NODEOS_DIR=/data/nodeos${SLOT_SUFFIX}
+# next job's artifacts staged while this slot's job finishes, see prefetch-next-job.sh
+STAGING_DIR=/data/staging${SLOT_SUFFIX}
+LOCK_FILE=/tmp/replay${SLOT_SUFFIX}.lock
+JOB_FILE=/tmp/job${SLOT_SUFFIX}.conf.json
+NEXT_JOB_FILE=/tmp/next-job${SLOT_SUFFIX}.conf.json
+REPLAY_LOG=/home/enf-replay/last-replay${SLOT_SUFFIX}.log
+# nodeos package is downloaded and installed under slot home, slots may run different versions
+SLOT_HOME=${HOME}${SLOT_SUFFIX:+/slot${SLOT_SUFFIX}}
+# local port for replay_agent.py
+AGENT_PORT=$((4100 + SLOT))
+NODEOS_HTTP_PORT=$((8888 + SLOT))
+NODEOS_P2P_PORT=$((9876 + SLOT))
+# host artifact cache counts hits per slot, see artifact_cache.py
+export REPLAY_SLOT=${SLOT}
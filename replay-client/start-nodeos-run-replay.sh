@@ -9,7 +9,7 @@
 # 5) replay transactions to specified block height from blocks.log or networked peers and terminates
 # 6) restart nodeos read-only mode to get final integrity hash
 # 7) http POST completed status for configured block range
-# Communicates to orchestration service via HTTP
+# Communicates to orchestration service via HTTP through replay_agent.py
 # Dependency on aws client, python3, curl, and large volume under /data
 #
 # Final status report available via HTTP showing all good
@@ -22,11 +22,22 @@
 
 ORCH_IP="${1:-127.0.0.1}"
 ORCH_PORT="${2:-4000}"
+# hosts run one copy of this script per job slot, see replay_wrapper_script.sh
+SLOT="${3:-0}"
 
 REPLAY_CLIENT_DIR=/home/enf-replay/replay-test/replay-client
 CONFIG_DIR=/home/enf-replay/replay-test/config
-NODEOS_DIR=/data/nodeos
-LOCK_FILE=/tmp/replay.lock
+# nodeos directory, staging directory, lock, job files, log and ports of this slot
+source "${REPLAY_CLIENT_DIR:?}"/slot_env.sh
+# snapshots, blocks logs and nodeos packages kept between jobs, not removed by cleanup
+# least recently used artifacts are evicted when space is low, see artifact_cache.py
+CACHE_DIR=/data/cache
+# optional regional cache service shared by hosts, snapshots and blocks logs are read through it
+# see orchestration-service/regional_cache.py, empty reads s3 directly
+REGIONAL_CACHE=$(cat /home/enf-replay/regional-cache-url.txt 2> /dev/null)
+# every slot's nodeos listens on its own ports
+SLOT_ARGS="--http-server-address 127.0.0.1:${NODEOS_HTTP_PORT} --p2p-listen-endpoint 127.0.0.1:${NODEOS_P2P_PORT}"
+source "${REPLAY_CLIENT_DIR:?}"/agent_client.sh
 
 if [ -f "$LOCK_FILE" ]; then
   LOCKED_BY_PID=$(cat "$LOCK_FILE")
@@ -38,18 +49,22 @@ fi
 
 function trap_exit() {
   ERROR_MSG=${1:-"NA"}
-  if [ -n "${BACKGROUND_STATUS_PID}" ]; then
-    kill "${BACKGROUND_STATUS_PID}"
+  if [ -n "${SNAPSHOT_FETCH_PID}" ]; then
+    kill "${SNAPSHOT_FETCH_PID}"
   fi
   if [ -n "${BACKGROUND_NODEOS_PID}" ]; then
     kill "${BACKGROUND_NODEOS_PID}"
   fi
   [ -f "$LOCK_FILE" ] && rm "$LOCK_FILE"
   if [ -n "${JOBID}" ]; then
-    python3 "${REPLAY_CLIENT_DIR:?}"/job_operations.py --host ${ORCH_IP} --port ${ORCH_PORT} --operation update-error --error-message "$ERROR_MSG" --job-id ${JOBID}
-    python3 "${REPLAY_CLIENT_DIR:?}"/job_operations.py --host ${ORCH_IP} --port 80 --operation wrapper-error-log --log /home/enf-replay/last-replay.log --job-id ${JOBID}
-    python3 "${REPLAY_CLIENT_DIR:?}"/job_operations.py --host ${ORCH_IP} --port 80 --operation nodeos-error-log --log "${NODEOS_DIR}"/log/nodeos.log --job-id ${JOBID}
+    # agent may be the reason we are exiting, fall back to a direct call
+    if ! agent_call error "$ERROR_MSG" 2> /dev/null; then
+      python3 "${REPLAY_CLIENT_DIR:?}"/job_operations.py --host ${ORCH_IP} --port ${ORCH_PORT} --operation update-error --error-message "$ERROR_MSG" --job-id ${JOBID}
+    fi
+    agent_call log wrapper "${REPLAY_LOG}" 2> /dev/null
+    agent_call log nodeos "${NODEOS_DIR}"/log/nodeos.log 2> /dev/null
   fi
+  agent_stop
   echo "Caught signal or detected error exiting"
   exit 127
 }
@@ -76,42 +91,86 @@ fi
 aws_instance_id=$(curl http://169.254.169.254/latest/meta-data/instance-id)
 
 ## cleanup previous runs ##
-"${REPLAY_CLIENT_DIR:?}"/replay-node-cleanup.sh "$USER"
+"${REPLAY_CLIENT_DIR:?}"/replay-node-cleanup.sh "$USER" "$SLOT"
 
 ## data volume must be large enough ##
 volsize=$(df -B 1073741824 /data | awk 'NR==2 {print $4}')
+if [ ${volsize:-0} -lt 40 ] && [ -d "$CACHE_DIR" ]; then
+  echo "Low on space evicting least recently used artifacts from previous jobs"
+  python3 "${REPLAY_CLIENT_DIR:?}"/artifact_cache.py --cache-dir "$CACHE_DIR" evict --min-free-gb 40
+  volsize=$(df -B 1073741824 /data | awk 'NR==2 {print $4}')
+fi
 if [ ${volsize:-0} -lt 40 ]; then
   echo "/data volume does not exist or does not have 40Gb free space"
   trap_exit "/data volume does not exist or does not have 40Gb free space"
 fi
 
 ## directory setup ##
-"${REPLAY_CLIENT_DIR:?}"/create-nodeos-dir-struct.sh "${CONFIG_DIR}"
+"${REPLAY_CLIENT_DIR:?}"/create-nodeos-dir-struct.sh "${CONFIG_DIR}" "${NODEOS_DIR}"
 
 #################
 # 2) http GET job details from orchestration service, incls. block range
 #################
 echo "Step 2 of 7: Getting job details from orchestration service"
-python3 "${REPLAY_CLIENT_DIR:?}"/job_operations.py --host ${ORCH_IP} --port ${ORCH_PORT} --operation pop --instance-id "${aws_instance_id}" > /tmp/job.conf.json
-
-# if json result is empty failed to aquire job
-if [[ ! -e "/tmp/job.conf.json" || ! -s "/tmp/job.conf.json" ]]; then
-  echo "Failed to aquire job"
+## agent keeps one connection to orchestration service for all calls in this job ##
+if ! agent_start ${ORCH_IP} ${ORCH_PORT}; then
+  echo "Failed to start replay agent"
+  trap_exit "Failed to start replay agent"
+fi
+## report artifacts from previous jobs, orchestrator prefers jobs reusing them ##
+CACHED=$(python3 "${REPLAY_CLIENT_DIR:?}"/artifact_cache.py --cache-dir "$CACHE_DIR" list | xargs -r -n1 basename)
+HELD_STRIDES=$(echo "$CACHED" | grep '^blocks-.*\.log\.zst$' | cut -d'-' -f2 | paste -s -d',')
+HELD_SNAPSHOTS=$(echo "$CACHED" | grep '^snapshot-.*\.zst$' | paste -s -d',')
+# count cache hits for this job only
+python3 "${REPLAY_CLIENT_DIR:?}"/artifact_cache.py --cache-dir "$CACHE_DIR" stats --reset > /dev/null
+# agent writes job details to this slot's job file and keeps them for get calls
+POP_STATUS=$(agent_call pop "${aws_instance_id}" "${HELD_STRIDES}" "${HELD_SNAPSHOTS}")
+
+# anything other then 200 failed to aquire job
+if [ "$POP_STATUS" != "200" ]; then
+  echo "Failed to aquire job ${POP_STATUS}"
   trap_exit "Failed to aquire job"
 fi
 echo "Received job details processing..."
 
-## Parse from json ###
-JOBID=$(cat /tmp/job.conf.json | python3 ${REPLAY_CLIENT_DIR}/parse_json.py "job_id")
-START_BLOCK=$(cat /tmp/job.conf.json | python3 ${REPLAY_CLIENT_DIR}/parse_json.py "start_block_num")
-END_BLOCK=$(cat /tmp/job.conf.json | python3 ${REPLAY_CLIENT_DIR}/parse_json.py "end_block_num")
-REPLAY_SLICE_ID=$(cat /tmp/job.conf.json | python3 ${REPLAY_CLIENT_DIR}/parse_json.py "replay_slice_id")
-SNAPSHOT_PATH=$(cat /tmp/job.conf.json | python3 ${REPLAY_CLIENT_DIR}/parse_json.py "snapshot_path")
-STORAGE_TYPE=$(cat /tmp/job.conf.json | python3 ${REPLAY_CLIENT_DIR}/parse_json.py "storage_type")
-EXPECTED_INTEGRITY_HASH=$(cat /tmp/job.conf.json | python3 ${REPLAY_CLIENT_DIR}/parse_json.py "expected_integrity_hash")
-SPRING_VERSION=$(cat /tmp/job.conf.json | python3 ${REPLAY_CLIENT_DIR}/parse_json.py "spring_version")
+## Read job details from agent ###
+JOBID=$(agent_call get job_id)
+START_BLOCK=$(agent_call get start_block_num)
+END_BLOCK=$(agent_call get end_block_num)
+REPLAY_SLICE_ID=$(agent_call get replay_slice_id)
+SNAPSHOT_PATH=$(agent_call get snapshot_path)
+STORAGE_TYPE=$(agent_call get storage_type)
+EXPECTED_INTEGRITY_HASH=$(agent_call get expected_integrity_hash)
+SPRING_VERSION=$(agent_call get spring_version)
 # get network/source needed to find S3 Files (eg "mainnet" vs "jungle")
 SOURCE_TYPE=$(dirname "$SNAPSHOT_PATH"  | sed 's#s3://##' | cut -d'/' -f2)
+
+## use snapshot and blocks log prefetched for this job while the previous job finished ##
+STAGED=0
+PREFETCH_PID=$(cat "${STAGING_DIR}"/prefetch.pid 2> /dev/null)
+if [ -n "${PREFETCH_PID}" ] && kill -0 "${PREFETCH_PID}" 2> /dev/null; then
+  if [ -d "${STAGING_DIR}/${JOBID}" ]; then
+    echo "Waiting on prefetch of job ${JOBID}"
+    for ((i=1; i<=720; i++)); do
+      kill -0 "${PREFETCH_PID}" 2> /dev/null || break
+      sleep 5
+    done
+  fi
+  # prefetching a job this host did not get, or taking too long
+  kill -- -"${PREFETCH_PID}" 2> /dev/null
+fi
+if [ -f "${STAGING_DIR}/${JOBID}"/ready ]; then
+  echo "Using snapshot and blocks log prefetched for job ${JOBID}"
+  mv "${STAGING_DIR}/${JOBID}"/snapshot/* "${NODEOS_DIR}"/snapshot/ 2> /dev/null
+  mv "${STAGING_DIR}/${JOBID}"/data/blocks "${NODEOS_DIR}"/data/
+  STAGED=1
+fi
+if [ -d "${STAGING_DIR}" ]; then
+  cp "${STAGING_DIR}"/prefetch.log "${NODEOS_DIR}"/log/ 2> /dev/null
+  # staged jobs this host did not get are removed in the background
+  mv "${STAGING_DIR}" "${STAGING_DIR}".old.$$
+  nohup rm -rf "${STAGING_DIR}".old.* > /dev/null 2>&1 &
+fi
 # fetch any command line options passed in from API or UI
 CONFIG_ARGS_PROVIDED=0
 curl -L -f --output ${CONFIG_DIR}/user_provided_cmd_line.conf http://${ORCH_IP}/usernodeosconfig/user_provided_cmd_line.conf
@@ -120,19 +179,17 @@ if [ -s ${CONFIG_DIR}/user_provided_cmd_line.conf ]; then
     CONFIG_ARGS=$(cat ${CONFIG_DIR}/user_provided_cmd_line.conf)
 fi
 
-#################
-# 3) local non-priv install of nodeos
-#################
-echo "Step 3 of 7: local non-priv install of nodeos"
-"${REPLAY_CLIENT_DIR:?}"/install-nodeos.sh $SPRING_VERSION $ORCH_IP $ORCH_PORT
-PATH=${PATH}:${HOME}/nodeos/usr/bin:${HOME}/nodeos/usr/local/bin
-export PATH
-
-## copy snapshot ##
-if [ $STORAGE_TYPE = "s3" ]; then
-  if [ $START_BLOCK -gt 0 ] && [ -n "${SNAPSHOT_PATH}" ]; then
-    echo "Copying snapshot to localhost"
-    aws s3 cp "${SNAPSHOT_PATH}" "${NODEOS_DIR}"/snapshot/snapshot.bin.zst > /dev/null 2>&1
+## fetch snapshot in background, streams into zstd while nodeos installs and blocks log restores ##
+## file storage type reads local file:// paths, used for testing ##
+if [ $STORAGE_TYPE = "s3" ] || [ $STORAGE_TYPE = "file" ]; then
+  if [ $STAGED -eq 1 ]; then
+    echo "Snapshot prefetched"
+  elif [ $START_BLOCK -gt 0 ] && [ -n "${SNAPSHOT_PATH}" ]; then
+    echo "Streaming snapshot to localhost, from cache when held"
+    python3 "${REPLAY_CLIENT_DIR:?}"/fetch_artifact.py --source "${SNAPSHOT_PATH}" \
+      --output "${NODEOS_DIR}"/snapshot/snapshot.bin --cache-dir "$CACHE_DIR" \
+      ${REGIONAL_CACHE:+--regional-cache "$REGIONAL_CACHE"} &
+    SNAPSHOT_FETCH_PID=$!
   else
     echo "Warning: No snapshot provided in config or start block is zero (0)"
   fi
@@ -141,50 +198,68 @@ else
   trap_exit "Unknown snapshot type ${STORAGE_TYPE}"
 fi
 
+#################
+# 3) local non-priv install of nodeos
+#################
+echo "Step 3 of 7: local non-priv install of nodeos"
+"${REPLAY_CLIENT_DIR:?}"/install-nodeos.sh $SPRING_VERSION $ORCH_IP $ORCH_PORT "$CACHE_DIR" "" "$SLOT_HOME"
+PATH=${PATH}:${SLOT_HOME}/nodeos/usr/bin:${SLOT_HOME}/nodeos/usr/local/bin
+export PATH
+
 # restore blocks.log from cloud storage
-echo "Restoring Blocks.log from Cloud Storage"
-"${REPLAY_CLIENT_DIR:?}"/manage_blocks_log.sh "$NODEOS_DIR" $START_BLOCK $END_BLOCK "${SNAPSHOT_PATH}"
-if [ $? -ne 0 ]; then
-  echo "Failed to restore blocks.log"
-  trap_exit "Failed to restore blocks.log"
+if [ $STAGED -eq 1 ]; then
+  echo "Blocks.log prefetched"
+else
+  echo "Restoring Blocks.log from Cloud Storage"
+  "${REPLAY_CLIENT_DIR:?}"/manage_blocks_log.sh "$NODEOS_DIR" $START_BLOCK $END_BLOCK "${SNAPSHOT_PATH}" "$CACHE_DIR" "$REGIONAL_CACHE"
+  if [ $? -ne 0 ]; then
+    echo "Failed to restore blocks.log"
+    trap_exit "Failed to restore blocks.log"
+  fi
 fi
 
 ## when start block 0 no snapshot to process ##
-if [ $START_BLOCK -gt 0 ] && [ -f "${NODEOS_DIR}"/snapshot/snapshot.bin.zst ]; then
-  echo "Unzip snapshot"
-  zstd --decompress "${NODEOS_DIR}"/snapshot/snapshot.bin.zst > /dev/null 2>&1
+if [ -n "${SNAPSHOT_FETCH_PID}" ]; then
+  echo "Waiting on snapshot download"
+  wait "${SNAPSHOT_FETCH_PID}"
   # sometimes compression format is bad error out on failure
   if [ $? -ne 0 ]; then
-    echo "Failed to unzip snapshot"
+    SNAPSHOT_FETCH_PID=""
+    echo "Failed to download and unzip snapshot"
     trap_exit "Failed to unzip snapshot"
   fi
+  SNAPSHOT_FETCH_PID=""
 fi
 
+## report artifacts reused from the cache ##
+read -r CACHE_HITS CACHE_MISSES CACHE_HIT_BYTES < <(python3 "${REPLAY_CLIENT_DIR:?}"/artifact_cache.py --cache-dir "$CACHE_DIR" stats)
+echo "Artifact cache hits ${CACHE_HITS} misses ${CACHE_MISSES}"
+agent_call cache "${CACHE_HITS:-0}" "${CACHE_MISSES:-0}" "${CACHE_HIT_BYTES:-0}"
+
 ## update status that snapshot is loading ##
 echo "Job status updated to LOADING_SNAPSHOT"
-python3 ${REPLAY_CLIENT_DIR}/job_operations.py --host ${ORCH_IP} --port ${ORCH_PORT} \
-        --operation update-status --status "LOADING_SNAPSHOT" --job-id ${JOBID}
+agent_call status LOADING_SNAPSHOT
 
 #################
 # 4) starts nodeos loads the snapshot, syncs to end block, and terminates
 #################
 echo "Step 4 of 7: Start nodeos, load snapshot, and sync till ${END_BLOCK}"
 
-## update status when snapshot is complete: updates last block processed ##
-## Background process grep logs on fixed interval secs ##
-${REPLAY_CLIENT_DIR}/background_status_update.sh $ORCH_IP $ORCH_PORT $JOBID "$NODEOS_DIR" "$REPLAY_CLIENT_DIR" &
-BACKGROUND_STATUS_PID=$!
-
-sleep 5
+## agent follows nodeos log: WORKING once snapshot is loaded, then last block processed ##
+## stops nodeos and creates superseded file when another host finished this job ##
+agent_call follow "${NODEOS_DIR}"/log/nodeos.log "${NODEOS_DIR}"/log/superseded
+## near the end agent leases the next job and stages its artifacts, see prefetch-next-job.sh ##
+agent_call prefetch "${aws_instance_id}" "${HELD_STRIDES}" "${HELD_SNAPSHOTS}"
 
 ## special treament for sync from genesis, start block 0 ##
 if [ $START_BLOCK == 0 ]; then
-  aws s3 cp s3://chicken-dance/"$SOURCE_TYPE"/"$SOURCE_TYPE"-genesis.json /data/nodeos/genesis.json > /dev/null 2>&1
+  aws s3 cp s3://chicken-dance/"$SOURCE_TYPE"/"$SOURCE_TYPE"-genesis.json "${NODEOS_DIR}"/genesis.json > /dev/null 2>&1
   
   if [ ${CONFIG_ARGS_PROVIDED} == 1 ]; then 
     nodeos \
        --genesis-json "${NODEOS_DIR}"/genesis.json \
        --data-dir "${NODEOS_DIR}"/data/ \
+       ${SLOT_ARGS} \
        ${CONFIG_ARGS} \
        --p2p-peer-address eos.seed.eosnation.io:9876 \
        --terminate-at-block ${END_BLOCK} \
@@ -195,6 +270,7 @@ if [ $START_BLOCK == 0 ]; then
     nodeos \
        --genesis-json "${NODEOS_DIR}"/genesis.json \
        --data-dir "${NODEOS_DIR}"/data/ \
+       ${SLOT_ARGS} \
        --config "${CONFIG_DIR}"/default-config.ini \
        --terminate-at-block ${END_BLOCK} \
        --integrity-hash-on-start \
@@ -206,6 +282,7 @@ else
       nodeos \
       --snapshot "${NODEOS_DIR}"/snapshot/snapshot.bin \
       --data-dir "${NODEOS_DIR}"/data/ \
+      ${SLOT_ARGS} \
       ${CONFIG_ARGS} \
       --p2p-peer-address eos.seed.eosnation.io:9876 \
       --terminate-at-block ${END_BLOCK} \
@@ -216,6 +293,7 @@ else
       nodeos \
       --snapshot "${NODEOS_DIR}"/snapshot/snapshot.bin \
       --data-dir "${NODEOS_DIR}"/data/ \
+      ${SLOT_ARGS} \
       --config "${CONFIG_DIR}"/default-config.ini \
       --terminate-at-block ${END_BLOCK} \
       --integrity-hash-on-start \
@@ -224,17 +302,25 @@ else
     fi
 fi
 
-kill $BACKGROUND_STATUS_PID
-sleep 5
+agent_call unfollow
+
+## a speculative copy of this job finished first, nothing to report ##
+if [ -f "${NODEOS_DIR}"/log/superseded ]; then
+  echo "Job ${JOBID} superseded by another host, exiting"
+  agent_stop
+  [ -f "$LOCK_FILE" ] && rm "$LOCK_FILE"
+  exit 0
+fi
 
 #################
 # 5) get replay details from logs
 #################
 echo "Step 5 of 7: Reached End Block ${END_BLOCK}, getting replay details from logs"
 END_TIME=$(date '+%Y-%m-%dT%H:%M:%S')
-START_BLOCK_ACTUAL_INTEGRITY_HASH=$("${REPLAY_CLIENT_DIR:?}"/get_integrity_hash_from_log.sh "started" "$NODEOS_DIR")
+# agent parsed hashes as they were logged, no rescan of the log
+START_BLOCK_ACTUAL_INTEGRITY_HASH=$(agent_call hash started)
 
-END_BLOCK_ACTUAL_INTEGRITY_HASH=$("${REPLAY_CLIENT_DIR:?}"/get_integrity_hash_from_log.sh "stopped" "$NODEOS_DIR")
+END_BLOCK_ACTUAL_INTEGRITY_HASH=$(agent_call hash stopped)
 
 if [[ "$(nodeos -v | grep -ic v[45])" == '1' ]]; then
   #################
@@ -247,12 +333,13 @@ if [[ "$(nodeos -v | grep -ic v[45])" == '1' ]]; then
   # not passing through user command line options for this ${CONFIG_ARGS} operation 
   nodeos \
      --data-dir "${NODEOS_DIR}"/data/ \
+     ${SLOT_ARGS} \
      --config "${CONFIG_DIR}"/readonly-config.ini \
      &> "${NODEOS_DIR}"/log/nodeos-readonly.log &
   BACKGROUND_NODEOS_PID=$!
   sleep 20
 
-  END_BLOCK_ACTUAL_INTEGRITY_HASH=$(curl -s http://127.0.0.1:8888/v1/producer/get_integrity_hash | python3 ${REPLAY_CLIENT_DIR}/parse_json.py "integrity_hash")
+  END_BLOCK_ACTUAL_INTEGRITY_HASH=$(curl -s http://127.0.0.1:${NODEOS_HTTP_PORT}/v1/producer/get_integrity_hash | python3 ${REPLAY_CLIENT_DIR}/parse_json.py "integrity_hash")
 
   # terminate read only nodeos in background
   kill $BACKGROUND_NODEOS_PID
@@ -268,9 +355,7 @@ echo "$END_BLOCK_ACTUAL_INTEGRITY_HASH" > "$NODEOS_DIR"/log/end_integrity_hash.t
 # POST back to config with expected integrity hash
 if [ $START_BLOCK -gt 0 ]; then
   echo "Updating Configuration with expected integrity hash Block $START_BLOCK Hash $START_BLOCK_ACTUAL_INTEGRITY_HASH With Version $SPRING_VERSION"
-  python3 "${REPLAY_CLIENT_DIR:?}"/config_operations.py --host ${ORCH_IP} --port ${ORCH_PORT} \
-    --end-block-num "$START_BLOCK" --integrity-hash "$START_BLOCK_ACTUAL_INTEGRITY_HASH" \
-    --spring-version "$SPRING_VERSION"
+  agent_call config "$START_BLOCK" "$START_BLOCK_ACTUAL_INTEGRITY_HASH"
 else
   echo "Processing from genesis no expected integrity hash to update"
 fi
@@ -279,18 +364,15 @@ fi
 # 7) http POST completed status for configured block range
 #################
 echo "Step 7 of 7: Sending COMPLETE status"
-python3 "${REPLAY_CLIENT_DIR:?}"/job_operations.py --host ${ORCH_IP} --port ${ORCH_PORT} \
-    --operation complete --job-id ${JOBID} \
-    --block-processed ${END_BLOCK} \
-    --end-time "${END_TIME}" \
-    --integrity-hash "${END_BLOCK_ACTUAL_INTEGRITY_HASH}"
+agent_call complete "${END_BLOCK}" "${END_BLOCK_ACTUAL_INTEGRITY_HASH}" "${END_TIME}"
 
 [ -f "$LOCK_FILE" ] && rm "$LOCK_FILE"
 
-# upload logs and clean out old logs
-python3 "${REPLAY_CLIENT_DIR:?}"/job_operations.py --host ${ORCH_IP} --port 80 --operation wrapper-error-log --log /home/enf-replay/last-replay.log --job-id ${JOBID}
-python3 "${REPLAY_CLIENT_DIR:?}"/job_operations.py --host ${ORCH_IP} --port 80 --operation nodeos-error-log --log "${NODEOS_DIR}"/log/nodeos.log --job-id ${JOBID}
+# clean out old logs, then upload whole logs in the background
 mkdir /data/previous-${START_BLOCK}
 cp "${NODEOS_DIR}"/log/nodeos.log /data/previous-${START_BLOCK}
-mv ~/last-replay.log /data/previous-${START_BLOCK}
-mv /tmp/job.conf.json /data/previous-${START_BLOCK}
+mv "${REPLAY_LOG}" /data/previous-${START_BLOCK}
+mv "${JOB_FILE}" /data/previous-${START_BLOCK}
+agent_call log wrapper /data/previous-${START_BLOCK}/"$(basename "${REPLAY_LOG}")"
+agent_call log nodeos /data/previous-${START_BLOCK}/nodeos.log
+agent_stop
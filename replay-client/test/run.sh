@@ -3,7 +3,9 @@
 # integration tests start up service
 cp ../../meta-data/test-simple-jobs.json ../../meta-data/test-modify-jobs.json
 
-{ python3 ../../orchestration-service/web_service.py --config "../../meta-data/test-modify-jobs.json" --host 127.0.0.1 > /dev/null 2>&1 & }
+JOBLOG_DIR=$(mktemp -d)
+{ python3 ../../orchestration-service/web_service.py --config "../../meta-data/test-modify-jobs.json" --host 127.0.0.1 \
+   --error-log-dir "${JOBLOG_DIR}" > /dev/null 2>&1 & }
 WEB_SERVICE_PID=$!
 
 # prevent tests from running before web service is up
@@ -40,6 +42,254 @@ if [ $? -eq 0 ]; then
    echo "JOB OPERATIONS TESTS PASSED"
 fi
 
+# same lifecycle through the replay agent
+REPLAY_CLIENT_DIR=..
+source ../agent_client.sh
+if ! agent_start 127.0.0.1 4000; then
+  echo "ERROR replay agent did not start"
+  kill "$WEB_SERVICE_PID"
+  exit 1
+fi
+POP_STATUS=$(agent_call pop i-agent-test "" "")
+JOBID=$(agent_call get job_id)
+if [ "$POP_STATUS" != "200" ] || [ -z "$JOBID" ]; then
+  echo "ERROR agent pop failed with ${POP_STATUS}"
+  agent_stop
+  kill "$WEB_SERVICE_PID"
+  exit 1
+fi
+agent_call status LOADING_SNAPSHOT > /dev/null
+# agent follows a nodeos log, moves job to WORKING and reports progress
+LOG_DIR=$(mktemp -d)
+agent_call follow "${LOG_DIR}"/nodeos.log "${LOG_DIR}"/superseded 0.2 > /dev/null
+echo "info  2024-01-30T10:00:00.000 nodeos    controller.cpp:1519   startup  ] chain database started with hash: 00aa11bb" >> "${LOG_DIR}"/nodeos.log
+echo "info  2024-01-30T10:00:01.000 nodeos    controller.cpp:3288   log_irreversible ] Received block 7f1a3c2b... #20 @ 2024-01-30T10:00:01.000 signed by eosnationftw" >> "${LOG_DIR}"/nodeos.log
+sleep 1
+HEAD_BLOCK=$(agent_call head)
+START_HASH=$(agent_call hash started)
+agent_call unfollow > /dev/null
+COUNT=$(curl -s http://127.0.0.1:4000/job\?jobid\=${JOBID} | grep WORKING | grep -c "last_block_processed=20")
+CACHE_STATUS=$(agent_call cache 2 1 4096)
+CACHE_COUNT=$(curl -s -H 'Accept: application/json' http://127.0.0.1:4000/job\?jobid\=${JOBID} | grep -c '"cache_hits": 2')
+agent_stop
+rm -rf "${LOG_DIR:?}"
+if [ "$HEAD_BLOCK" != "20" ] || [ "$START_HASH" != "00aa11bb" ] || [ $COUNT -ne 1 ]; then
+  echo "ERROR agent log follower head ${HEAD_BLOCK} hash ${START_HASH}"
+  kill "$WEB_SERVICE_PID"
+  exit 1
+fi
+if [ "$CACHE_STATUS" != "200" ] || [ $CACHE_COUNT -ne 1 ]; then
+  echo "ERROR agent cache report failed with ${CACHE_STATUS}"
+  kill "$WEB_SERVICE_PID"
+  exit 1
+fi
+echo "REPLAY AGENT TESTS PASSED"
+
+# leased job is skipped by other hosts and claimed by the host holding the lease
+LEASED=$(python3 ../job_operations.py --host 127.0.0.1 --operation reserve --instance-id i-lease-test \
+   --lease-minutes 5 | python3 ../parse_json.py job_id)
+OTHER=$(python3 ../job_operations.py --host 127.0.0.1 --max-tries 1 --operation pop --instance-id i-other 2> /dev/null \
+   | python3 ../parse_json.py status_code)
+CLAIMED=$(python3 ../job_operations.py --host 127.0.0.1 --operation pop --instance-id i-lease-test \
+   | python3 ../parse_json.py job_id)
+if [ -z "$LEASED" ] || [ "$OTHER" == "200" ] || [ "$CLAIMED" != "$LEASED" ]; then
+  echo "ERROR leased job ${LEASED} claimed ${CLAIMED} other host got ${OTHER}"
+  kill "$WEB_SERVICE_PID"
+  exit 1
+fi
+echo "JOB LEASE TESTS PASSED"
+
+# slots on one host hold their own leases, each slot has its own paths and ports
+python3 ../job_operations.py --host 127.0.0.1 --operation update-status --status WAITING_4_WORKER \
+   --job-id "$CLAIMED" > /dev/null
+SLOT_PATHS=$(SLOT=2 bash -c 'source ../slot_env.sh && echo "${NODEOS_DIR} ${JOB_FILE} ${AGENT_PORT} ${NODEOS_HTTP_PORT}"')
+LEASED=$(python3 ../job_operations.py --host 127.0.0.1 --max-tries 1 --operation reserve --instance-id i-slot-test \
+   --slot 1 --slots 2 --lease-minutes 5 | python3 ../parse_json.py job_id)
+FIRST_SLOT=$(python3 ../job_operations.py --host 127.0.0.1 --max-tries 1 --operation pop --instance-id i-slot-test \
+   --slot 0 --slots 2 2> /dev/null | python3 ../parse_json.py job_id)
+CLAIMED=$(python3 ../job_operations.py --host 127.0.0.1 --max-tries 1 --operation pop --instance-id i-slot-test \
+   --slot 1 --slots 2 | python3 ../parse_json.py job_id)
+if [ "$SLOT_PATHS" != "/data/nodeos-2 /tmp/job-2.conf.json 4102 8890" ] || [ -z "$LEASED" ] \
+   || [ "$FIRST_SLOT" == "$LEASED" ] || [ "$CLAIMED" != "$LEASED" ]; then
+  echo "ERROR slot paths ${SLOT_PATHS} leased job ${LEASED} claimed ${CLAIMED} first slot got ${FIRST_SLOT}"
+  kill "$WEB_SERVICE_PID"
+  exit 1
+fi
+echo "JOB SLOT TESTS PASSED"
+
+# whole log is uploaded in gzip chunks and read back by range
+seq 1 1000000 > "${JOBLOG_DIR}"/upload.log
+UPLOAD_STATUS=$(python3 ../job_operations.py --host 127.0.0.1 --operation nodeos-error-log --job-id "$CLAIMED" \
+   --log "${JOBLOG_DIR}"/upload.log | python3 ../parse_json.py status_code)
+curl -s "http://127.0.0.1:4000/joblog?jobid=${CLAIMED}&log=nodeos" -o "${JOBLOG_DIR}"/download.log
+LAST_LINE=$(curl -s -H 'Range: bytes=-8' "http://127.0.0.1:4000/joblog?jobid=${CLAIMED}&log=nodeos")
+if [ "$UPLOAD_STATUS" != "200" ] || ! cmp -s "${JOBLOG_DIR}"/upload.log "${JOBLOG_DIR}"/download.log \
+   || [ "$LAST_LINE" != "1000000" ] || [ ! -f "${JOBLOG_DIR}"/nodeos${CLAIMED}.idx ]; then
+  echo "ERROR log upload failed with ${UPLOAD_STATUS} last line ${LAST_LINE}"
+  kill "$WEB_SERVICE_PID"
+  exit 1
+fi
+echo "LOG UPLOAD TESTS PASSED"
+
+# stream a compressed artifact from file:// storage in small ranges
+FETCH_DIR=$(mktemp -d)
+head -c 3000000 /dev/urandom > "${FETCH_DIR}"/artifact
+zstd -q "${FETCH_DIR}"/artifact -o "${FETCH_DIR}"/artifact.zst
+python3 ../fetch_artifact.py --source file://"${FETCH_DIR}"/artifact.zst --output "${FETCH_DIR}"/out \
+   --keep "${FETCH_DIR}"/kept.zst --part-size 1 --workers 2
+if ! cmp -s "${FETCH_DIR}"/artifact "${FETCH_DIR}"/out || ! cmp -s "${FETCH_DIR}"/artifact.zst "${FETCH_DIR}"/kept.zst; then
+  echo "ERROR fetched artifact does not match"
+  rm -rf "${FETCH_DIR:?}"
+  kill "$WEB_SERVICE_PID"
+  exit 1
+fi
+rm -rf "${FETCH_DIR:?}"
+echo "FETCH ARTIFACT TESTS PASSED"
+
+# join two synthetic blocks log strides while they stream, compare with one log holding every block
+BLOCKS_DIR=$(mktemp -d)
+mkdir "${BLOCKS_DIR}"/store "${BLOCKS_DIR}"/blocks
+python3 - "${BLOCKS_DIR}" <<'PYTHON'
+import os, struct, sys
+def write_log(path, first_block, last_block):
+    # preamble version and first block, entries end with their own position
+    log = bytearray(struct.pack('<II', 3, first_block) + b'chain-id-preamble')
+    index = bytearray()
+    for block in range(first_block, last_block + 1):
+        position = len(log)
+        log += os.urandom(50 + block % 7000) + struct.pack('<Q', position)
+        index += struct.pack('<Q', position)
+    with open(path + '.log', 'wb') as file:
+        file.write(log)
+    with open(path + '.index', 'wb') as file:
+        file.write(index)
+write_log(os.path.join(sys.argv[1], 'store', 'blocks-1-2000000'), 1, 300)
+write_log(os.path.join(sys.argv[1], 'store', 'blocks-2000001-4000000'), 301, 600)
+PYTHON
+for f in "${BLOCKS_DIR}"/store/blocks-*
+do
+  zstd -q --rm "$f"
+done
+python3 ../blocks_log.py --source-dir file://"${BLOCKS_DIR}"/store \
+   --strides blocks-1-2000000,blocks-2000001-4000000 \
+   --blocks-dir "${BLOCKS_DIR}"/blocks --cache-dir "${BLOCKS_DIR}"/cache --reserve-gb 0 > /dev/null
+JOINED=$(python3 - "${BLOCKS_DIR}"/blocks <<'PYTHON'
+import os, struct, sys
+with open(os.path.join(sys.argv[1], 'blocks.log'), 'rb') as file:
+    log = file.read()
+with open(os.path.join(sys.argv[1], 'blocks.index'), 'rb') as file:
+    index = file.read()
+positions = [struct.unpack_from('<Q', index, at)[0] for at in range(0, len(index), 8)]
+ends = positions[1:] + [len(log)]
+trailers = [struct.unpack_from('<Q', log, end - 8)[0] for end in ends]
+print(len(positions) == 600 and trailers == positions and struct.unpack_from('<I', log, 4)[0] == 1)
+PYTHON
+)
+KEPT=$(python3 ../artifact_cache.py --cache-dir "${BLOCKS_DIR}"/cache list | grep -c "store/blocks-")
+rm -rf "${BLOCKS_DIR:?}"
+if [ "$JOINED" != "True" ] || [ $KEPT -ne 4 ]; then
+  echo "ERROR joined blocks log is not valid, kept ${KEPT} strides"
+  kill "$WEB_SERVICE_PID"
+  exit 1
+fi
+echo "BLOCKS LOG TESTS PASSED"
+
+# second fetch of an artifact comes from the cache, eviction empties it
+CACHE_DIR=$(mktemp -d)
+head -c 300000 /dev/urandom > "${CACHE_DIR}"/artifact
+zstd -q "${CACHE_DIR}"/artifact -o "${CACHE_DIR}"/artifact.zst
+for PASS in 1 2
+do
+  python3 ../fetch_artifact.py --source file://"${CACHE_DIR}"/artifact.zst --output "${CACHE_DIR}"/out \
+     --cache-dir "${CACHE_DIR}"/cache > /dev/null
+done
+read -r HITS MISSES HIT_BYTES < <(python3 ../artifact_cache.py --cache-dir "${CACHE_DIR}"/cache stats --reset)
+# job slots sharing the cache count their own hits
+REPLAY_SLOT=1 python3 ../fetch_artifact.py --source file://"${CACHE_DIR}"/artifact.zst --output "${CACHE_DIR}"/out \
+   --cache-dir "${CACHE_DIR}"/cache > /dev/null
+SLOT_STATS=$(REPLAY_SLOT=1 python3 ../artifact_cache.py --cache-dir "${CACHE_DIR}"/cache stats)
+FIRST_SLOT_STATS=$(python3 ../artifact_cache.py --cache-dir "${CACHE_DIR}"/cache stats)
+CACHED=$(python3 ../artifact_cache.py --cache-dir "${CACHE_DIR}"/cache path --key file://"${CACHE_DIR}"/artifact.zst)
+SAME=$(cmp -s "${CACHED}" "${CACHE_DIR}"/artifact.zst && cmp -s "${CACHE_DIR}"/out "${CACHE_DIR}"/artifact && echo true)
+python3 ../artifact_cache.py --cache-dir "${CACHE_DIR}"/cache evict --max-gb 0 > /dev/null
+LEFT=$(python3 ../artifact_cache.py --cache-dir "${CACHE_DIR}"/cache list | wc -l)
+rm -rf "${CACHE_DIR:?}"
+if [ "$HITS" != "1" ] || [ "$MISSES" != "1" ] || [ "$SAME" != "true" ] || [ $LEFT -ne 0 ] \
+   || [ "${SLOT_STATS% *}" != "1 0" ] || [ "${FIRST_SLOT_STATS% *}" != "0 0" ]; then
+  echo "ERROR artifact cache hits ${HITS} misses ${MISSES} left ${LEFT} slot stats ${SLOT_STATS}"
+  kill "$WEB_SERVICE_PID"
+  exit 1
+fi
+echo "ARTIFACT CACHE TESTS PASSED"
+
+# s3:// artifact read through the regional cache, backed by a local store directory
+REGIONAL_DIR=$(mktemp -d)
+mkdir -p "${REGIONAL_DIR}"/store/chicken-dance/mainnet/snapshots
+head -c 3000000 /dev/urandom > "${REGIONAL_DIR}"/artifact
+zstd -q "${REGIONAL_DIR}"/artifact -o "${REGIONAL_DIR}"/store/chicken-dance/mainnet/snapshots/snapshot.bin.zst
+{ python3 ../../orchestration-service/regional_cache.py --cache-dir "${REGIONAL_DIR}"/regional \
+   --store-dir "${REGIONAL_DIR}"/store --host 127.0.0.1 --port 4200 --log "${REGIONAL_DIR}"/regional.log > /dev/null 2>&1 & }
+REGIONAL_PID=$!
+sleep 1
+python3 ../fetch_artifact.py --source s3://chicken-dance/mainnet/snapshots/snapshot.bin.zst \
+   --output "${REGIONAL_DIR}"/out --regional-cache http://127.0.0.1:4200 --part-size 1 --workers 2
+MISSES=$(curl -s http://127.0.0.1:4200/stats | python3 ../parse_json.py misses)
+kill "$REGIONAL_PID"
+SAME=$(cmp -s "${REGIONAL_DIR}"/artifact "${REGIONAL_DIR}"/out && echo true)
+rm -rf "${REGIONAL_DIR:?}"
+if [ "$SAME" != "true" ] || [ "$MISSES" != "1" ]; then
+  echo "ERROR artifact read through regional cache does not match, misses ${MISSES}"
+  kill "$WEB_SERVICE_PID"
+  exit 1
+fi
+echo "REGIONAL CACHE TESTS PASSED"
+
+# transport waits as Retry-After asks, opens the circuit once the service is down
+TRANSPORT=$(python3 - 2> /dev/null <<'PYTHON'
+import sys, threading, time
+import requests
+from http.server import BaseHTTPRequestHandler, HTTPServer
+sys.path.insert(0, '..')
+from http_transport import HttpTransport, CircuitOpenError
+replies = [503, 200]
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(replies.pop(0))
+        self.send_header('Retry-After', '1')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+    def log_message(self, *args):
+        pass
+server = HTTPServer(('127.0.0.1', 0), Handler)
+threading.Thread(target=server.handle_request, daemon=True).start()
+threading.Thread(target=server.handle_request, daemon=True).start()
+transport = HttpTransport(base_seconds=0.01, failure_threshold=2, open_seconds=30)
+started = time.monotonic()
+status = transport.get(f"http://127.0.0.1:{server.server_port}/job", 3, timeout=3).status_code
+waited = time.monotonic() - started
+server.server_close()
+# nothing listens on the closed port
+for _ in range(2):
+    try:
+        transport.get(f"http://127.0.0.1:{server.server_port}/job", 1, timeout=1)
+    except requests.exceptions.ConnectionError:
+        pass
+try:
+    transport.get(f"http://127.0.0.1:{server.server_port}/job", 1, timeout=1)
+    fail_fast = False
+except CircuitOpenError:
+    fail_fast = True
+jitter = all(0 <= transport.backoff(attempt) <= min(60, 0.01 * 2 ** attempt) for attempt in range(20))
+print(status == 200 and 1 <= waited < 5 and fail_fast and jitter)
+PYTHON
+)
+if [ "$TRANSPORT" != "True" ]; then
+  echo "ERROR http transport retry or circuit breaker failed"
+  kill "$WEB_SERVICE_PID"
+  exit 1
+fi
+echo "HTTP TRANSPORT TESTS PASSED"
+
 # run config operation to update integrity hash
 python3 ../config_operations.py --host 127.0.0.1 --operation update --end-block-num 324302525 --integrity-hash NANANANANANA
 
@@ -56,3 +306,4 @@ echo "CONFIG OPERATIONS TESTS PASSED"
 kill "$WEB_SERVICE_PID"
 rm ../../meta-data/test-modify-jobs.json
 rm orchestration.log
+rm -rf "${JOBLOG_DIR:?}"
@@ -60,6 +60,8 @@ sudo -i -u "${USER}" pip install bs4
 ## add private ip ##
 # MACRO_P echo $ORCH_IP > /home/"${USER}"/orchestration-ip.txt
 # MACRO_P echo $github_read_token > /home/"${USER}"/token.env
+## job slots, replay jobs run at once on this host ##
+# MACRO_P echo $REPLAY_SLOTS > /home/"${USER}"/replay-slots.txt
 
 ## create cron tab ##
 echo "* * * * * /home/${USER}/replay-test/replay-client/replay_wrapper_script.sh" | crontab -u ${USER} - && echo "Cron job added successfully"
@@ -36,6 +36,9 @@ mv /tmp/replay-node-bootstrap.sh "${SCRIPTS_DIR}/replay-node-bootstrap.sh"
 source ${HOME}/env
 sed "s^# MACRO_P echo \$github_read_token^echo TOKEN=${github_read_token}^" "${SCRIPTS_DIR}/replay-node-bootstrap.sh" > /tmp/replay-node-bootstrap.sh
 mv /tmp/replay-node-bootstrap.sh "${SCRIPTS_DIR}/replay-node-bootstrap.sh"
+# large instance types run several replay jobs at once, set REPLAY_SLOTS in env
+sed "s^# MACRO_P echo \$REPLAY_SLOTS^echo ${REPLAY_SLOTS:-1}^" "${SCRIPTS_DIR}/replay-node-bootstrap.sh" > /tmp/replay-node-bootstrap.sh
+mv /tmp/replay-node-bootstrap.sh "${SCRIPTS_DIR}/replay-node-bootstrap.sh"
 
 # find the number of zones we can use
 NUM_ZONES=0
@@ -54,9 +54,13 @@ if __name__ == '__main__':
             block_manager = replay_config_manager.get(record['config'])
             config = block_manager.as_dict()
             block_span = config['end_block_id'] - config['start_block_id']
-            average_time = round(record['total_minutes'] / block_span,2)
+            if block_span <= 0 or record['total_minutes'] <= 0:
+                continue
+            # full precision, realistic rates are well below 0.01 minutes per block
+            # read back by orchestration-service/duration_estimator.py
+            average_time = record['total_minutes'] / block_span
             blocks_for_3_hours = round(60 * 3 / average_time,0)
-            print (f"{config['start_block_id']}, {config['end_block_id']}, {average_time}, {blocks_for_3_hours}")
+            print (f"{config['start_block_id']}, {config['end_block_id']}, {average_time!r}, {blocks_for_3_hours}")
     else:
         # Calculate average (mean)
         average = statistics.mean(list(record['total_minutes'] for record in timings))
@@ -24,6 +24,8 @@ function getBadgeType(status){
       badgeLable = "badge-in-progress"; break;
     case 'WORKING':
       badgeLable = "badge-in-progress"; break;
+    case 'VERIFYING':
+      badgeLable = "badge-in-progress"; break;
   }
   return badgeLable;
 }